@@ -1,13 +1,12 @@
 """Admin API Routes - Management operations"""
 
-import asyncio
-from typing import Optional
-from fastapi import APIRouter, Depends, BackgroundTasks
-from sqlmodel import Session, select
+from typing import List, Optional
+from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException
+from sqlmodel import Session
 from pydantic import BaseModel
 
-from app.database import get_session, engine
-from app.models import Link, Tag, TagLinkAssociation
+from app.database import get_session
+from app.models import Tag, TagLinkAssociation
 from app.api.auth import require_auth
 
 router = APIRouter(prefix="/admin", tags=["admin"])
@@ -24,6 +23,9 @@ class ReprocessStatus(BaseModel):
     total: int
     current_url: Optional[str] = None
     status: str
+    mode: str = "full"
+    failed: int = 0
+    skipped: int = 0
 
 
 # Global status tracker
@@ -32,21 +34,37 @@ _reprocess_status = {
     "total": 0,
     "current_url": None,
     "status": "idle",
+    "mode": "full",
+    "failed": 0,
+    "skipped": 0,
 }
 
 
 @router.post("/reprocess-all", response_model=ReprocessResponse)
 async def reprocess_all_links(
     background_tasks: BackgroundTasks,
+    mode: str = "full",
     session: Session = Depends(get_session),
     _: str = Depends(require_auth),
 ):
     """
-    Reprocess all links with the new hierarchical tagging system.
+    Reprocess links with the new hierarchical tagging system.
     This runs as a background task. Requires authentication.
+
+    mode: "full" reprocesses every link, building the new taxonomy in
+    staging tables that replace the live tags once all links are done
+    (tags keep being served meanwhile); "stale" only links that are
+    unprocessed, failed or processed with outdated prompts/models;
+    "changed" additionally refetches the rest and reprocesses those whose
+    page content changed.
     """
     global _reprocess_status
 
+    from app.services.link_processor import REBUILD_MODES, link_processor
+
+    if mode not in REBUILD_MODES:
+        raise HTTPException(status_code=400, detail=f"mode 必须是 {', '.join(REBUILD_MODES)} 之一")
+
     if _reprocess_status["status"] == "running":
         return ReprocessResponse(
             status="already_running",
@@ -54,8 +72,8 @@ async def reprocess_all_links(
             message="批量重处理已在运行中，请等待完成",
         )
 
-    # Get all link IDs
-    links = session.exec(select(Link.id, Link.url)).all()
+    # Get the link IDs this mode has to visit
+    links = link_processor.select_links(session, mode)
     total = len(links)
 
     if total == 0:
@@ -71,13 +89,13 @@ async def reprocess_all_links(
         "total": total,
         "current_url": None,
         "status": "running",
+        "mode": mode,
+        "failed": 0,
+        "skipped": 0,
     }
 
     # Start background task
-    background_tasks.add_task(
-        batch_reprocess_links,
-        [(link_id, url) for link_id, url in links],
-    )
+    background_tasks.add_task(batch_reprocess_links, links, mode)
 
     return ReprocessResponse(
         status="started",
@@ -92,14 +110,236 @@ def get_reprocess_status():
     return ReprocessStatus(**_reprocess_status)
 
 
+@router.get("/extraction-stats")
+def get_extraction_stats():
+    """Get content extraction pool size and throughput metrics"""
+    from app.services.extraction_pool import extraction_pool
+
+    return extraction_pool.stats()
+
+
+@router.get("/fetch-stats")
+def get_fetch_stats():
+    """Get per-domain fetch scheduler counters"""
+    from app.services.fetch_scheduler import fetch_scheduler
+
+    return fetch_scheduler.stats()
+
+
+@router.get("/llm-cache")
+def get_llm_cache_stats():
+    """Get LLM response cache size and hit/miss counters"""
+    from app.services.llm_cache import llm_cache
+
+    return llm_cache.stats()
+
+
+@router.post("/llm-cache/clear")
+def clear_llm_cache(_: str = Depends(require_auth)):
+    """Delete all cached LLM responses. Requires authentication."""
+    from app.services.llm_cache import llm_cache
+
+    removed = llm_cache.clear()
+    return {"status": "success", "message": f"已清除 {removed} 条 LLM 缓存"}
+
+
+@router.get("/llm-client")
+def get_llm_client_stats():
+    """Get LLM retry, deadline, circuit breaker and hedging counters"""
+    from app.services.ai_processor import ai_processor
+
+    return ai_processor.llm.stats()
+
+
+@router.get("/llm-usage")
+def get_llm_usage_stats():
+    """Get token usage, latency and cost per model and stage, plus the stage routing"""
+    from dataclasses import asdict
+
+    from app.services.ai_processor import ai_processor
+    from app.services.llm_usage import llm_usage
+
+    return {
+        "stages": {name: asdict(config) for name, config in ai_processor.stages.items()},
+        **llm_usage.stats(),
+    }
+
+
+@router.get("/rate-limit")
+def get_rate_limit_stats():
+    """Get shared LLM rate limit buckets and wait counters"""
+    from app.services.rate_limiter import rate_limiter
+
+    return rate_limiter.stats()
+
+
+@router.get("/tag-matcher")
+def get_tag_matcher_stats():
+    """Get how often the local tag matcher bypassed stage 2 and its agreement with the LLM"""
+    from app.services.tag_matcher import tag_matcher
+
+    return tag_matcher.stats()
+
+
+@router.get("/tag-cooccurrence")
+def get_tag_cooccurrence_stats():
+    """Get the size and density of the in-memory tag co-occurrence matrix"""
+    from app.services.tag_cooccurrence import tag_cooccurrence
+
+    return tag_cooccurrence.stats()
+
+
+@router.get("/condenser")
+def get_condenser_stats():
+    """Get tokens saved by content condensation, overall and for recent links"""
+    from app.services.content_condenser import content_condenser
+
+    return content_condenser.stats()
+
+
+@router.get("/link-check")
+def get_link_check_stats():
+    """Get link health counts (ok / broken / redirected / unchecked) and the current or last check run"""
+    from app.services.link_checker import link_checker
+
+    return link_checker.stats()
+
+
+@router.post("/link-check")
+async def start_link_check(
+    background_tasks: BackgroundTasks,
+    max_age_hours: Optional[float] = None,
+    _: str = Depends(require_auth),
+):
+    """
+    Check all links for dead pages and redirects in the background. Requires authentication.
+
+    max_age_hours skips links checked more recently (default LINK_CHECK_MAX_AGE_HOURS).
+    """
+    from app.services.link_checker import link_checker
+
+    if link_checker.running:
+        return {"status": "already_running", **link_checker.progress}
+
+    background_tasks.add_task(run_link_check, max_age_hours)
+    return {"status": "started", "message": "链接检查已开始，可通过 /api/admin/link-check 查看进度"}
+
+
+async def run_link_check(max_age_hours: Optional[float]):
+    """Background task checking link health"""
+    from app.services.link_checker import link_checker
+
+    try:
+        await link_checker.run(max_age_hours=max_age_hours)
+    except Exception as e:
+        print(f"链接检查失败: {e}")
+
+
+@router.get("/image-cache")
+def get_image_cache_stats():
+    """Get thumbnail cache size and hit/generation/eviction counters"""
+    from app.services.image_cache import image_cache
+
+    return image_cache.stats()
+
+
+@router.get("/favicon-cache")
+def get_favicon_cache_stats():
+    """Get cached favicon domains, distinct icon files and fetch counters"""
+    from app.services.favicon_cache import favicon_cache
+
+    return favicon_cache.stats()
+
+
+@router.get("/related-links")
+def get_related_links_stats():
+    """Get the size of the precomputed related-links table, and the current or last rebuild"""
+    from app.services.related_links import related_links
+
+    return related_links.stats()
+
+
+@router.post("/related-links/rebuild")
+async def rebuild_related_links(
+    background_tasks: BackgroundTasks,
+    _: str = Depends(require_auth),
+):
+    """Recompute the related links of every link in the background. Requires authentication."""
+    from app.services.related_links import related_links
+
+    if related_links.running:
+        return {"status": "already_running", **related_links.progress}
+
+    background_tasks.add_task(run_related_links_rebuild)
+    return {"status": "started", "message": "相关链接重算已开始，可通过 /api/admin/related-links 查看进度"}
+
+
+async def run_related_links_rebuild():
+    """Background task recomputing related links"""
+    from app.services.related_links import related_links
+
+    try:
+        await related_links.rebuild()
+    except Exception as e:
+        print(f"相关链接重算失败: {e}")
+
+
+@router.get("/content-store")
+def get_content_store_stats():
+    """Get stored page content size, compression ratio and database file size"""
+    from app.services.content_store import content_store
+
+    return content_store.stats()
+
+
+@router.post("/content-store/vacuum")
+def vacuum_content_store(_: str = Depends(require_auth)):
+    """Drop content of deleted links and compact the database file. Requires authentication."""
+    from app.services.content_store import content_store
+
+    return content_store.vacuum()
+
+
+class ConsolidateRequest(BaseModel):
+    ids: Optional[List[str]] = None  # 要应用的合并建议 ID，为空则应用全部
+    dry_run: bool = False
+
+
+@router.get("/tag-consolidation")
+def preview_tag_consolidation():
+    """Dry run: proposed merges of near-duplicate tags and categories, and their effect"""
+    from app.services.tag_consolidator import tag_consolidator
+
+    return tag_consolidator.consolidate(dry_run=True).to_dict()
+
+
+@router.post("/tag-consolidation")
+def apply_tag_consolidation(
+    request: ConsolidateRequest,
+    _: str = Depends(require_auth),
+):
+    """Apply accepted merges (by proposal id) in one transaction. Requires authentication."""
+    from app.services.tag_consolidator import tag_consolidator
+
+    return tag_consolidator.consolidate(ids=request.ids, dry_run=request.dry_run).to_dict()
+
+
 @router.post("/clear-tags")
 def clear_all_tags(
     session: Session = Depends(get_session),
     _: str = Depends(require_auth),
 ):
-    """Clear all tags and associations (use before reprocessing). Requires authentication."""
+    """
+    Clear all tags and associations. Requires authentication.
+
+    Not needed before reprocess-all: a full rebuild builds the new tags in
+    staging tables and replaces the old ones only when it completes.
+    """
     from sqlalchemy import delete
 
+    from app.services.tag_cooccurrence import tag_cooccurrence
+    from app.services.tag_vocabulary import tag_vocabulary
+
     # Delete all tag-link associations
     session.exec(delete(TagLinkAssociation))
 
@@ -107,42 +347,48 @@ def clear_all_tags(
     session.exec(delete(Tag))
 
     session.commit()
+    tag_vocabulary.invalidate()
+    tag_cooccurrence.invalidate()
 
     return {"status": "success", "message": "所有标签已清除"}
 
 
-async def batch_reprocess_links(link_data: list):
-    """Background task to reprocess all links"""
+async def batch_reprocess_links(link_data: list, mode: str = "full"):
+    """Background task to reprocess links"""
     global _reprocess_status
 
+    from app.config import settings
     from app.services.link_processor import link_processor
 
-    for i, (link_id, url) in enumerate(link_data):
+    async def on_progress(done: int, total: int, url: str, error: Optional[Exception]):
+        _reprocess_status["processed"] = done
         _reprocess_status["current_url"] = url
-        _reprocess_status["processed"] = i
-
-        try:
-            with Session(engine) as session:
-                # Reset link processing status
-                link = session.get(Link, link_id)
-                if link:
-                    link.is_processed = False
-                    link.tags = []
-                    session.add(link)
-                    session.commit()
-
-                    # Reprocess
-                    await link_processor.process_link(link_id, session)
-                    print(f"[{i+1}/{len(link_data)}] 已处理: {url}")
-
-        except Exception as e:
-            print(f"[{i+1}/{len(link_data)}] 处理失败 {url}: {e}")
-            continue
-
-        # Small delay to avoid overwhelming the AI API
-        await asyncio.sleep(0.5)
+        if error:
+            print(f"[{done}/{total}] 处理失败 {url}: {error}")
+        else:
+            print(f"[{done}/{total}] 已处理: {url}")
+
+    # Domains are fetched in parallel, fetch_scheduler applies per-domain limits
+    try:
+        result = await link_processor.reprocess_links(
+            link_data,
+            concurrency=settings.REPROCESS_CONCURRENCY,
+            on_progress=on_progress,
+            mode=mode,
+        )
+    except Exception as e:
+        # e.g. a full rebuild started from the bot is already using the staging tables
+        _reprocess_status["current_url"] = None
+        _reprocess_status["status"] = "failed"
+        print(f"批量重处理失败: {e}")
+        return
 
     _reprocess_status["processed"] = len(link_data)
     _reprocess_status["current_url"] = None
+    _reprocess_status["failed"] = result.failed
+    _reprocess_status["skipped"] = result.skipped
     _reprocess_status["status"] = "completed"
-    print(f"批量重处理完成！共处理 {len(link_data)} 条链接")
+    print(
+        f"批量重处理完成！共处理 {len(link_data)} 条链接，"
+        f"失败 {result.failed} 条，内容未变化跳过 {result.skipped} 条"
+    )
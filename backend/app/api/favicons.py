@@ -0,0 +1,52 @@
+"""Favicon API Routes - Cached per-domain favicons"""
+
+from typing import Dict, Optional
+from fastapi import APIRouter, HTTPException, Query, Response
+
+from app.services.favicon_cache import favicon_cache
+
+router = APIRouter(prefix="/favicons", tags=["favicons"])
+
+# 批量接口最多等待下载的秒数，未完成的继续在后台下载
+BATCH_TIMEOUT = 5.0
+MAX_BATCH_DOMAINS = 100
+
+
+@router.get("/batch")
+async def get_favicons_batch(
+    domains: str = Query(..., description="Comma-separated domains, e.g. the links of one page"),
+) -> Dict[str, Optional[str]]:
+    """
+    Icons of several domains as data: URIs in one response, so a page of
+    links needs a single request. Domains without an icon (or still
+    downloading after a few seconds) map to null.
+    """
+    names = list(dict.fromkeys(d.strip() for d in domains.split(",") if d.strip()))
+    if len(names) > MAX_BATCH_DOMAINS:
+        raise HTTPException(status_code=400, detail=f"一次最多请求 {MAX_BATCH_DOMAINS} 个域名")
+
+    hashes = await favicon_cache.get_many(names, timeout=BATCH_TIMEOUT)
+    return {
+        domain: favicon_cache.data_uri(content_hash) if content_hash else None
+        for domain, content_hash in hashes.items()
+    }
+
+
+@router.get("/{domain}")
+async def get_favicon(
+    domain: str,
+    v: Optional[str] = Query(None, description="Icon content hash, makes the response immutable"),
+):
+    """PNG favicon of a domain of saved links, downloaded once and cached on disk"""
+    content_hash = await favicon_cache.get(domain)
+    png = favicon_cache.read(content_hash) if content_hash else None
+    if png is None:
+        raise HTTPException(status_code=404, detail="图标不可用")
+    return Response(
+        content=png,
+        media_type="image/png",
+        headers={
+            "Cache-Control": favicon_cache.cache_control(content_hash, v),
+            "ETag": f'"{content_hash}"',
+        },
+    )
@@ -0,0 +1,61 @@
+"""Image API Routes - Cached og:image thumbnails"""
+
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+from sqlmodel import Session
+
+from app.database import get_session
+from app.models import Link
+from app.services.image_cache import image_cache
+
+router = APIRouter(prefix="/images", tags=["images"])
+
+
+def _get_image_url(link_id: int, session: Session) -> str:
+    link = session.get(Link, link_id)
+    if not link:
+        raise HTTPException(status_code=404, detail="Link not found")
+    if not link.og_image_url:
+        raise HTTPException(status_code=404, detail="该链接没有预览图")
+    return link.og_image_url
+
+
+@router.get("/{link_id}")
+async def get_thumbnail(
+    link_id: int,
+    w: Optional[int] = Query(None, ge=1, le=4096, description="Desired width in pixels"),
+    v: Optional[str] = Query(None, description="Image version from thumbnail_url"),
+    session: Session = Depends(get_session),
+):
+    """
+    WebP thumbnail of a link's og:image, resized to the smallest configured
+    width covering `w`. Generated on first request and cached on disk.
+    """
+    url = _get_image_url(link_id, session)
+    path = await image_cache.thumbnail(url, w)
+    if path is None:
+        raise HTTPException(status_code=404, detail="预览图不可用")
+    return FileResponse(
+        path,
+        media_type="image/webp",
+        headers={"Cache-Control": image_cache.cache_control(url, v)},
+    )
+
+
+@router.get("/{link_id}/placeholder")
+async def get_placeholder(
+    link_id: int,
+    v: Optional[str] = Query(None, description="Image version from thumbnail_url"),
+    session: Session = Depends(get_session),
+):
+    """Tiny (16px) WebP of a link's og:image, shown blurred while the thumbnail loads"""
+    url = _get_image_url(link_id, session)
+    path = await image_cache.placeholder(url)
+    if path is None:
+        raise HTTPException(status_code=404, detail="预览图不可用")
+    return FileResponse(
+        path,
+        media_type="image/webp",
+        headers={"Cache-Control": image_cache.cache_control(url, v)},
+    )
@@ -2,7 +2,7 @@
 
 from typing import List, Optional
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
 from sqlmodel import Session, select, func
 
 from app.database import get_session
@@ -12,9 +12,11 @@ from app.schemas import (
     LinkUpdate,
     LinkResponse,
     LinkListResponse,
+    RelatedLinkResponse,
     TagResponse,
 )
 from app.api.auth import require_auth
+from app.services.image_cache import thumbnail_url
 
 router = APIRouter(prefix="/links", tags=["links"])
 
@@ -24,12 +26,21 @@ def get_links(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     tag: Optional[str] = None,
+    health: Optional[str] = Query(None, description="ok / broken / redirected / unchecked"),
     session: Session = Depends(get_session),
 ):
     """Get paginated list of links"""
+    from app.services.link_checker import HEALTH_FILTERS, health_condition
+
     # Base query
     query = select(Link).order_by(Link.created_at.desc())
 
+    # Filter by last health check result
+    if health:
+        if health not in HEALTH_FILTERS:
+            raise HTTPException(status_code=400, detail=f"health 必须是 {', '.join(HEALTH_FILTERS)} 之一")
+        query = query.where(health_condition(health))
+
     # Filter by tag if provided
     if tag:
         query = (
@@ -64,6 +75,24 @@ def get_link(link_id: int, session: Session = Depends(get_session)):
     return _link_to_response(link)
 
 
+@router.get("/{link_id}/related", response_model=List[RelatedLinkResponse])
+def get_related_links(
+    link_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=50, description="Default RELATED_LINKS_K"),
+    session: Session = Depends(get_session),
+):
+    """Links most similar to a link (shared tags and text), from the precomputed neighbor table"""
+    from app.services.related_links import related_links
+
+    if not session.get(Link, link_id):
+        raise HTTPException(status_code=404, detail="Link not found")
+
+    return [
+        RelatedLinkResponse(**_link_to_response(link).model_dump(), score=score)
+        for link, score in related_links.neighbors(session, link_id, limit)
+    ]
+
+
 @router.post("", response_model=LinkResponse, status_code=201)
 async def create_link(
     link_data: LinkCreate,
@@ -87,6 +116,7 @@ async def create_link(
 def update_link(
     link_id: int,
     link_data: LinkUpdate,
+    background_tasks: BackgroundTasks,
     session: Session = Depends(get_session),
     _: str = Depends(require_auth),
 ):
@@ -118,6 +148,16 @@ def update_link(
     session.commit()
     session.refresh(link)
 
+    if link_data.tag_ids is not None:
+        from app.services.tag_cooccurrence import tag_cooccurrence
+
+        tag_cooccurrence.set_link_tags(link_id, [tag.id for tag in link.tags])
+
+    if link_data.title is not None or link_data.description is not None or link_data.tag_ids is not None:
+        from app.services.related_links import related_links
+
+        background_tasks.add_task(related_links.update, link_id)
+
     return _link_to_response(link)
 
 
@@ -132,8 +172,15 @@ def delete_link(
     if not link:
         raise HTTPException(status_code=404, detail="Link not found")
 
+    from app.services.content_store import content_store
+    from app.services.related_links import related_links
+    from app.services.tag_cooccurrence import tag_cooccurrence
+
+    content_store.delete(session, link_id)
+    related_links.remove(link_id, session)
     session.delete(link)
     session.commit()
+    tag_cooccurrence.remove_link(link_id)
 
 
 def _link_to_response(link: Link) -> LinkResponse:
@@ -146,9 +193,13 @@ def _link_to_response(link: Link) -> LinkResponse:
         user_note=link.user_note,
         favicon_url=link.favicon_url,
         og_image_url=link.og_image_url,
+        thumbnail_url=thumbnail_url(link.id, link.og_image_url),
         domain=link.domain,
         created_at=link.created_at,
         updated_at=link.updated_at,
         is_processed=link.is_processed,
         tags=[TagResponse(id=t.id, name=t.name, color=t.color) for t in link.tags],
+        http_status=link.http_status,
+        final_url=link.final_url,
+        checked_at=link.checked_at,
     )
@@ -7,6 +7,7 @@ from sqlmodel import Session, select, func, or_
 from app.database import get_session
 from app.models import Link, Tag, TagLinkAssociation
 from app.schemas import LinkResponse, LinkListResponse, TagResponse
+from app.services.image_cache import thumbnail_url
 
 router = APIRouter(prefix="/search", tags=["search"])
 
@@ -78,9 +79,13 @@ def _link_to_response(link: Link) -> LinkResponse:
         user_note=link.user_note,
         favicon_url=link.favicon_url,
         og_image_url=link.og_image_url,
+        thumbnail_url=thumbnail_url(link.id, link.og_image_url),
         domain=link.domain,
         created_at=link.created_at,
         updated_at=link.updated_at,
         is_processed=link.is_processed,
         tags=[TagResponse(id=t.id, name=t.name, color=t.color) for t in link.tags],
+        http_status=link.http_status,
+        final_url=link.final_url,
+        checked_at=link.checked_at,
     )
@@ -6,8 +6,10 @@ from sqlmodel import Session, select, func
 
 from app.database import get_session
 from app.models import Tag, TagLinkAssociation
-from app.schemas import TagCreate, TagResponse, TagWithCount, CategoryWithTags
+from app.schemas import TagCreate, TagResponse, TagWithCount, CategoryWithTags, RelatedTagResponse
 from app.api.auth import require_auth
+from app.services.tag_cooccurrence import ScoredTag, tag_cooccurrence
+from app.services.tag_vocabulary import tag_vocabulary
 
 router = APIRouter(prefix="/tags", tags=["tags"])
 
@@ -95,6 +97,48 @@ def get_categories_with_tags(session: Session = Depends(get_session)):
     return result
 
 
+@router.get("/suggestions", response_model=List[RelatedTagResponse])
+def suggest_tags(
+    tag_ids: List[int] = Query(..., description="Tags currently selected for the link"),
+    limit: int = Query(10, ge=1, le=50),
+    session: Session = Depends(get_session),
+):
+    """Tags to suggest while editing a link's tag_ids, from tag co-occurrence"""
+    return _scored_tags(tag_cooccurrence.suggest(tag_ids, limit), session)
+
+
+@router.get("/{tag_id}/related", response_model=List[RelatedTagResponse])
+def get_related_tags(
+    tag_id: int,
+    limit: int = Query(10, ge=1, le=50),
+    session: Session = Depends(get_session),
+):
+    """Tags most often used on the same links as a tag"""
+    if not session.get(Tag, tag_id):
+        raise HTTPException(status_code=404, detail="Tag not found")
+    return _scored_tags(tag_cooccurrence.related(tag_id, limit), session)
+
+
+def _scored_tags(scored: List[ScoredTag], session: Session) -> List[RelatedTagResponse]:
+    tags = {
+        tag.id: tag
+        for tag in session.exec(select(Tag).where(Tag.id.in_([tag_id for tag_id, _, _ in scored]))).all()
+    }
+    return [
+        RelatedTagResponse(
+            id=tag_id,
+            name=tags[tag_id].name,
+            color=tags[tag_id].color,
+            parent_id=tags[tag_id].parent_id,
+            is_category=tags[tag_id].is_category,
+            count=count,
+            score=round(score, 4),
+        )
+        for tag_id, count, score in scored
+        if tag_id in tags
+    ]
+
+
 @router.get("/{tag_id}", response_model=TagResponse)
 def get_tag(tag_id: int, session: Session = Depends(get_session)):
     """Get a single tag by ID"""
@@ -120,6 +164,7 @@ def create_tag(
     session.add(tag)
     session.commit()
     session.refresh(tag)
+    tag_vocabulary.invalidate()
 
     return TagResponse(id=tag.id, name=tag.name, color=tag.color)
 
@@ -148,6 +193,7 @@ def update_tag(
     session.add(tag)
     session.commit()
     session.refresh(tag)
+    tag_vocabulary.invalidate()
 
     return TagResponse(id=tag.id, name=tag.name, color=tag.color)
 
@@ -165,3 +211,5 @@ def delete_tag(
 
     session.delete(tag)
     session.commit()
+    tag_vocabulary.invalidate()
+    tag_cooccurrence.invalidate()
@@ -2,6 +2,7 @@
 
 import re
 import html
+import time
 import asyncio
 from functools import wraps
 from typing import Optional
@@ -9,12 +10,12 @@ from typing import Optional
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from sqlmodel import Session, select, desc
-from sqlalchemy import delete
 
 from app.config import settings
 from app.database import engine
-from app.models import Link, Tag, TagLinkAssociation
+from app.models import Link
 from app.services.link_processor import link_processor
+from app.services.tag_cooccurrence import tag_cooccurrence
 
 
 def escape_html(text: str) -> str:
@@ -22,6 +23,73 @@ def escape_html(text: str) -> str:
     return html.escape(text)
 
 
+class ProgressMessage:
+    """
+    进度消息：按最小间隔编辑同一条消息
+
+    update() 不等待，只记录最新文本；间隔内的多次更新合并为一次编辑，
+    中间状态编辑失败（如限流）直接忽略。finish() 写入最终结果。
+    """
+
+    def __init__(self, message, interval: float):
+        self.message = message
+        self.interval = interval
+        self._shown = message.text
+        self._latest: Optional[str] = None
+        self._last_edit = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def update(self, text: str) -> None:
+        self._latest = text
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush())
+
+    async def _wait_interval(self) -> None:
+        await asyncio.sleep(max(0.0, self._last_edit + self.interval - time.monotonic()))
+
+    async def _flush(self) -> None:
+        while self._latest is not None:
+            await self._wait_interval()
+            text, self._latest = self._latest, None
+            if text == self._shown:
+                continue
+            try:
+                await self.message.edit_text(text)
+                self._shown = text
+            except Exception as e:
+                print(f"进度消息编辑失败: {e}")
+            self._last_edit = time.monotonic()
+
+    async def finish(self, text: str, **kwargs) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        await self._wait_interval()
+        await self.message.edit_text(text, **kwargs)
+
+
+def _partial_text(header: str, fields: dict) -> str:
+    """流式处理中的进度文本：已生成的标题和介绍"""
+    lines = [header]
+    if fields.get("title"):
+        lines.append(f"\n{fields['title']}")
+    if fields.get("description"):
+        lines.append(fields["description"])
+    lines.append("\n正在生成分类和标签...")
+    return "\n".join(lines)
+
+
+def _on_partial(progress: ProgressMessage, header: str):
+    """AI 流式结果回调：标题或介绍生成后更新进度消息"""
+    if not settings.TELEGRAM_STREAM_PROGRESS:
+        return None
+
+    def on_partial(fields: dict) -> None:
+        if fields.get("title"):
+            progress.update(_partial_text(header, fields))
+
+    return on_partial
+
+
 # 重建状态追踪
 _rebuild_status = {
     "running": False,
@@ -62,7 +130,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 /list [n] - 显示最近 n 条收藏（默认 5）
 /search <关键词> - 搜索收藏
 /refresh <url> [提示] - 刷新链接标签
-/rebuild_tags - 重建所有标签（需确认）
+/rebuild_tags - 重建标签（增量或全部，需确认）
 /help - 显示帮助
 
 小技巧：
@@ -95,7 +163,10 @@ async def help_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 /refresh <url> <提示> - 带提示刷新
 例：/refresh https://agents.md/ 这是AI Agent网站
 
-/rebuild_tags - 重建所有标签（需确认）
+/rebuild_tags - 重建标签（需确认）
+  增量：只处理失败、未处理或提示词/模型已更新的链接
+  检查变化：另外重新抓取其余链接，内容变化的才重新生成
+  全部：重新处理全部链接，完成后一次性替换为新标签
 /rebuild_status - 查看重建进度"""
     await update.message.reply_text(help_text)
 
@@ -208,6 +279,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # 发送处理中提示
     processing_msg = await update.message.reply_text("正在处理链接...")
+    progress = ProgressMessage(processing_msg, settings.TELEGRAM_EDIT_INTERVAL)
 
     try:
         with Session(engine) as session:
@@ -216,6 +288,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 user_note=user_note,
                 session=session,
                 submitted_by="telegram",
+                on_partial=_on_partial(progress, "正在处理链接..."),
             )
 
             # 构建成功消息
@@ -227,10 +300,10 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 tag_names = " | ".join(t.name for t in link.tags)
                 lines.append(f"{tag_names}")
 
-            await processing_msg.edit_text("\n".join(lines))
+            await progress.finish("\n".join(lines))
 
     except Exception as e:
-        await processing_msg.edit_text(f"处理失败: {str(e)}")
+        await progress.finish(f"处理失败: {str(e)}")
 
 
 @require_auth
@@ -258,6 +331,7 @@ async def refresh_link(update: Update, context: ContextTypes.DEFAULT_TYPE):
         url = 'https://' + url
 
     processing_msg = await update.message.reply_text("正在刷新标签...")
+    progress = ProgressMessage(processing_msg, settings.TELEGRAM_EDIT_INTERVAL)
 
     try:
         with Session(engine) as session:
@@ -274,6 +348,7 @@ async def refresh_link(update: Update, context: ContextTypes.DEFAULT_TYPE):
             link.is_processed = False
             session.add(link)
             session.commit()
+            tag_cooccurrence.set_link_tags(link_id, [])
 
         # 用新session重新处理
         with Session(engine) as session:
@@ -282,6 +357,8 @@ async def refresh_link(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 session=session,
                 hint=hint,
                 force=True,
+                use_cache=False,  # 刷新必须重新生成，不能返回缓存结果
+                on_partial=_on_partial(progress, "正在刷新标签..."),
             )
 
             # 构建结果消息
@@ -303,15 +380,15 @@ async def refresh_link(update: Update, context: ContextTypes.DEFAULT_TYPE):
             if hint:
                 lines.append(f"\n(使用提示: {escape_html(hint)})")
 
-            await processing_msg.edit_text("\n".join(lines), parse_mode="HTML")
+            await progress.finish("\n".join(lines), parse_mode="HTML")
 
     except Exception as e:
-        await processing_msg.edit_text(f"刷新失败: {str(e)}")
+        await progress.finish(f"刷新失败: {str(e)}")
 
 
 @require_auth
 async def rebuild_tags(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """处理 /rebuild_tags 命令 - 重建所有标签（带二次确认）"""
+    """处理 /rebuild_tags 命令 - 增量或全部重建标签（带二次确认）"""
     global _rebuild_status
 
     # 检查是否正在运行
@@ -324,9 +401,10 @@ async def rebuild_tags(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    # 获取链接总数
+    # 获取链接总数和需要增量处理的数量
     with Session(engine) as session:
         total = len(session.exec(select(Link.id)).all())
+        stale = len(link_processor.select_links(session, "stale"))
 
     if total == 0:
         await update.message.reply_text("没有需要处理的链接")
@@ -334,19 +412,22 @@ async def rebuild_tags(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # 发送确认按钮
     keyboard = InlineKeyboardMarkup([
+        [InlineKeyboardButton(f"增量重建（{stale} 条）", callback_data="rebuild_confirm:stale")],
+        [InlineKeyboardButton("增量 + 检查内容变化", callback_data="rebuild_confirm:changed")],
         [
-            InlineKeyboardButton("确认重建", callback_data="rebuild_confirm"),
+            InlineKeyboardButton("全部重建", callback_data="rebuild_confirm:full"),
             InlineKeyboardButton("取消", callback_data="rebuild_cancel"),
-        ]
+        ],
     ])
 
     await update.message.reply_text(
         f"⚠️ <b>标签重建确认</b>\n\n"
-        f"即将执行以下操作：\n"
-        f"1. 清除所有现有标签和分类\n"
-        f"2. 重新处理所有 {total} 条链接\n"
-        f"3. 使用AI重新生成标签\n\n"
-        f"这个操作可能需要较长时间，确定要继续吗？",
+        f"共 {total} 条链接，其中 {stale} 条未处理、处理失败或提示词/模型已更新。\n\n"
+        f"<b>增量重建</b>：只重新处理这 {stale} 条链接，保留其他链接的标签\n"
+        f"<b>增量 + 检查内容变化</b>：另外重新抓取其余链接，页面内容有变化的才重新生成\n"
+        f"<b>全部重建</b>：重新处理全部 {total} 条链接并生成新的标签体系，"
+        f"可能需要较长时间，完成前继续显示现有标签\n\n"
+        f"请选择重建方式：",
         reply_markup=keyboard,
         parse_mode="HTML"
     )
@@ -363,19 +444,21 @@ async def handle_rebuild_callback(update: Update, context: ContextTypes.DEFAULT_
         await query.edit_message_text("已取消标签重建")
         return
 
-    if query.data == "rebuild_confirm":
+    if query.data.startswith("rebuild_confirm"):
         # 再次检查是否正在运行
         if _rebuild_status["running"]:
             await query.edit_message_text("标签重建已在运行中，请稍候...")
             return
 
+        # 旧版本消息中的按钮没有带模式，按全部重建处理
+        _, _, mode = query.data.partition(":")
         await query.edit_message_text("正在启动标签重建...")
 
         # 启动后台任务
-        asyncio.create_task(_do_rebuild_tags(query))
+        asyncio.create_task(_do_rebuild_tags(query, mode or "full"))
 
 
-async def _do_rebuild_tags(query):
+async def _do_rebuild_tags(query, mode: str = "full"):
     """执行标签重建的后台任务"""
     global _rebuild_status
 
@@ -383,65 +466,54 @@ async def _do_rebuild_tags(query):
         _rebuild_status["running"] = True
         _rebuild_status["processed"] = 0
 
-        # Step 1: 清除所有标签
+        # Step 1: 获取需要处理的链接
+        # 全部重建时新标签写入影子表，完成后一次性替换；增量重建逐条替换
         with Session(engine) as session:
-            session.exec(delete(TagLinkAssociation))
-            session.exec(delete(Tag))
-            session.commit()
+            links = link_processor.select_links(session, mode)
+            _rebuild_status["total"] = len(links)
 
-        await query.edit_message_text("已清除旧标签，开始重新处理链接...")
+        if not links:
+            await query.edit_message_text("所有链接都是最新的，无需重建")
+            return
 
-        # Step 2: 获取所有链接
-        with Session(engine) as session:
-            links = session.exec(select(Link.id, Link.url)).all()
-            _rebuild_status["total"] = len(links)
+        # Step 2: 并发重新处理（不同域名并行抓取，同一域名受限速策略约束）
+        update_interval = 1 if _rebuild_status["total"] <= 20 else 10
 
-        # Step 3: 逐个重新处理
-        for i, (link_id, url) in enumerate(links):
-            _rebuild_status["processed"] = i
+        async def on_progress(done: int, total: int, url: str, error: Optional[Exception]):
+            _rebuild_status["processed"] = done
             _rebuild_status["current_url"] = url
 
-            try:
-                # 先重置链接状态
-                with Session(engine) as session:
-                    link = session.get(Link, link_id)
-                    if link:
-                        link.is_processed = False
-                        link.tags = []
-                        session.add(link)
-                        session.commit()
-
-                # 用新的session重新处理
-                with Session(engine) as session:
-                    await link_processor.process_link(link_id, session)
-
-            except Exception as e:
-                print(f"重建标签失败 [{link_id}] {url}: {e}")
-                continue
+            if error:
+                print(f"重建标签失败 {url}: {error}")
 
             # 根据总数决定更新频率（小数量每条都更新，大数量每10条更新）
-            update_interval = 1 if _rebuild_status["total"] <= 20 else 10
-            if (i + 1) % update_interval == 0 or i == 0:
+            if done % update_interval == 0 or done == 1:
                 try:
                     await query.edit_message_text(
                         f"标签重建进行中...\n"
-                        f"进度: {i + 1}/{_rebuild_status['total']}\n"
+                        f"进度: {done}/{total}\n"
                         f"当前: {url[:50]}{'...' if len(url) > 50 else ''}"
                     )
                 except Exception:
                     pass  # 忽略消息编辑错误
 
-            # 避免请求过快
-            await asyncio.sleep(1.0)  # 两阶段处理需要更多时间
+        result = await link_processor.reprocess_links(
+            links,
+            concurrency=settings.REPROCESS_CONCURRENCY,
+            on_progress=on_progress,
+            mode=mode,
+        )
 
         # 完成
         _rebuild_status["processed"] = _rebuild_status["total"]
         _rebuild_status["current_url"] = None
 
-        await query.edit_message_text(
-            f"标签重建完成！\n"
-            f"共处理 {_rebuild_status['total']} 条链接"
-        )
+        lines = ["标签重建完成！", f"共处理 {result.total} 条链接"]
+        if result.skipped:
+            lines.append(f"内容未变化跳过 {result.skipped} 条")
+        if result.failed:
+            lines.append(f"失败 {result.failed} 条（保留原标签，下次增量重建时重试）")
+        await query.edit_message_text("\n".join(lines))
 
     except Exception as e:
         await query.edit_message_text(f"标签重建失败: {str(e)}")
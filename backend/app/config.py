@@ -23,11 +23,117 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str = ""
     OPENAI_BASE_URL: str = "https://api.openai.com/v1"
     OPENAI_MODEL_NAME: str = "gpt-4o-mini"
+    AI_PROCESS_MODE: str = "two_stage"  # two_stage: 两次调用（候选 → 筛选）; single: 一次调用
+
+    # Per-stage model routing (模型为空时使用 OPENAI_MODEL_NAME)
+    STAGE1_MODEL: str = ""  # 第一阶段（生成标题、介绍和候选标签）
+    STAGE1_TEMPERATURE: float = 0.7
+    STAGE1_MAX_TOKENS: int = 600
+    STAGE2_MODEL: str = ""  # 第二阶段（筛选归类），可换成更小更快的模型
+    STAGE2_TEMPERATURE: float = 0.3
+    STAGE2_MAX_TOKENS: int = 300  # 批量归类时按链接数倍增
+    SINGLE_MODEL: str = ""  # 单次调用模式
+    SINGLE_TEMPERATURE: float = 0.3
+    SINGLE_MAX_TOKENS: int = 600
+    MODEL_PRICES: str = ""  # 每百万 token 价格（美元），格式: gpt-4o-mini=0.15:0.6,gpt-4o=2.5:10
+
+    # LLM request policy (超时、重试、熔断)
+    LLM_STAGE1_TIMEOUT: float = 45.0  # 第一阶段（生成候选）总截止时间，包含重试（秒）
+    LLM_STAGE2_TIMEOUT: float = 30.0  # 第二阶段（筛选归类）总截止时间，批量请求加倍
+    LLM_SINGLE_TIMEOUT: float = 60.0  # 单次调用模式总截止时间
+    LLM_ATTEMPT_TIMEOUT_RATIO: float = 0.5  # 单次请求最多占用截止时间的比例，超时后重试
+    LLM_MAX_RETRIES: int = 3  # 429 / 5xx / 网络错误的最大重试次数
+    LLM_RETRY_BASE_DELAY: float = 1.0  # 指数退避基数（秒），实际等待时间随机抖动
+    LLM_RETRY_MAX_DELAY: float = 20.0
+    LLM_BREAKER_THRESHOLD: int = 5  # 连续失败多少次后熔断
+    LLM_BREAKER_COOLDOWN: float = 60.0  # 熔断持续时间（秒），期间批量任务暂停
+    LLM_HEDGE_DELAY: float = 0.0  # 交互请求超过该时间未返回时再发一个相同请求，0 表示关闭
+
+    # Shared LLM rate limit (API、Bot、CLI 共用数据库中的令牌桶)
+    LLM_RATE_LIMIT_ENABLED: bool = True
+    LLM_RATE_RPM: int = 60  # 每分钟请求数，收到 x-ratelimit-* 响应头后以服务端为准
+    LLM_RATE_TPM: int = 100000  # 每分钟 token 数
+    LLM_RATE_BULK_RESERVE: float = 0.2  # 批量任务不能使用的额度比例，留给交互请求
+
+    # LLM response cache (相同模型 + 相同提示词直接复用结果)
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TTL_DAYS: int = 30
+    LLM_CACHE_MAX_ENTRIES: int = 20000
+
+    # Batched stage 2 classification (仅用于重建等批量处理)
+    STAGE2_BATCH_SIZE: int = 4  # 每次请求最多合并的链接数，1 表示不合并
+    STAGE2_BATCH_WAIT: float = 2.0  # 凑批最长等待时间（秒）
+
+    # Local tag matcher (候选标签能可靠对应到现有标签时跳过第二阶段)
+    TAG_MATCH_ENABLED: bool = True
+    TAG_MATCH_THRESHOLD: float = 0.9  # 每个候选都达到该相似度才跳过 LLM
+    TAG_MATCH_SHADOW_RATE: float = 0.1  # 有把握时仍交给 LLM 的比例，用于统计一致性
+    TAG_ALIASES: str = ""  # 额外别名，格式: k8s=kubernetes,大模型=llm
+
+    # Existing tag context (提示词中只放与当前链接最相关的现有标签)
+    STAGE2_TAG_CONTEXT: int = 50  # 每次请求最多附带的现有标签数
+    TAG_VOCABULARY_TTL: float = 60.0  # 标签词表缓存时间（秒），标签变更时立即失效
+    TAG_COOCCURRENCE_TTL: float = 600.0  # 标签共现矩阵的重新加载间隔（秒），平时增量更新
+    TAXONOMY_REBUILD_LOCK_HOURS: float = 12.0  # 全量重建锁的最长持有时间，进程崩溃后超时即可重新获取
+
+    # Web fetching
+    FETCH_MAX_BYTES: int = 2 * 1024 * 1024  # 响应体读取上限，超出部分直接丢弃
+    FETCH_MAX_CONCURRENCY: int = 8  # 全局最大并发抓取数
+    FETCH_DOMAIN_CONCURRENCY: int = 2  # 单个域名默认并发数
+    FETCH_DOMAIN_DELAY: float = 1.0  # 单个域名默认请求间隔（秒）
+    FETCH_DOMAIN_POLICIES: str = ""  # 按域名覆盖，格式: github.com=4:0.5,mp.weixin.qq.com=1:3
+    FETCH_RESPECT_ROBOTS: bool = True  # 批量抓取时遵守 robots.txt
+
+    # Content condensation (发送给 LLM 前按 token 预算挑选最有信息量的段落)
+    CONTENT_MAX_CHARS: int = 20000  # 提取正文的字符上限
+    CONTENT_CONDENSE_ENABLED: bool = True  # 关闭时退回按前 3000 字符截断
+    CONTENT_TOKEN_BUDGET: int = 1500  # 正文部分的 token 预算（估算值）
+
+    # Stored page content (压缩保存提取的正文，重新打标签时无需重新抓取)
+    CONTENT_STORE_ENABLED: bool = True
+    CONTENT_STORE_LEVEL: int = 6  # zlib 压缩级别 1-9
+
+    # Link health check (HEAD 失败时回退 GET，按域名限速)
+    LINK_CHECK_CONCURRENCY: int = 64  # 同时检查的链接数（单个域名仍受 FETCH_DOMAIN_* 限制）
+    LINK_CHECK_TIMEOUT: float = 10.0  # 单次请求超时（秒）
+    LINK_CHECK_MAX_AGE_HOURS: float = 0  # 跳过最近检查过的链接，0 表示全部检查
+
+    # Image thumbnails (og:image 缩略图代理，本地磁盘缓存)
+    IMAGE_CACHE_DIR: str = "./data/images"
+    IMAGE_CACHE_MAX_MB: int = 500  # 超出后按最近访问时间淘汰
+    IMAGE_THUMB_WIDTHS: str = "320,640"  # 生成的缩略图宽度，请求时取不小于所需宽度的最小一档
+    IMAGE_THUMB_QUALITY: int = 75  # WebP 质量
+    IMAGE_MAX_SOURCE_MB: float = 10  # 原图下载上限
+    IMAGE_RETRY_HOURS: float = 24  # 下载或解码失败后多久再重试
+
+    # Favicons (按域名下载一次，统一转为小尺寸 PNG)
+    FAVICON_DIR: str = "./data/favicons"
+    FAVICON_SIZE: int = 32  # 输出边长（像素）
+    FAVICON_REFRESH_DAYS: float = 30  # 多少天后重新下载
+    FAVICON_RETRY_HOURS: float = 24  # 下载失败后多久再重试
+
+    # Related links (预先计算每条链接最相似的 k 条链接)
+    RELATED_LINKS_K: int = 10
+    RELATED_LINKS_TEXT_WEIGHT: float = 0.4  # 文本相似度权重，其余为标签 Jaccard
+    RELATED_LINKS_MIN_SCORE: float = 0.05  # 低于此分数的不算相关
+    RELATED_LINKS_REBUILD_TIMEOUT: float = 600.0  # 整体重算的超时（秒），在单独的进程池中并行计算
+    RELATED_LINKS_INDEX_TTL: float = 600.0  # 增量更新所用内存索引的重新加载间隔（秒）
+
+    # Batch reprocessing
+    REPROCESS_CONCURRENCY: int = 4  # 批量重处理时同时处理的链接数
+
+    # Content extraction (readability/lxml 在独立进程或线程中运行)
+    EXTRACTION_EXECUTOR: str = "process"  # process / thread / inline
+    EXTRACTION_WORKERS: int = 2
+    EXTRACTION_QUEUE_SIZE: int = 16  # 最大待处理数（运行中 + 排队），超出则等待
+    EXTRACTION_TIMEOUT: float = 10.0  # 单页提取超时（秒）
 
     # Telegram Bot (Phase 7)
     TELEGRAM_BOT_TOKEN: Optional[str] = None
     TELEGRAM_ALLOWED_USERS: str = ""  # 逗号分隔的用户 ID 列表
     WEBHOOK_URL: Optional[str] = None
+    TELEGRAM_STREAM_PROGRESS: bool = True  # 生成标题和介绍后立即显示，标签完成后再补充
+    TELEGRAM_EDIT_INTERVAL: float = 1.5  # 同一条消息两次编辑的最小间隔（秒），避免触发 Telegram 限流
 
     # Web Admin Authentication
     WEB_ADMIN_PASSWORD: str = ""  # Web 管理密码，为空则禁用 Web 管理功能
@@ -38,6 +144,50 @@ class Settings(BaseSettings):
             return []
         return [int(uid.strip()) for uid in self.TELEGRAM_ALLOWED_USERS.split(",") if uid.strip()]
 
+    def get_domain_policies(self) -> dict[str, tuple[int, float]]:
+        """解析按域名的抓取策略: domain -> (并发数, 间隔秒数)"""
+        policies = {}
+        for item in self.FETCH_DOMAIN_POLICIES.split(","):
+            if "=" not in item:
+                continue
+            domain, policy = item.split("=", 1)
+            concurrency, _, delay = policy.partition(":")
+            policies[domain.strip().lower()] = (
+                int(concurrency or self.FETCH_DOMAIN_CONCURRENCY),
+                float(delay or self.FETCH_DOMAIN_DELAY),
+            )
+        return policies
+
+    def get_tag_aliases(self) -> dict[str, str]:
+        """解析标签别名: 别名 -> 标准名"""
+        aliases = {}
+        for item in self.TAG_ALIASES.split(","):
+            if "=" not in item:
+                continue
+            alias, canonical = item.split("=", 1)
+            if alias.strip() and canonical.strip():
+                aliases[alias.strip()] = canonical.strip()
+        return aliases
+
+    def get_thumb_widths(self) -> list[int]:
+        """解析缩略图宽度档位（升序）"""
+        return sorted({int(w) for w in self.IMAGE_THUMB_WIDTHS.split(",") if w.strip()})
+
+    def get_stage_model(self, stage: str) -> str:
+        """阶段使用的模型: stage1 / stage2 / single"""
+        return getattr(self, f"{stage.upper()}_MODEL") or self.OPENAI_MODEL_NAME
+
+    def get_model_prices(self) -> dict[str, tuple[float, float]]:
+        """解析模型价格: 模型 -> (输入, 输出) 每百万 token 美元"""
+        prices = {}
+        for item in self.MODEL_PRICES.split(","):
+            if "=" not in item:
+                continue
+            model, price = item.split("=", 1)
+            prompt, _, completion = price.partition(":")
+            prices[model.strip()] = (float(prompt or 0), float(completion or prompt or 0))
+        return prices
+
     class Config:
         env_file = str(ENV_FILE)
         env_file_encoding = "utf-8"
@@ -1,5 +1,6 @@
 """LimeStar Database Connection and Session Management"""
 
+from sqlalchemy import inspect
 from sqlmodel import SQLModel, create_engine, Session
 from typing import Generator
 
@@ -14,6 +15,33 @@ engine = create_engine(settings.DATABASE_URL, connect_args=connect_args, echo=se
 def init_db() -> None:
     """Initialize database tables"""
     SQLModel.metadata.create_all(engine)
+    _add_missing_columns()
+
+
+def _add_missing_columns() -> None:
+    """Add columns introduced after a table was created (create_all never alters tables)"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                default = column.default.arg if column.default is not None and column.default.is_scalar else None
+                if default is not None:
+                    # Existing rows get the model default
+                    ddl += f" DEFAULT {int(default) if isinstance(default, bool) else repr(default)}"
+                elif not column.nullable:
+                    print(f"Cannot add NOT NULL column {table.name}.{column.name} without a default")
+                    continue
+                conn.exec_driver_sql(ddl)
+                print(f"Added column {table.name}.{column.name}")
+
+                for index in table.indexes:
+                    if column.name in index.columns:
+                        index.create(conn, checkfirst=True)
 
 
 def get_session() -> Generator[Session, None, None]:
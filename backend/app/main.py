@@ -9,8 +9,10 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import settings
 from app.database import init_db
-from app.api import links, tags, search, admin, auth
+from app.api import links, tags, search, admin, auth, images, favicons
 from app.bot.telegram_bot import process_webhook_update, setup_webhook
+from app.services.extraction_pool import extraction_pool
+from app.services.web_scraper import web_scraper
 
 
 @asynccontextmanager
@@ -29,7 +31,8 @@ async def lifespan(app: FastAPI):
 
     yield
     # Shutdown
-    pass
+    extraction_pool.shutdown()
+    await web_scraper.close()
 
 
 # Create FastAPI app
@@ -55,6 +58,8 @@ app.include_router(tags.router, prefix="/api")
 app.include_router(search.router, prefix="/api")
 app.include_router(admin.router, prefix="/api")
 app.include_router(auth.router, prefix="/api")
+app.include_router(images.router, prefix="/api")
+app.include_router(favicons.router, prefix="/api")
 
 
 @app.get("/")
@@ -2,6 +2,7 @@
 
 from datetime import datetime
 from typing import Optional, List
+from sqlalchemy import Column, LargeBinary
 from sqlmodel import Field, SQLModel, Relationship
 
 
@@ -34,6 +35,39 @@ class Tag(SQLModel, table=True):
     )
 
 
+class TagStaging(SQLModel, table=True):
+    """Tag built by a full rebuild; swapped into the tag table when it completes"""
+
+    __tablename__ = "tag_staging"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    name: str = Field(index=True, max_length=50)
+    color: str = Field(default="#007AFF", max_length=7)
+    parent_id: Optional[int] = Field(default=None, foreign_key="tag_staging.id", index=True)
+    is_category: bool = Field(default=False)
+    sort_order: int = Field(default=0)
+
+
+class TagLinkAssociationStaging(SQLModel, table=True):
+    """Association built by a full rebuild, see TagStaging"""
+
+    __tablename__ = "tag_link_association_staging"
+
+    tag_id: int = Field(foreign_key="tag_staging.id", primary_key=True)
+    link_id: int = Field(foreign_key="link.id", primary_key=True)
+
+
+class TaxonomyState(SQLModel, table=True):
+    """Single row coordinating rewrites of the tag tables across processes (see taxonomy_state)"""
+
+    __tablename__ = "taxonomy_state"
+
+    id: int = Field(default=1, primary_key=True)
+    generation: int = Field(default=0)  # 标签表被整体替换后加一，其他进程据此重新加载缓存
+    rebuild_owner: Optional[str] = Field(default=None, max_length=100)  # 持有全量重建锁的进程
+    rebuild_started_at: Optional[datetime] = Field(default=None)
+
+
 class Link(SQLModel, table=True):
     """Link model for storing bookmarks"""
 
@@ -61,8 +95,95 @@ class Link(SQLModel, table=True):
 
     # Processing status
     is_processed: bool = Field(default=False)
+    processing_failed: bool = Field(default=False)  # 上次处理出错，增量重建时会重试
+    processed_at: Optional[datetime] = Field(default=None)
+    # ai_processor.version at processing time (prompts + stage models)
+    processing_version: Optional[str] = Field(default=None, max_length=64)
+    # sha256 of the scraped title and text, detects changed pages
+    content_hash: Optional[str] = Field(default=None, max_length=64)
+
+    # Link health (see link_checker)
+    http_status: Optional[int] = Field(default=None, index=True)  # 0 = 无法连接/超时
+    final_url: Optional[str] = Field(default=None, max_length=2048)  # 重定向后的地址，未重定向为空
+    check_error: Optional[str] = Field(default=None, max_length=255)
+    checked_at: Optional[datetime] = Field(default=None, index=True)
 
     # Relationships
     tags: List[Tag] = Relationship(
         back_populates="links", link_model=TagLinkAssociation
     )
+
+
+class LinkContent(SQLModel, table=True):
+    """Extracted page text and metadata of a link's last fetch, compressed"""
+
+    __tablename__ = "link_content"
+
+    link_id: int = Field(foreign_key="link.id", primary_key=True)
+    url: str = Field(max_length=2048)  # 最终抓取的 URL
+    title: Optional[str] = Field(default=None)
+    text: bytes = Field(sa_column=Column(LargeBinary, nullable=False))  # 压缩后的正文
+    codec: str = Field(default="zlib", max_length=10)
+    og_description: Optional[str] = Field(default=None)
+    favicon_url: Optional[str] = Field(default=None, max_length=2048)
+    og_image_url: Optional[str] = Field(default=None, max_length=2048)
+    content_kind: str = Field(default="html", max_length=10)
+    truncated: bool = Field(default=False)
+
+    raw_size: int = Field(default=0)  # 正文 UTF-8 字节数
+    stored_size: int = Field(default=0)  # 压缩后字节数
+    content_hash: str = Field(max_length=64)  # 与 Link.content_hash 相同
+    fetched_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class RelatedLink(SQLModel, table=True):
+    """Precomputed neighbor of a link (see related_links), top-k per link"""
+
+    __tablename__ = "related_link"
+
+    link_id: int = Field(foreign_key="link.id", primary_key=True)
+    related_id: int = Field(foreign_key="link.id", primary_key=True, index=True)
+    score: float = Field(default=0.0)  # 标签 Jaccard 与文本余弦相似度的加权和
+
+
+class Favicon(SQLModel, table=True):
+    """Favicon of a domain, normalized and stored once (see favicon_cache)"""
+
+    __tablename__ = "favicon"
+
+    domain: str = Field(primary_key=True, max_length=255)  # 与 Link.domain 相同
+    source_url: Optional[str] = Field(default=None, max_length=2048)
+    # Digest of the normalized PNG, also its file name; domains with identical icons share a file
+    content_hash: Optional[str] = Field(default=None, max_length=16, index=True)
+    fetched_at: datetime = Field(default_factory=datetime.utcnow)  # 成功或失败的时间
+
+
+class LLMCacheEntry(SQLModel, table=True):
+    """Cached LLM chat completion keyed by a digest of the request"""
+
+    __tablename__ = "llm_cache"
+
+    key: str = Field(primary_key=True, max_length=64)  # sha256 hex digest
+    model: str = Field(max_length=100)
+    response: str = Field(default="")  # message content of the completion
+
+    # Token usage of the original call (reported as saved on every hit)
+    prompt_tokens: int = Field(default=0)
+    completion_tokens: int = Field(default=0)
+
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    last_hit_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    hits: int = Field(default=0)
+
+
+class RateLimitBucket(SQLModel, table=True):
+    """Token bucket shared by every process calling the LLM provider"""
+
+    __tablename__ = "rate_limit_bucket"
+
+    name: str = Field(primary_key=True, max_length=150)  # "<model>:requests" / "<model>:tokens"
+    capacity: float  # 桶容量（每分钟上限）
+    rate: float  # 每秒补充量
+    tokens: float  # 当前余量，可为负（被限流后需要等待的额度）
+    updated_at: float  # Unix 时间戳，余量按此时间计算补充
+    learned: bool = Field(default=False)  # 容量来自服务端 x-ratelimit-* 响应头
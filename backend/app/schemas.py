@@ -29,6 +29,11 @@ class TagWithCount(TagResponse):
     count: int = 0
 
 
+class RelatedTagResponse(TagWithCount):
+    """Tag used together with given tags; count is the number of shared links"""
+    score: float  # 相关标签为 Jaccard 相似度，标签建议为平均条件概率
+
+
 class CategoryWithTags(BaseModel):
     """Category with its child tags"""
     id: int
@@ -70,16 +75,25 @@ class LinkResponse(BaseModel):
     user_note: Optional[str]
     favicon_url: Optional[str]
     og_image_url: Optional[str]
+    thumbnail_url: Optional[str] = None  # og:image 的本地缩略图代理地址（带版本号，可长期缓存）
     domain: str
     created_at: datetime
     updated_at: datetime
     is_processed: bool
     tags: List[TagResponse]
+    http_status: Optional[int] = None  # 最近一次健康检查的状态码，0 = 无法访问
+    final_url: Optional[str] = None  # 重定向后的地址
+    checked_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
 
+class RelatedLinkResponse(LinkResponse):
+    """Schema for a related link"""
+    score: float  # 0-1，标签与文本相似度的加权和
+
+
 # ============== Pagination ==============
 
 class PaginatedResponse(BaseModel):
@@ -1,11 +1,76 @@
 """AI Processor Service - Generate Chinese summaries and auto-tag links"""
 
+import asyncio
+import hashlib
 import json
+import random
+import re
+import time
 from dataclasses import dataclass
-from typing import List, Optional
-from openai import AsyncOpenAI
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from openai import APIError, AsyncOpenAI
 
 from app.config import settings
+from app.services.content_condenser import content_condenser
+from app.services.llm_cache import llm_cache
+from app.services.llm_client import LLMUnavailableError, create_llm_client
+from app.services.llm_usage import llm_usage
+from app.services.tag_matcher import tag_matcher
+from app.services.tag_vocabulary import tag_vocabulary
+
+# Bump whenever a prompt changes, incremental rebuilds then reprocess every link
+PROMPT_VERSION = 1
+
+# Called with the fields of a streamed JSON response that are already complete
+PartialCallback = Callable[[dict], None]
+
+_json_decoder = json.JSONDecoder()
+_WHITESPACE_RE = re.compile(r"\s*")
+
+
+def parse_partial_json(text: str) -> dict:
+    """
+    Members of a (possibly truncated) JSON object whose values are complete.
+
+    '{"title": "标题", "description": "一段介' gives {"title": "标题"}.
+    A value only counts once the character after it has arrived, so numbers
+    and literals are never cut short.
+    """
+    fields = {}
+    start = text.find("{")
+    if start < 0:
+        return fields
+
+    i = start + 1
+    try:
+        while True:
+            i = _WHITESPACE_RE.match(text, i).end()
+            if i >= len(text) or text[i] == "}":
+                break
+            key, i = _json_decoder.raw_decode(text, i)
+            i = _WHITESPACE_RE.match(text, i).end()
+            if text[i] != ":":
+                break
+            i = _WHITESPACE_RE.match(text, i + 1).end()
+            value, i = _json_decoder.raw_decode(text, i)
+            i = _WHITESPACE_RE.match(text, i).end()
+            if i >= len(text):
+                break
+            fields[key] = value
+            if text[i] == ",":
+                i += 1
+    except (ValueError, IndexError):
+        pass
+    return fields
+
+
+@dataclass
+class StageConfig:
+    """Model and sampling parameters of one processing stage"""
+
+    model: str
+    temperature: float
+    max_tokens: int
 
 
 @dataclass
@@ -35,8 +100,48 @@ class AIProcessor:
         self.client = AsyncOpenAI(
             api_key=settings.OPENAI_API_KEY,
             base_url=settings.OPENAI_BASE_URL,
+            max_retries=0,  # retries are handled by LLMClient
+        )
+        self.llm = create_llm_client(self.client)
+        self.stages = {
+            "stage1": StageConfig(
+                settings.get_stage_model("stage1"),
+                settings.STAGE1_TEMPERATURE,
+                settings.STAGE1_MAX_TOKENS,
+            ),
+            # Lower temperature for more consistent classification
+            "stage2": StageConfig(
+                settings.get_stage_model("stage2"),
+                settings.STAGE2_TEMPERATURE,
+                settings.STAGE2_MAX_TOKENS,
+            ),
+            "single": StageConfig(
+                settings.get_stage_model("single"),
+                settings.SINGLE_TEMPERATURE,
+                settings.SINGLE_MAX_TOKENS,
+            ),
+        }
+        self.mode = settings.AI_PROCESS_MODE
+        self.batcher = ClassificationBatcher(
+            self,
+            batch_size=settings.STAGE2_BATCH_SIZE,
+            max_wait=settings.STAGE2_BATCH_WAIT,
+        )
+
+    @property
+    def version(self) -> str:
+        """
+        Identifies the prompts, mode and stage models results are produced with.
+
+        Stored on each link; links processed under another version are
+        picked up by incremental rebuilds.
+        """
+        stages = ",".join(
+            f"{name}={config.model}/{config.temperature}/{config.max_tokens}"
+            for name, config in sorted(self.stages.items())
         )
-        self.model = settings.OPENAI_MODEL_NAME
+        digest = hashlib.sha256(f"{self.mode};{stages}".encode()).hexdigest()[:8]
+        return f"p{PROMPT_VERSION}-{digest}"
 
     async def process(
         self,
@@ -46,11 +151,52 @@ class AIProcessor:
         user_note: Optional[str] = None,
         existing_tags: Optional[List[str]] = None,
         existing_categories: Optional[List[str]] = None,
+        hint: Optional[str] = None,
+        use_cache: bool = True,
+        mode: Optional[str] = None,
+        bulk: bool = False,
+        on_partial: Optional[PartialCallback] = None,
     ) -> ProcessResult:
         """
-        Legacy single-stage process (kept for compatibility).
-        Now delegates to two-stage processing.
+        Process a link using the configured mode.
+
+        Args:
+            mode: "two_stage" or "single"; defaults to settings.AI_PROCESS_MODE
+            bulk: Part of a batch job (rebuilds). Stage 2 requests are
+                shared with other links, and LLM calls wait out provider
+                outages instead of failing fast
+            on_partial: Stream the first call (stage 1, or the single call)
+                and report its fields (title, description, ...) as soon as
+                each one is complete, long before the final result
+
+        Raises:
+            LLMUnavailableError: the provider kept failing; no fallback
+                result is produced so the link can be retried later
+            openai.APIError: the provider rejected the request (e.g. 400,
+                401); not retried, and no fallback result either
         """
+        # Keep the most informative passages within the token budget
+        condensed = content_condenser.condense(content, title, url)
+        if condensed.passages_kept < condensed.passages_total:
+            print(
+                f"Condensed {url}: {condensed.original_tokens} -> {condensed.tokens} tokens "
+                f"({condensed.passages_kept}/{condensed.passages_total} passages)"
+            )
+        content = condensed.text
+
+        if (mode or self.mode) == "single":
+            return await self.process_single(
+                url=url,
+                title=title,
+                content=content,
+                user_note=user_note,
+                existing_tags=existing_tags,
+                existing_categories=existing_categories,
+                hint=hint,
+                use_cache=use_cache,
+                bulk=bulk,
+                on_partial=on_partial,
+            )
         return await self.process_two_stage(
             url=url,
             title=title,
@@ -58,8 +204,117 @@ class AIProcessor:
             user_note=user_note,
             existing_tags=existing_tags,
             existing_categories=existing_categories,
+            hint=hint,
+            use_cache=use_cache,
+            bulk=bulk,
+            on_partial=on_partial,
         )
 
+    async def process_single(
+        self,
+        url: str,
+        title: Optional[str],
+        content: str,
+        user_note: Optional[str] = None,
+        existing_tags: Optional[List[str]] = None,
+        existing_categories: Optional[List[str]] = None,
+        hint: Optional[str] = None,
+        use_cache: bool = True,
+        bulk: bool = False,
+        on_partial: Optional[PartialCallback] = None,
+    ) -> ProcessResult:
+        """
+        Single-call processing: title, description, category and tags in one
+        request, with the existing vocabulary given up front.
+
+        Halves latency compared to two-stage processing; tag quality can be
+        compared with benchmarks/eval_modes.py.
+        """
+        try:
+            hint_text = f"\n\n【用户明确指导】请根据以下指导来确定分类和标签: {hint}" if hint else ""
+
+            categories_context = ""
+            if existing_categories:
+                categories_context = f"\n现有分类库: {', '.join(sorted(existing_categories))}"
+
+            tags_context = ""
+            if existing_tags:
+                # No candidates yet, rank the vocabulary against the page itself
+                context_tags = tag_vocabulary.top_k(
+                    [title or "", content], existing_tags, settings.STAGE2_TAG_CONTEXT
+                )
+                tags_context = f"\n现有标签库: {', '.join(context_tags)}"
+
+            prompt = f"""你是一个技术内容分析专家。请分析以下网页的【主题内容】，生成中文标题、介绍，并确定最终的分类和标签。
+
+URL: {url}
+原标题: {title or '无'}
+{f"用户备注: {user_note}" if user_note else ""}{hint_text}
+
+网页内容摘要:
+{content}
+{categories_context}{tags_context}
+
+请返回 JSON 格式：
+{{
+    "title": "简洁的中文标题",
+    "description": "2-3句话的中文介绍",
+    "category": "最终分类",
+    "tags": ["标签1", "标签2", "标签3", "标签4"]
+}}
+
+要求：
+1. 标题简洁明了，不超过30字。如果原标题是中文且合适可直接使用
+2. 介绍控制在120字以内，突出内容价值，不要换行
+3. 分类（1个）：
+   - 准确描述内容所属的技术领域，如：前端开发、后端开发、大模型应用、DevOps、数据科学、效率工具、开源项目等
+   - 如果与现有分类语义相同或非常接近，必须使用现有分类（如"前端"和"前端开发"应选择已有的那个）
+   - 全新的领域可以创建新分类，不要把不相关的内容强行归到已有分类
+4. 标签（3-4个）：
+   - 具体技术、框架、产品名称、方法论、概念等，避免过于宽泛的词（如"开发"、"工具"、"教程"）
+   - 专业术语保留英文（如 React, LLM, Agent, RAG, Kubernetes），中文概念用中文（如 Prompt工程, 微服务）
+   - 如果与现有标签语义相同，优先使用现有标签（保持一致性）
+   - 确保标签与分类不重复
+
+重要（必须遵守）：
+- 分析的是网页讨论的【核心主题】，不是网页中提到的所有技术
+- 如果网页只是用某技术作为示例，不要把它作为标签
+- 如果用户给出了指导，【必须优先】参考用户的指导来确定分类和标签
+"""
+
+            result = await self._chat(
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "你是一个专业的技术内容分析专家，擅长分析网页内容并整理分类标签。始终返回有效的 JSON 格式。",
+                    },
+                    {"role": "user", "content": prompt},
+                ],
+                stage="single",
+                use_cache=use_cache,
+                bulk=bulk,
+                on_partial=on_partial,
+            )
+
+            return ProcessResult(
+                title=result.get("title", title or "未知标题"),
+                description=result.get("description", ""),
+                category=result.get("category") or "未分类",
+                tags=result.get("tags", [])[:4],
+            )
+
+        except (LLMUnavailableError, APIError):
+            # Provider errors are never turned into "未分类" results
+            raise
+        except Exception as e:
+            print(f"Single-call AI processing error: {e}")
+            return ProcessResult(
+                title=title or "未知标题",
+                description=user_note or "",
+                category="未分类",
+                tags=[],
+            )
+
     async def process_two_stage(
         self,
         url: str,
@@ -69,6 +324,9 @@ class AIProcessor:
         existing_tags: Optional[List[str]] = None,
         existing_categories: Optional[List[str]] = None,
         hint: Optional[str] = None,
+        use_cache: bool = True,
+        bulk: bool = False,
+        on_partial: Optional[PartialCallback] = None,
     ) -> ProcessResult:
         """
         Two-stage processing: generate candidates first, then filter and classify.
@@ -78,21 +336,58 @@ class AIProcessor:
 
         Args:
             hint: Optional user hint to guide tag generation (e.g., "这是关于AI Agent的")
+            use_cache: Serve identical requests from llm_cache; False forces
+                fresh completions (the new responses are still cached)
+            bulk: Batch job; stage 2 goes through the batcher, classifying
+                several links in one request
+            on_partial: Receives stage 1 fields while they stream in
         """
         try:
             # Stage 1: Generate candidates
             candidates = await self._generate_candidates(
-                url, title, content, user_note, hint
+                url,
+                title,
+                content,
+                user_note,
+                hint,
+                use_cache=use_cache,
+                bulk=bulk,
+                on_partial=on_partial,
             )
 
+            # Stage 2: Map onto existing tags locally when every candidate
+            # has a confident match; /refresh (use_cache=False) always asks the LLM
+            match = tag_matcher.match(
+                candidates.candidate_categories,
+                candidates.candidate_tags,
+                existing_tags or [],
+                existing_categories or [],
+            )
+            if match.confident and use_cache:
+                if random.random() >= tag_matcher.shadow_rate:
+                    tag_matcher.bypassed += 1
+                    return ProcessResult(
+                        title=candidates.title,
+                        description=candidates.description,
+                        category=match.category,
+                        tags=match.tags,
+                    )
+                tag_matcher.shadowed += 1
+
             # Stage 2: Filter and classify
-            result = await self._filter_and_classify(
+            classify = self.batcher.classify if bulk else self._filter_and_classify
+            result = await classify(
                 candidates=candidates,
                 existing_tags=existing_tags or [],
                 existing_categories=existing_categories or [],
+                use_cache=use_cache,
             )
+            tag_matcher.record(match, result.category, result.tags)
             return result
 
+        except (LLMUnavailableError, APIError):
+            # Provider errors are never turned into "未分类" results
+            raise
         except Exception as e:
             print(f"Two-stage AI processing error: {e}")
             return ProcessResult(
@@ -102,6 +397,107 @@ class AIProcessor:
                 tags=[],
             )
 
+    def _cache_key(self, messages: List[Dict[str, str]], config: StageConfig) -> str:
+        return llm_cache.make_key(
+            config.model, messages, config.temperature, config.max_tokens, {"type": "json_object"}
+        )
+
+    async def _complete(
+        self,
+        messages: List[Dict[str, str]],
+        config: StageConfig,
+        stage: str,
+        bulk: bool = False,
+        max_tokens: Optional[int] = None,
+        on_text: Optional[Callable[[str], None]] = None,
+    ) -> Tuple[str, int, int]:
+        """
+        Raw JSON-mode completion: (content, prompt_tokens, completion_tokens)
+
+        Token usage and wall time (including retries and rate limit waits)
+        are recorded in llm_usage under (config.model, stage). With on_text
+        the response is streamed and on_text receives the text so far.
+        """
+        started = time.monotonic()
+        try:
+            response = await self.llm.create(
+                stage=stage,
+                bulk=bulk,
+                on_text=on_text,
+                model=config.model,
+                messages=messages,
+                response_format={"type": "json_object"},
+                temperature=config.temperature,
+                max_tokens=max_tokens or config.max_tokens,
+            )
+        except Exception:
+            llm_usage.record_failure(config.model, stage, time.monotonic() - started)
+            raise
+
+        usage = response.usage
+        prompt_tokens = usage.prompt_tokens if usage else 0
+        completion_tokens = usage.completion_tokens if usage else 0
+        llm_usage.record(
+            config.model, stage, prompt_tokens, completion_tokens, time.monotonic() - started
+        )
+        return response.choices[0].message.content, prompt_tokens, completion_tokens
+
+    async def _chat(
+        self,
+        messages: List[Dict[str, str]],
+        stage: str,
+        use_cache: bool = True,
+        bulk: bool = False,
+        on_partial: Optional[PartialCallback] = None,
+    ) -> dict:
+        """
+        JSON-mode chat completion with the stage's config, served from
+        llm_cache when possible.
+
+        With on_partial the completion is streamed and on_partial is called
+        each time another top-level field of the JSON response is complete
+        (once with the whole result on a cache hit).
+        """
+        config = self.stages[stage]
+        key = self._cache_key(messages, config)
+
+        if use_cache:
+            cached = llm_cache.get(key)
+            if cached:
+                llm_usage.record_cached(config.model, stage)
+                result = json.loads(cached.content)
+                if on_partial is not None:
+                    on_partial(result)
+                return result
+        else:
+            llm_cache.bypassed += 1
+
+        content, prompt_tokens, completion_tokens = await self._complete(
+            messages,
+            config,
+            stage=stage,
+            bulk=bulk,
+            on_text=self._field_reporter(on_partial) if on_partial else None,
+        )
+        # Parse before caching so malformed responses are never stored
+        result = json.loads(content)
+
+        llm_cache.put(key, config.model, content, prompt_tokens, completion_tokens)
+        return result
+
+    @staticmethod
+    def _field_reporter(on_partial: PartialCallback) -> Callable[[str], None]:
+        """Stream callback calling on_partial whenever another field is complete"""
+        reported = [0]  # number of fields already reported
+
+        def report(text: str) -> None:
+            fields = parse_partial_json(text)
+            if len(fields) > reported[0]:
+                reported[0] = len(fields)
+                on_partial(fields)
+
+        return report
+
     async def _generate_candidates(
         self,
         url: str,
@@ -109,6 +505,9 @@ class AIProcessor:
         content: str,
         user_note: Optional[str] = None,
         hint: Optional[str] = None,
+        use_cache: bool = True,
+        bulk: bool = False,
+        on_partial: Optional[PartialCallback] = None,
     ) -> CandidateResult:
         """Stage 1: Generate candidate tags and categories freely"""
 
@@ -122,7 +521,7 @@ URL: {url}
 {f"用户备注: {user_note}" if user_note else ""}{hint_text}
 
 网页内容摘要:
-{content[:3000]}
+{content}
 
 请返回 JSON 格式：
 {{
@@ -156,8 +555,7 @@ URL: {url}
 - 用户指导的优先级高于网页内容分析
 """
 
-        response = await self.client.chat.completions.create(
-            model=self.model,
+        result = await self._chat(
             messages=[
                 {
                     "role": "system",
@@ -165,13 +563,12 @@ URL: {url}
                 },
                 {"role": "user", "content": prompt},
             ],
-            response_format={"type": "json_object"},
-            temperature=0.7,
-            max_tokens=600,
+            stage="stage1",
+            use_cache=use_cache,
+            bulk=bulk,
+            on_partial=on_partial,
         )
 
-        result = json.loads(response.choices[0].message.content)
-
         return CandidateResult(
             title=result.get("title", title or "未知标题"),
             description=result.get("description", ""),
@@ -179,22 +576,28 @@ URL: {url}
             candidate_tags=result.get("candidate_tags", [])[:8],
         )
 
-    async def _filter_and_classify(
+    def _classify_messages(
         self,
         candidates: CandidateResult,
         existing_tags: List[str],
         existing_categories: List[str],
-    ) -> ProcessResult:
-        """Stage 2: Filter candidates and merge with existing tags"""
+    ) -> List[Dict[str, str]]:
+        """Stage 2 prompt for a single link"""
 
-        # Build context for existing data
+        # Build context for existing data. Both lists are sorted by name:
+        # link counts must not change the prompt, nor its llm_cache key
         categories_context = ""
         if existing_categories:
-            categories_context = f"现有分类库: {', '.join(existing_categories)}"
+            categories_context = f"现有分类库: {', '.join(sorted(existing_categories))}"
 
         tags_context = ""
         if existing_tags:
-            tags_context = f"现有标签库: {', '.join(existing_tags[:50])}"
+            context_tags = tag_vocabulary.top_k(
+                candidates.candidate_categories + candidates.candidate_tags,
+                existing_tags,
+                settings.STAGE2_TAG_CONTEXT,
+            )
+            tags_context = f"现有标签库: {', '.join(context_tags)}"
 
         prompt = f"""你是一个标签管理专家。请根据候选标签和现有标签库，确定最终的分类和标签。
 
@@ -223,22 +626,18 @@ URL: {url}
    - 确保标签与分类不重复
 """
 
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "你是一个标签管理专家，擅长整理和归类标签。始终返回有效的 JSON 格式。",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.3,  # Lower temperature for more consistent classification
-            max_tokens=300,
-        )
-
-        result = json.loads(response.choices[0].message.content)
+        return [
+            {
+                "role": "system",
+                "content": "你是一个标签管理专家，擅长整理和归类标签。始终返回有效的 JSON 格式。",
+            },
+            {"role": "user", "content": prompt},
+        ]
 
+    def _classification_result(
+        self, candidates: CandidateResult, result: dict
+    ) -> ProcessResult:
+        """Combine stage 1 candidates with a stage 2 classification"""
         return ProcessResult(
             title=candidates.title,
             description=candidates.description,
@@ -253,6 +652,270 @@ URL: {url}
             tags=result.get("tags", candidates.candidate_tags[:4])[:4],
         )
 
+    async def _filter_and_classify(
+        self,
+        candidates: CandidateResult,
+        existing_tags: List[str],
+        existing_categories: List[str],
+        use_cache: bool = True,
+        bulk: bool = False,
+    ) -> ProcessResult:
+        """Stage 2: Filter candidates and merge with existing tags"""
+        result = await self._chat(
+            messages=self._classify_messages(candidates, existing_tags, existing_categories),
+            stage="stage2",
+            use_cache=use_cache,
+            bulk=bulk,
+        )
+        return self._classification_result(candidates, result)
+
+    async def classify_batch(
+        self,
+        candidates_list: List[CandidateResult],
+        existing_tags: List[str],
+        existing_categories: List[str],
+        use_cache: bool = True,
+    ) -> List[ProcessResult]:
+        """
+        Stage 2 for many links in one request.
+
+        The existing vocabulary is sent once for the whole batch instead of
+        once per link. Links already answered by a single-link request are
+        served from llm_cache; the batch response is cached under the batch
+        prompt itself (its shared tag context differs from any single-link
+        prompt). Items the batch response is missing or malformed for are
+        retried one by one. Calls are made as bulk traffic.
+        """
+        config = self.stages["stage2"]
+        results: List[Optional[ProcessResult]] = [None] * len(candidates_list)
+        pending = []
+
+        for i, candidates in enumerate(candidates_list):
+            messages = self._classify_messages(candidates, existing_tags, existing_categories)
+            cached = llm_cache.get(self._cache_key(messages, config)) if use_cache else None
+            if cached:
+                llm_usage.record_cached(config.model, "stage2")
+                results[i] = self._classification_result(candidates, json.loads(cached.content))
+            else:
+                pending.append(i)
+
+        if len(pending) == 1:
+            i = pending[0]
+            results[i] = await self._filter_and_classify(
+                candidates_list[i],
+                existing_tags,
+                existing_categories,
+                use_cache=use_cache,
+                bulk=True,
+            )
+            pending = []
+
+        items: Dict[int, dict] = {}
+        if pending:
+            messages = self._classify_batch_messages(
+                [candidates_list[i] for i in pending],
+                existing_tags,
+                existing_categories,
+            )
+            max_tokens = config.max_tokens * len(pending)
+            batch_key = llm_cache.make_key(
+                config.model, messages, config.temperature, max_tokens, {"type": "json_object"}
+            )
+            try:
+                cached = llm_cache.get(batch_key) if use_cache else None
+                if cached:
+                    llm_usage.record_cached(config.model, "stage2_batch")
+                    content = cached.content
+                else:
+                    if not use_cache:
+                        llm_cache.bypassed += 1
+                    content, prompt_tokens, completion_tokens = await self._complete(
+                        messages,
+                        config,
+                        stage="stage2_batch",
+                        bulk=True,
+                        max_tokens=max_tokens,
+                    )
+                response = json.loads(content)
+                if not cached:
+                    llm_cache.put(batch_key, config.model, content, prompt_tokens, completion_tokens)
+                for item in response.get("results", []):
+                    if isinstance(item, dict) and isinstance(item.get("id"), int):
+                        items[item["id"]] = item
+            except (LLMUnavailableError, APIError):
+                raise
+            except Exception as e:
+                print(f"Batch classification error ({len(pending)} items): {e}")
+
+        for n, i in enumerate(pending):
+            item = items.get(n)
+            if item and isinstance(item.get("category"), str) and isinstance(item.get("tags"), list):
+                result = {"category": item["category"], "tags": item["tags"]}
+                results[i] = self._classification_result(candidates_list[i], result)
+            else:
+                # Partial failure: classify this item on its own
+                results[i] = await self._filter_and_classify(
+                    candidates_list[i],
+                    existing_tags,
+                    existing_categories,
+                    use_cache=use_cache,
+                    bulk=True,
+                )
+
+        return results
+
+    def _classify_batch_messages(
+        self,
+        candidates_list: List[CandidateResult],
+        existing_tags: List[str],
+        existing_categories: List[str],
+    ) -> List[Dict[str, str]]:
+        """Stage 2 prompt for several links sharing one vocabulary"""
+        categories_context = ""
+        if existing_categories:
+            categories_context = f"现有分类库: {', '.join(sorted(existing_categories))}"
+
+        tags_context = ""
+        if existing_tags:
+            # One shared context for the batch, ranked against all candidates
+            context_tags = tag_vocabulary.top_k(
+                [name for c in candidates_list for name in c.candidate_categories + c.candidate_tags],
+                existing_tags,
+                settings.STAGE2_TAG_CONTEXT,
+            )
+            tags_context = f"现有标签库: {', '.join(context_tags)}"
+
+        items = "\n".join(
+            json.dumps(
+                {
+                    "id": i,
+                    "candidate_categories": c.candidate_categories,
+                    "candidate_tags": c.candidate_tags,
+                },
+                ensure_ascii=False,
+            )
+            for i, c in enumerate(candidates_list)
+        )
+
+        prompt = f"""你是一个标签管理专家。下面有 {len(candidates_list)} 条链接的候选分类和候选标签，请根据现有标签库分别确定每条链接最终的分类和标签。
+
+{categories_context}
+{tags_context}
+
+待处理链接（每行一条）:
+{items}
+
+请返回 JSON 格式，results 中每条链接一项，id 与输入一致：
+{{
+    "results": [
+        {{"id": 0, "category": "最终分类", "tags": ["标签1", "标签2", "标签3"]}}
+    ]
+}}
+
+要求：
+1. 最终分类：
+   - 如果候选分类与现有分类语义相同或非常接近，选择现有分类（如"前端"和"前端开发"应选择已有的那个）
+   - 如果候选分类是全新的领域，可以创建新分类
+   - 不要把不相关的内容强行归到已有分类
+
+2. 最终标签（每条 3-4 个）：
+   - 从该链接的候选标签中选择最有代表性的
+   - 如果候选标签与现有标签语义相同，优先使用现有标签（保持一致性）
+   - 合并相似标签（如 "Prompt Engineering" 和 "Prompt工程" 选择一个）
+   - 确保标签与分类不重复
+
+3. 每条链接独立判断，不要互相影响
+"""
+
+        return [
+            {
+                "role": "system",
+                "content": "你是一个标签管理专家，擅长整理和归类标签。始终返回有效的 JSON 格式。",
+            },
+            {"role": "user", "content": prompt},
+        ]
+
+
+class ClassificationBatcher:
+    """
+    Collects concurrent stage 2 requests into classify_batch calls.
+
+    A batch is sent when it reaches batch_size or max_wait seconds after its
+    first request, whichever comes first. Each batch uses the vocabulary of
+    its most recent request, the freshest snapshot of the tag table.
+    """
+
+    def __init__(self, processor: AIProcessor, batch_size: int = 4, max_wait: float = 2.0):
+        self.processor = processor
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._pending: List[tuple] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: Set[asyncio.Task] = set()  # 持有运行中批次的引用，避免任务被回收
+
+    async def classify(
+        self,
+        candidates: CandidateResult,
+        existing_tags: List[str],
+        existing_categories: List[str],
+        use_cache: bool = True,
+    ) -> ProcessResult:
+        if self.batch_size <= 1:
+            return await self.processor._filter_and_classify(
+                candidates, existing_tags, existing_categories, use_cache=use_cache, bulk=True
+            )
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._pending, self._timer = loop, [], None
+
+        future = loop.create_future()
+        self._pending.append((candidates, existing_tags, existing_categories, use_cache, future))
+
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = self._loop.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[tuple]) -> None:
+        _, existing_tags, existing_categories, _, _ = batch[-1]
+        try:
+            results = await self.processor.classify_batch(
+                [item[0] for item in batch],
+                existing_tags,
+                existing_categories,
+                # A forced refresh anywhere in the batch bypasses the cache
+                use_cache=all(item[3] for item in batch),
+            )
+            for item, result in zip(batch, results):
+                if not item[4].done():
+                    item[4].set_result(result)
+        except Exception as e:
+            self._fail(batch, e)
+        except BaseException:
+            # Cancelled (e.g. on shutdown): the callers must not wait forever
+            self._fail(batch, LLMUnavailableError("批量分类已取消"))
+            raise
+
+    @staticmethod
+    def _fail(batch: List[tuple], error: BaseException) -> None:
+        for item in batch:
+            if not item[4].done():
+                item[4].set_exception(error)
+
 
 # Global instance
 ai_processor = AIProcessor()
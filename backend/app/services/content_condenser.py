@@ -0,0 +1,249 @@
+"""Content Condenser Service - Fit page text into a token budget before prompting"""
+
+import math
+import re
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from app.config import settings
+
+
+_CJK_RE = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]")
+_WORD_RE = re.compile(r"[a-z][a-z0-9+#.\-]*[a-z0-9+#]|[a-z]")
+_SENTENCE_RE = re.compile(r"(?<=[。！？!?；;])|(?<=\.)\s+")
+_SENTENCE_END_RE = re.compile(r"[。！？.!?；;：:]")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do for from has have how if in into is it its "
+    "not of on or our so than that the their then there these this to was we were "
+    "what when which who will with you your".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count without a tokenizer.
+
+    CJK characters cost about one token each in GPT-style BPE vocabularies,
+    other text about four characters per token.
+    """
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def _terms(text: str) -> List[str]:
+    """Index terms: lowercase words (minus stopwords) and CJK character bigrams"""
+    text = text.lower()
+    terms = [w for w in _WORD_RE.findall(text) if w not in _STOPWORDS]
+    for run in re.findall(r"[㐀-䶿一-鿿]+", text):
+        terms.extend(run[i : i + 2] for i in range(max(1, len(run) - 1)))
+    return terms
+
+
+@dataclass
+class CondensedContent:
+    """Condensed page text and its token accounting"""
+
+    text: str
+    original_tokens: int
+    tokens: int
+    passages_total: int
+    passages_kept: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.original_tokens - self.tokens
+
+
+class ContentCondenser:
+    """
+    Selects the most informative passages of a page within a token budget.
+
+    1. Lines repeated within the page (menus, share buttons, "阅读更多")
+       and short lines without sentence punctuation are dropped as
+       boilerplate.
+    2. Remaining lines become passages; very long ones are split at
+       sentence boundaries.
+    3. If the text still exceeds the budget, passages are scored by TF-IDF
+       centrality (cosine similarity to the whole page) with a bonus for
+       title overlap and for the lead paragraph, packed greedily into the
+       budget and emitted in their original order.
+    """
+
+    def __init__(
+        self,
+        budget_tokens: int = 1500,
+        enabled: bool = True,
+        max_passage_tokens: int = 300,
+        min_line_chars: int = 12,
+    ):
+        self.budget_tokens = budget_tokens
+        self.enabled = enabled
+        self.max_passage_tokens = max_passage_tokens
+        self.min_line_chars = min_line_chars
+
+        # Counters since process start
+        self.links = 0
+        self.original_tokens = 0
+        self.tokens = 0
+        self.recent: deque = deque(maxlen=50)  # 最近处理的链接
+
+    def condense(
+        self, text: str, title: Optional[str] = None, url: Optional[str] = None
+    ) -> CondensedContent:
+        """Condense text to at most budget_tokens (estimated)"""
+        original_tokens = estimate_tokens(text)
+        if not self.enabled or not text:
+            # Disabled: plain character cut, as before condensation existed
+            text = text[:3000]
+            return CondensedContent(text, original_tokens, estimate_tokens(text), 0, 0)
+
+        passages = self._passages(self._strip_boilerplate(text))
+        # +1 for the newline joining passages
+        sizes = [estimate_tokens(p) + 1 for p in passages]
+
+        if sum(sizes) <= self.budget_tokens:
+            kept = list(range(len(passages)))
+        else:
+            kept = self._select(passages, sizes, title)
+
+        condensed = "\n".join(passages[i] for i in kept)
+        if kept and estimate_tokens(condensed) > self.budget_tokens:
+            # A single passage larger than the whole budget
+            condensed = self._truncate(condensed)
+
+        result = CondensedContent(
+            text=condensed,
+            original_tokens=original_tokens,
+            tokens=estimate_tokens(condensed),
+            passages_total=len(passages),
+            passages_kept=len(kept),
+        )
+        self._record(result, url)
+        return result
+
+    def _strip_boilerplate(self, text: str) -> List[str]:
+        lines = [" ".join(line.split()) for line in text.splitlines()]
+        lines = [line for line in lines if line]
+        counts = Counter(line.casefold() for line in lines)
+
+        kept = []
+        for line in lines:
+            if counts[line.casefold()] > 1:
+                continue
+            if len(line) < self.min_line_chars and not _SENTENCE_END_RE.search(line):
+                continue
+            kept.append(line)
+
+        # Nothing but boilerplate-looking lines (e.g. a bare list page): keep the text
+        return kept or list(dict.fromkeys(lines))
+
+    def _passages(self, lines: List[str]) -> List[str]:
+        passages = []
+        for line in lines:
+            if estimate_tokens(line) <= self.max_passage_tokens:
+                passages.append(line)
+                continue
+
+            # Split long lines (PDF pages, unstructured text) at sentence ends
+            chunk = ""
+            for sentence in _SENTENCE_RE.split(line):
+                sentence = sentence.strip()
+                if not sentence:
+                    continue
+                joined = f"{chunk} {sentence}".strip() if chunk else sentence
+                if chunk and estimate_tokens(joined) > self.max_passage_tokens:
+                    passages.append(chunk)
+                    chunk = sentence
+                else:
+                    chunk = joined
+            if chunk:
+                passages.append(chunk)
+        return passages
+
+    def _select(self, passages: List[str], sizes: List[int], title: Optional[str]) -> List[int]:
+        """Indices of the passages to keep, in document order"""
+        term_counts = [Counter(_terms(p)) for p in passages]
+        document_freq = Counter(term for counts in term_counts for term in counts)
+        n = len(passages)
+        idf = {term: math.log((1 + n) / (1 + df)) + 1 for term, df in document_freq.items()}
+
+        vectors: List[Dict[str, float]] = []
+        centroid: Counter = Counter()
+        for counts in term_counts:
+            vector = {term: (1 + math.log(tf)) * idf[term] for term, tf in counts.items()}
+            norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+            vector = {term: w / norm for term, w in vector.items()}
+            vectors.append(vector)
+            centroid.update(vector)
+        centroid_norm = math.sqrt(sum(w * w for w in centroid.values())) or 1.0
+
+        title_terms = set(_terms(title or ""))
+        scores = []
+        for i, vector in enumerate(vectors):
+            centrality = sum(w * centroid[t] for t, w in vector.items()) / centroid_norm
+            title_overlap = (
+                len(title_terms & vector.keys()) / len(title_terms) if title_terms else 0.0
+            )
+            lead = 0.15 if i == 0 else 0.0
+            scores.append(centrality + 0.3 * title_overlap + lead)
+
+        kept = []
+        remaining = self.budget_tokens
+        for i in sorted(range(n), key=lambda i: scores[i], reverse=True):
+            if sizes[i] <= remaining:
+                kept.append(i)
+                remaining -= sizes[i]
+            if remaining < 20:
+                break
+
+        if not kept:
+            kept = [max(range(n), key=lambda i: scores[i])]
+        return sorted(kept)
+
+    def _truncate(self, text: str) -> str:
+        """Cut text to the budget, keeping whole characters"""
+        low, high = 0, len(text)
+        while low < high:
+            mid = (low + high + 1) // 2
+            if estimate_tokens(text[:mid]) <= self.budget_tokens:
+                low = mid
+            else:
+                high = mid - 1
+        return text[:low]
+
+    def _record(self, result: CondensedContent, url: Optional[str]) -> None:
+        self.links += 1
+        self.original_tokens += result.original_tokens
+        self.tokens += result.tokens
+        self.recent.append(
+            {
+                "url": url,
+                "original_tokens": result.original_tokens,
+                "tokens": result.tokens,
+                "tokens_saved": result.tokens_saved,
+                "passages": f"{result.passages_kept}/{result.passages_total}",
+            }
+        )
+
+    def stats(self) -> dict:
+        """Totals since process start and the most recent links"""
+        saved = self.original_tokens - self.tokens
+        return {
+            "enabled": self.enabled,
+            "budget_tokens": self.budget_tokens,
+            "links": self.links,
+            "original_tokens": self.original_tokens,
+            "tokens": self.tokens,
+            "tokens_saved": saved,
+            "saved_ratio": round(saved / self.original_tokens, 4) if self.original_tokens else 0.0,
+            "recent": list(self.recent),
+        }
+
+
+# Global instance
+content_condenser = ContentCondenser(
+    budget_tokens=settings.CONTENT_TOKEN_BUDGET,
+    enabled=settings.CONTENT_CONDENSE_ENABLED,
+)
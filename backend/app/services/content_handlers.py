@@ -0,0 +1,194 @@
+"""Content Handlers - Content-type routing, charset detection and non-HTML extractors"""
+
+import codecs
+import io
+import re
+from pathlib import PurePosixPath
+from typing import Optional
+from urllib.parse import unquote, urlparse
+
+from charset_normalizer import from_bytes
+from pypdf import PdfReader
+
+from app.services.html_extractor import ExtractedPage, default_favicon_url
+
+
+# Content kinds
+HTML = "html"
+TEXT = "text"
+PDF = "pdf"
+IMAGE = "image"
+UNKNOWN = "unknown"  # 需要嗅探响应体才能确定
+UNSUPPORTED = "unsupported"
+
+_HTML_TYPES = {"text/html", "application/xhtml+xml"}
+_TEXT_TYPES = {
+    "text/plain",
+    "text/markdown",
+    "text/x-markdown",
+    "application/json",
+    "text/xml",
+    "application/xml",
+}
+_AMBIGUOUS_TYPES = {"", "application/octet-stream", "binary/octet-stream"}
+
+_META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([a-zA-Z0-9_.:-]+)""", re.I)
+_BOMS = [
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+# 中文站点常把 GBK 页面声明为 gb2312，gb18030 是两者的超集
+_CHARSET_ALIASES = {"gb2312": "gb18030", "gbk": "gb18030", "x-gbk": "gb18030"}
+
+
+def _media_type(content_type: str) -> str:
+    return content_type.split(";", 1)[0].strip().lower()
+
+
+def classify_content_type(content_type: str) -> str:
+    """Classify a response by its Content-Type header alone"""
+    media_type = _media_type(content_type)
+    if media_type in _HTML_TYPES:
+        return HTML
+    if media_type == "application/pdf":
+        return PDF
+    if media_type.startswith("image/"):
+        return IMAGE
+    if media_type in _AMBIGUOUS_TYPES:
+        return UNKNOWN
+    if media_type in _TEXT_TYPES or media_type.startswith("text/"):
+        return TEXT
+    return UNSUPPORTED
+
+
+def sniff_content(head: bytes) -> str:
+    """Classify a response body by its leading bytes"""
+    if head.startswith(b"%PDF-"):
+        return PDF
+    if head.startswith((b"\x89PNG", b"\xff\xd8\xff", b"GIF8")) or (
+        head[:4] == b"RIFF" and head[8:12] == b"WEBP"
+    ):
+        return IMAGE
+
+    lowered = head[:1024].lstrip().lower()
+    if lowered.startswith(b"<!doctype html") or b"<html" in lowered or b"<head" in lowered:
+        return HTML
+    if b"\x00" not in head[:1024]:
+        return TEXT
+    return UNSUPPORTED
+
+
+def _normalize_charset(name: Optional[str]) -> Optional[str]:
+    """Return a Python codec name for a declared charset, or None if unknown"""
+    if not name:
+        return None
+    name = name.strip().strip("\"'").lower()
+    name = _CHARSET_ALIASES.get(name, name)
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+def detect_charset(content_type: str, body: bytes) -> str:
+    """
+    Determine the charset of a response body.
+
+    Order: BOM → Content-Type header → <meta> in the first 4 KB →
+    UTF-8 validation → charset_normalizer (slow) → UTF-8.
+    """
+    for bom, encoding in _BOMS:
+        if body.startswith(bom):
+            return encoding
+
+    match = re.search(r"charset=([^;]+)", content_type, re.I)
+    charset = _normalize_charset(match.group(1)) if match else None
+    if charset:
+        return charset
+
+    match = _META_CHARSET_RE.search(body[:4096])
+    charset = _normalize_charset(match.group(1).decode("ascii", "ignore")) if match else None
+    if charset:
+        return charset
+
+    # Incremental decode tolerates a multi-byte sequence cut by the size cap
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(body, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+
+    best = from_bytes(body[:65536]).best()
+    if best and _normalize_charset(best.encoding):
+        return _normalize_charset(best.encoding)
+
+    return "utf-8"
+
+
+def decode_body(content_type: str, body: bytes) -> str:
+    """Decode a response body using the detected charset"""
+    return body.decode(detect_charset(content_type, body), errors="replace")
+
+
+def _filename(url: str) -> Optional[str]:
+    """Last path segment of a URL, used as a fallback title"""
+    name = PurePosixPath(unquote(urlparse(url).path)).name
+    return name or None
+
+
+def extract_text(text: str, url: str, max_length: int = 20000) -> ExtractedPage:
+    """Plain text / markdown / JSON: first short line as title, rest as content"""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    title = lines[0].lstrip("# ").strip() if lines and len(lines[0]) <= 120 else None
+
+    return ExtractedPage(
+        title=title or _filename(url),
+        text_content="\n".join(lines)[:max_length],
+        favicon_url=default_favicon_url(url),
+        og_image_url=None,
+        og_description=None,
+    )
+
+
+def extract_pdf(body: bytes, url: str, max_length: int = 20000) -> ExtractedPage:
+    """PDF: document title from metadata, text from pages until max_length"""
+    title = None
+    parts = []
+    length = 0
+
+    try:
+        reader = PdfReader(io.BytesIO(body), strict=False)
+        if reader.metadata and reader.metadata.title:
+            title = str(reader.metadata.title).strip() or None
+
+        for page in reader.pages:
+            lines = (page.extract_text() or "").splitlines()
+            text = "\n".join(" ".join(line.split()) for line in lines if line.strip())
+            if text:
+                parts.append(text)
+                length += len(text)
+            if length >= max_length:
+                break
+    except Exception as e:
+        # 超过大小上限被截断或损坏的 PDF，只保留能提取到的部分
+        print(f"PDF 解析失败 {url}: {e}")
+
+    return ExtractedPage(
+        title=title or _filename(url),
+        text_content="\n".join(parts)[:max_length],
+        favicon_url=default_favicon_url(url),
+        og_image_url=None,
+        og_description=None,
+    )
+
+
+def describe_image(url: str) -> ExtractedPage:
+    """Images: nothing to extract, the image itself is the preview"""
+    return ExtractedPage(
+        title=_filename(url),
+        text_content="",
+        favicon_url=default_favicon_url(url),
+        og_image_url=url,
+        og_description=None,
+    )
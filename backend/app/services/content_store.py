@@ -0,0 +1,174 @@
+"""Content Store Service - Compressed extracted page text per link"""
+
+import zlib
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import delete, func, text
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, select
+
+from app.config import settings
+from app.database import engine
+from app.models import Link, LinkContent
+from app.services.web_scraper import ScrapedContent
+
+
+class ContentStore:
+    """
+    Keeps the text and og metadata extracted on each link's last fetch.
+
+    Text is zlib compressed in the link_content table (one row per link,
+    replaced on every fetch). Rebuilds that only change prompts or models
+    read it back with load() instead of fetching the page again; it is
+    also the source for anything else that needs page text, such as
+    search indexing. stats() reports storage use and vacuum() drops
+    content of deleted links and compacts the database file.
+    """
+
+    def __init__(self, enabled: bool = True, level: int = 6):
+        self.enabled = enabled
+        self.level = max(1, min(9, level))
+
+        # Counters since process start
+        self.saved = 0
+        self.loaded = 0
+        self.missing = 0
+
+    def save(self, session: Session, link_id: int, scraped: ScrapedContent, content_hash: str) -> None:
+        """Store (or replace) the content of a link; committed with the caller's session"""
+        if not self.enabled:
+            return
+
+        raw = scraped.text_content.encode("utf-8")
+        compressed = zlib.compress(raw, self.level)
+
+        entry = session.get(LinkContent, link_id)
+        if entry is None:
+            entry = LinkContent(link_id=link_id, url=scraped.url, text=b"", content_hash="")
+        entry.url = scraped.url
+        entry.title = scraped.title
+        entry.text = compressed
+        entry.codec = "zlib"
+        entry.og_description = scraped.og_description
+        entry.favicon_url = scraped.favicon_url
+        entry.og_image_url = scraped.og_image_url
+        entry.content_kind = scraped.content_kind
+        entry.truncated = scraped.truncated
+        entry.raw_size = len(raw)
+        entry.stored_size = len(compressed)
+        entry.content_hash = content_hash
+        entry.fetched_at = datetime.utcnow()
+        session.add(entry)
+        self.saved += 1
+
+    def load(self, session: Session, link_id: int) -> Optional[ScrapedContent]:
+        """Stored content of a link as if it had just been fetched, or None"""
+        if not self.enabled:
+            return None
+
+        entry = session.get(LinkContent, link_id)
+        if entry is None:
+            self.missing += 1
+            return None
+
+        self.loaded += 1
+        return ScrapedContent(
+            url=entry.url,
+            title=entry.title,
+            text_content=self._decompress(entry),
+            favicon_url=entry.favicon_url,
+            og_image_url=entry.og_image_url,
+            og_description=entry.og_description,
+            content_kind=entry.content_kind,
+            truncated=entry.truncated,
+        )
+
+    @staticmethod
+    def _decompress(entry: LinkContent) -> str:
+        if entry.codec != "zlib":
+            raise ValueError(f"Unknown content codec: {entry.codec}")
+        return zlib.decompress(entry.text).decode("utf-8")
+
+    def delete(self, session: Session, link_id: int) -> None:
+        """Drop the content of a link; committed with the caller's session"""
+        session.exec(delete(LinkContent).where(LinkContent.link_id == link_id))
+
+    def _database_size(self, session: Session) -> dict:
+        """SQLite file size, free pages and per-table size (when dbstat is available)"""
+        if engine.dialect.name != "sqlite":
+            return {}
+
+        page_size = session.exec(text("PRAGMA page_size")).one()[0]
+        page_count = session.exec(text("PRAGMA page_count")).one()[0]
+        freelist = session.exec(text("PRAGMA freelist_count")).one()[0]
+        size = {
+            "database_bytes": page_size * page_count,
+            "free_bytes": page_size * freelist,
+        }
+        try:
+            rows = session.exec(
+                text("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name ORDER BY SUM(pgsize) DESC")
+            ).all()
+            size["tables_bytes"] = {name: bytes_ for name, bytes_ in rows}
+        except OperationalError:
+            pass  # SQLite built without SQLITE_ENABLE_DBSTAT_VTAB
+        return size
+
+    def stats(self) -> dict:
+        with Session(engine) as session:
+            entries, raw, stored = session.exec(
+                select(
+                    func.count(LinkContent.link_id),
+                    func.coalesce(func.sum(LinkContent.raw_size), 0),
+                    func.coalesce(func.sum(LinkContent.stored_size), 0),
+                )
+            ).one()
+            links = session.exec(select(func.count(Link.id))).one()
+            orphaned = session.exec(
+                select(func.count(LinkContent.link_id)).where(
+                    LinkContent.link_id.not_in(select(Link.id))
+                )
+            ).one()
+            database = self._database_size(session)
+
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "links_without_content": max(0, links - (entries - orphaned)),
+            "orphaned": orphaned,
+            "raw_bytes": raw,
+            "stored_bytes": stored,
+            "compression_ratio": round(raw / stored, 2) if stored else None,
+            "saved": self.saved,
+            "loaded": self.loaded,
+            "missing": self.missing,
+            **database,
+        }
+
+    def vacuum(self) -> dict:
+        """Delete content of links that no longer exist, then VACUUM the database"""
+        with Session(engine) as session:
+            before = self._database_size(session).get("database_bytes")
+            removed = session.exec(
+                delete(LinkContent).where(LinkContent.link_id.not_in(select(Link.id)))
+            ).rowcount
+            session.commit()
+
+        if engine.dialect.name == "sqlite":
+            # VACUUM cannot run inside a transaction
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.exec_driver_sql("VACUUM")
+
+        with Session(engine) as session:
+            after = self._database_size(session).get("database_bytes")
+
+        print(f"Content store vacuum: {removed} orphaned entries removed, {before} -> {after} bytes")
+        return {"removed": removed, "database_bytes_before": before, "database_bytes_after": after}
+
+
+# Global instance
+content_store = ContentStore(
+    enabled=settings.CONTENT_STORE_ENABLED,
+    level=settings.CONTENT_STORE_LEVEL,
+)
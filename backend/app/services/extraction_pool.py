@@ -0,0 +1,186 @@
+"""Extraction Pool - Run CPU-bound HTML extraction off the event loop"""
+
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional, TypeVar
+
+from app.config import settings
+from app.services.html_extractor import ExtractedPage, extract_page
+
+T = TypeVar("T")
+
+
+class ExtractionPool:
+    """
+    Bounded executor for readability/lxml extraction.
+
+    At most `queue_size` extractions may be pending (running or waiting for a
+    worker); further submissions wait for a free slot, which applies
+    backpressure to the fetch side instead of piling up HTML in memory.
+    """
+
+    def __init__(
+        self,
+        mode: str = "process",
+        workers: int = 2,
+        queue_size: int = 16,
+        timeout: float = 10.0,
+    ):
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.queue_size = max(self.workers, queue_size)
+        self.timeout = timeout
+
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Metrics
+        self._waiting = 0
+        self._in_flight = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._timed_out = 0
+        self._recycled = 0  # 因超时或进程崩溃而替换执行器的次数
+        self._total_seconds = 0.0
+
+    def _get_executor(self) -> Optional[Executor]:
+        """Lazily create the executor (None means run inline)"""
+        if self.mode == "inline":
+            return None
+        if self._executor is None:
+            if self.mode == "thread":
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="extract"
+                )
+            else:
+                # spawn 避免在多线程进程（uvicorn / bot）中 fork
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+        return self._executor
+
+    def _retire(self, executor: Executor) -> None:
+        """
+        Replace a broken executor or one with a stuck worker. Worker
+        processes are stopped; other calls still running on them fail with
+        BrokenProcessPool and are retried on the new pool. Threads cannot
+        be stopped and finish in the background.
+        """
+        if self._executor is executor:
+            self._executor = None
+            self._recycled += 1
+        if isinstance(executor, ProcessPoolExecutor):
+            for process in list((executor._processes or {}).values()):
+                process.terminate()
+        executor.shutdown(wait=False)
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        """Semaphore bound to the running loop (CLI may run several loops)"""
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._loop is not loop:
+            self._slots = asyncio.Semaphore(self.queue_size)
+            self._loop = loop
+        return self._slots
+
+    async def extract(self, html: str, url: str, max_length: int = 20000) -> ExtractedPage:
+        """Extract an HTML page in the configured executor"""
+        return await self.run(extract_page, html, url, max_length, label=url)
+
+    async def run(self, func: Callable[..., T], *args, label: str = "") -> T:
+        """
+        Run a CPU-bound, picklable function in the configured executor.
+
+        A call hitting a broken process pool is retried once on a new
+        pool.
+
+        Raises:
+            TimeoutError: if the call takes longer than `timeout` seconds
+        """
+        self._submitted += 1
+        slots = self._get_slots()
+
+        self._waiting += 1
+        try:
+            await slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        self._in_flight += 1
+        start = time.perf_counter()
+        executor = None
+        try:
+            for attempt in range(2):
+                executor = self._get_executor()
+                if executor is None:
+                    result = func(*args)
+                    break
+                loop = asyncio.get_running_loop()
+                try:
+                    result = await asyncio.wait_for(
+                        loop.run_in_executor(executor, func, *args),
+                        timeout=self.timeout,
+                    )
+                    break
+                except BrokenProcessPool:
+                    # A worker died (crash, OOM kill, or recycled below); retry once on a fresh pool
+                    self._retire(executor)
+                    if attempt:
+                        raise
+                    print(f"Extraction pool broken, retrying: {label}")
+            self._completed += 1
+            return result
+
+        except asyncio.TimeoutError:
+            # The timed-out worker would stay busy, so the pool is replaced
+            self._timed_out += 1
+            if executor is not None:
+                self._retire(executor)
+            raise TimeoutError(f"内容提取超时 ({self.timeout}s): {label}")
+
+        except Exception:
+            self._failed += 1
+            raise
+
+        finally:
+            self._total_seconds += time.perf_counter() - start
+            self._in_flight -= 1
+            slots.release()
+
+    def stats(self) -> dict:
+        """Pool size and throughput counters"""
+        finished = self._completed + self._failed + self._timed_out
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "timeout": self.timeout,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "submitted": self._submitted,
+            "completed": self._completed,
+            "failed": self._failed,
+            "timed_out": self._timed_out,
+            "recycled": self._recycled,
+            "avg_seconds": round(self._total_seconds / finished, 4) if finished else 0.0,
+        }
+
+    def shutdown(self) -> None:
+        """Stop worker processes/threads"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Global instance
+extraction_pool = ExtractionPool(
+    mode=settings.EXTRACTION_EXECUTOR,
+    workers=settings.EXTRACTION_WORKERS,
+    queue_size=settings.EXTRACTION_QUEUE_SIZE,
+    timeout=settings.EXTRACTION_TIMEOUT,
+)
@@ -0,0 +1,268 @@
+"""Favicon Cache Service - One normalized PNG favicon per domain on local disk"""
+
+import asyncio
+import base64
+import hashlib
+import io
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from PIL import Image
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app.config import settings
+from app.database import engine
+from app.models import Favicon, Link
+from app.services.extraction_pool import extraction_pool
+from app.services.fetch_scheduler import fetch_scheduler
+from app.services.html_extractor import default_favicon_url
+from app.services.image_cache import IMMUTABLE
+
+# Favicons are tiny; anything larger is not worth decoding
+MAX_SOURCE_BYTES = 1024 * 1024
+
+
+def normalize_favicon(data: bytes, size: int) -> bytes:
+    """
+    Optimized RGBA PNG of an icon, fit into size x size. ICO files are
+    decoded at their largest embedded size. Runs in the extraction pool.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        image = source.convert("RGBA")
+    if image.width > size or image.height > size:
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def favicon_hash(png: bytes) -> str:
+    return hashlib.sha256(png).hexdigest()[:16]
+
+
+class FaviconCache:
+    """
+    Favicons of saved links, fetched once per Link.domain.
+
+    The icon URL extracted from the domain's most recent link is tried
+    first, then /favicon.ico of its origin. Downloads go through
+    fetch_scheduler and are normalized to a PNG of at most `size` pixels
+    in the extraction pool. Files are named by a digest of the PNG, so
+    domains with identical icons (shared hosting, CDNs, platforms) share
+    one file; the favicon table maps each domain to its digest.
+
+    Icons are refetched after `refresh_seconds` (the old one keeps being
+    served meanwhile); domains without a usable icon are not retried for
+    `retry_seconds`. Only domains of saved links are served, so the
+    endpoint cannot be used to fetch arbitrary hosts.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        size: int = 32,
+        refresh_seconds: float = 30 * 86400,
+        retry_seconds: float = 86400,
+    ):
+        self.directory = Path(directory)
+        self.size = size
+        self.refresh_seconds = refresh_seconds
+        self.retry_seconds = retry_seconds
+
+        self._pending: Dict[str, asyncio.Future] = {}  # 正在下载的域名，并发请求共用
+
+        # Counters since process start
+        self.hits = 0
+        self.fetched = 0
+        self.deduplicated = 0  # 与其他域名图标相同，未新增文件
+        self.failures = 0
+
+    def path(self, content_hash: str) -> Path:
+        return self.directory / f"{content_hash}.png"
+
+    def _lookup(self, domains: List[str]) -> Dict[str, Favicon]:
+        with Session(engine) as session:
+            rows = session.exec(select(Favicon).where(Favicon.domain.in_(domains))).all()
+        return {row.domain: row for row in rows}
+
+    def _is_due(self, entry: Optional[Favicon]) -> bool:
+        """Whether a domain's icon should be (re)fetched"""
+        if entry is None:
+            return True
+        if entry.content_hash and not self.path(entry.content_hash).exists():
+            return True  # file removed from disk
+        age = (datetime.utcnow() - entry.fetched_at).total_seconds()
+        return age >= (self.refresh_seconds if entry.content_hash else self.retry_seconds)
+
+    async def get(self, domain: str) -> Optional[str]:
+        """Content hash of a domain's icon, fetching it if needed; None if unavailable"""
+        return (await self.get_many([domain])).get(domain)
+
+    async def get_many(self, domains: List[str], timeout: Optional[float] = None) -> Dict[str, Optional[str]]:
+        """
+        Content hashes of the icons of several domains. Missing icons are
+        fetched concurrently; those not done within `timeout` are None here
+        and keep downloading in the background.
+        """
+        entries = self._lookup(domains)
+        result: Dict[str, Optional[str]] = {}
+        waiting: Dict[str, asyncio.Future] = {}
+
+        for domain in domains:
+            entry = entries.get(domain)
+            current = entry.content_hash if entry else None
+            if current and self.path(current).exists():
+                result[domain] = current
+                self.hits += 1
+                if self._is_due(entry):
+                    self._start(domain)  # 刷新期间继续使用旧图标
+                continue
+            result[domain] = None
+            if self._is_due(entry):
+                waiting[domain] = self._start(domain)
+
+        if waiting:
+            await asyncio.wait(
+                [asyncio.shield(future) for future in waiting.values()], timeout=timeout
+            )
+            for domain, future in waiting.items():
+                if future.done() and not future.cancelled() and future.exception() is None:
+                    result[domain] = future.result()
+        return result
+
+    def _start(self, domain: str) -> asyncio.Future:
+        pending = self._pending.get(domain)
+        if pending is None:
+            pending = self._pending[domain] = asyncio.ensure_future(self._fetch(domain))
+            pending.add_done_callback(lambda _: self._pending.pop(domain, None))
+        return pending
+
+    def _candidates(self, domain: str) -> List[str]:
+        """Icon URLs to try for a domain: the extracted icon of its latest link, then /favicon.ico"""
+        with Session(engine) as session:
+            link = session.exec(
+                select(Link.url, Link.favicon_url)
+                .where(Link.domain == domain)
+                .order_by(Link.id.desc())
+                .limit(1)
+            ).first()
+        if link is None:
+            return []
+        url, favicon_url = link
+        candidates = [favicon_url] if favicon_url else []
+        fallback = default_favicon_url(url)
+        if fallback not in candidates:
+            candidates.append(fallback)
+        return candidates
+
+    async def _fetch(self, domain: str) -> Optional[str]:
+        """Download and store a domain's icon; the content hash, or None if unavailable"""
+        candidates = self._candidates(domain)
+        if not candidates:
+            return None  # not a domain of any saved link
+
+        for url in candidates:
+            try:
+                data, _ = await fetch_scheduler.download(url, MAX_SOURCE_BYTES)
+                png = await extraction_pool.run(normalize_favicon, data, self.size, label=url)
+            except Exception as e:
+                print(f"Favicon failed for {url}: {e}")
+                continue
+
+            content_hash = favicon_hash(png)
+            self._write(content_hash, png)
+            self._record(domain, url, content_hash)
+            self.fetched += 1
+            return content_hash
+
+        self.failures += 1
+        self._record(domain, None, None)
+        return None
+
+    def _write(self, content_hash: str, png: bytes) -> None:
+        path = self.path(content_hash)
+        if path.exists():
+            self.deduplicated += 1
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(png)
+        os.replace(tmp, path)
+
+    def _record(self, domain: str, source_url: Optional[str], content_hash: Optional[str]) -> None:
+        """Store a fetch result; a failed refresh keeps the previous icon"""
+        with Session(engine) as session:
+            entry = session.get(Favicon, domain) or Favicon(domain=domain)
+            previous = entry.content_hash
+            if content_hash or not previous:
+                entry.source_url = source_url
+                entry.content_hash = content_hash
+            entry.fetched_at = datetime.utcnow()
+            session.add(entry)
+            session.commit()
+
+            if previous and previous != entry.content_hash:
+                # Drop the old file unless another domain still uses it
+                shared = session.exec(
+                    select(func.count(Favicon.domain)).where(Favicon.content_hash == previous)
+                ).one()
+                if not shared:
+                    self.path(previous).unlink(missing_ok=True)
+
+    def read(self, content_hash: str) -> Optional[bytes]:
+        try:
+            return self.path(content_hash).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def data_uri(self, content_hash: str) -> Optional[str]:
+        """Icon as a data: URI, for embedding a page's icons in one response"""
+        png = self.read(content_hash)
+        if png is None:
+            return None
+        return "data:image/png;base64," + base64.b64encode(png).decode("ascii")
+
+    def cache_control(self, content_hash: str, version: Optional[str]) -> str:
+        """Immutable when requested with the content hash as ?v="""
+        if version and version == content_hash:
+            return IMMUTABLE
+        return "public, max-age=86400"
+
+    def stats(self) -> dict:
+        with Session(engine) as session:
+            domains, with_icon, distinct = session.exec(
+                select(
+                    func.count(Favicon.domain),
+                    func.count(Favicon.content_hash),
+                    func.count(func.distinct(Favicon.content_hash)),
+                )
+            ).one()
+            link_domains = session.exec(select(func.count(func.distinct(Link.domain)))).one()
+
+        files = list(self.directory.glob("*.png")) if self.directory.exists() else []
+        return {
+            "directory": str(self.directory),
+            "link_domains": link_domains,
+            "domains": domains,
+            "with_icon": with_icon,
+            "without_icon": domains - with_icon,
+            "distinct_icons": distinct,
+            "files": len(files),
+            "bytes": sum(f.stat().st_size for f in files),
+            "hits": self.hits,
+            "fetched": self.fetched,
+            "deduplicated": self.deduplicated,
+            "failures": self.failures,
+        }
+
+
+# Global instance
+favicon_cache = FaviconCache(
+    directory=settings.FAVICON_DIR,
+    size=settings.FAVICON_SIZE,
+    refresh_seconds=settings.FAVICON_REFRESH_DAYS * 86400,
+    retry_seconds=settings.FAVICON_RETRY_HOURS * 3600,
+)
@@ -0,0 +1,331 @@
+"""Fetch Scheduler - Per-domain politeness and robots.txt in front of WebScraper"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar, Union
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+import httpx
+
+from app.config import settings
+from app.services.web_scraper import ScrapedContent, WebScraper, web_scraper
+
+T = TypeVar("T")
+
+
+@dataclass
+class DomainPolicy:
+    """Politeness policy for one host (or a domain and its subdomains)"""
+
+    concurrency: int = 2  # 同时进行的请求数
+    delay: float = 1.0  # 相邻两次请求开始之间的最小间隔（秒）
+
+
+class _HostState:
+    """Runtime state of a single host"""
+
+    def __init__(self, policy: DomainPolicy):
+        self.policy = policy
+        self.slots = asyncio.Semaphore(max(1, policy.concurrency))
+        self.start_lock = asyncio.Lock()
+        self.next_start = 0.0  # monotonic 时间
+        self.blocked_until = 0.0  # Retry-After 到期时间
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+
+
+class RobotsCache:
+    """robots.txt lookups cached per origin"""
+
+    def __init__(self, scraper: WebScraper, ttl: float = 86400, agent: str = "LimeStar"):
+        self.scraper = scraper
+        self.ttl = ttl
+        self.agent = agent
+        # origin -> (expires_at, parser or None when unreachable)
+        self._cache: Dict[str, Tuple[float, Optional[RobotFileParser]]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def reset_locks(self) -> None:
+        self._locks.clear()
+
+    async def _get(self, url: str) -> Optional[RobotFileParser]:
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+
+        cached = self._cache.get(origin)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        lock = self._locks.setdefault(origin, asyncio.Lock())
+        async with lock:
+            # Another task may have filled the cache while we waited
+            cached = self._cache.get(origin)
+            if cached and cached[0] > time.monotonic():
+                return cached[1]
+
+            content = await self.scraper.fetch_robots(origin)
+            if content is None:
+                # 无法访问时视为允许，但只缓存较短时间
+                parser, ttl = None, min(self.ttl, 600)
+            else:
+                parser, ttl = RobotFileParser(), self.ttl
+                parser.parse(content.splitlines())
+
+            self._cache[origin] = (time.monotonic() + ttl, parser)
+            return parser
+
+    async def can_fetch(self, url: str) -> bool:
+        parser = await self._get(url)
+        return parser is None or parser.can_fetch(self.agent, url)
+
+    async def crawl_delay(self, url: str) -> Optional[float]:
+        parser = await self._get(url)
+        if parser is None:
+            return None
+        delay = parser.crawl_delay(self.agent)
+        return float(delay) if delay is not None else None
+
+
+class FetchScheduler:
+    """
+    Schedules WebScraper fetches with per-domain limits.
+
+    Requests to different hosts run in parallel (up to max_concurrency);
+    requests to the same host respect its concurrency, minimum delay,
+    robots.txt Crawl-delay and any Retry-After sent with 429/503.
+    """
+
+    def __init__(
+        self,
+        scraper: WebScraper,
+        max_concurrency: int = 8,
+        default_policy: Optional[DomainPolicy] = None,
+        policies: Optional[Dict[str, DomainPolicy]] = None,
+        respect_robots: bool = True,
+        max_retries: int = 2,
+        max_retry_after: float = 120.0,
+    ):
+        self.scraper = scraper
+        self.max_concurrency = max_concurrency
+        self.default_policy = default_policy or DomainPolicy()
+        self.policies = {k.lower(): v for k, v in (policies or {}).items()}
+        self.respect_robots = respect_robots
+        self.max_retries = max_retries
+        self.max_retry_after = max_retry_after
+        self.robots = RobotsCache(scraper)
+
+        self._hosts: Dict[str, _HostState] = {}
+        self._global: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._robots_blocked = 0
+
+    def _check_loop(self) -> None:
+        """asyncio primitives are bound to a loop; reset them if the loop changed"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._global = asyncio.Semaphore(self.max_concurrency)
+            self._hosts.clear()
+            self.robots.reset_locks()
+
+    def _host_key(self, host: str) -> Tuple[str, DomainPolicy]:
+        """Configured domain matching host (suffix match) or the host itself"""
+        host = host.lower()
+        for domain, policy in self.policies.items():
+            if host == domain or host.endswith("." + domain):
+                return domain, policy
+        return host, self.default_policy
+
+    def _get_host(self, url: str) -> _HostState:
+        key, policy = self._host_key(urlparse(url).hostname or "")
+        state = self._hosts.get(key)
+        if state is None:
+            state = self._hosts[key] = _HostState(policy)
+        return state
+
+    @staticmethod
+    def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """Retry-After as delta-seconds or HTTP-date"""
+        if not value:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    async def fetch(self, url: str, bulk: bool = False) -> ScrapedContent:
+        """
+        Fetch a URL under the host's politeness policy.
+
+        Args:
+            url: URL to fetch
+            bulk: Batch traffic (rebuilds); robots.txt is only consulted for
+                bulk fetches, links submitted by a user are always fetched
+
+        Raises:
+            PermissionError: robots.txt disallows a bulk fetch
+        """
+        self._check_loop()
+        state = self._get_host(url)
+
+        delay = state.policy.delay
+        if bulk and self.respect_robots:
+            if not await self.robots.can_fetch(url):
+                self._robots_blocked += 1
+                raise PermissionError(f"robots.txt 禁止抓取: {url}")
+            crawl_delay = await self.robots.crawl_delay(url)
+            if crawl_delay:
+                delay = max(delay, crawl_delay)
+
+        return await self._scheduled(state, delay, self._global, lambda: self.scraper.fetch(url))
+
+    async def download(self, url: str, max_bytes: int) -> Tuple[bytes, str]:
+        """Body and content type of a URL (see WebScraper.download) under the host's politeness policy"""
+        self._check_loop()
+        state = self._get_host(url)
+        return await self._scheduled(
+            state, state.policy.delay, self._global, lambda: self.scraper.download(url, max_bytes)
+        )
+
+    async def check(
+        self, url: str, limit: asyncio.Semaphore, timeout: float = 10.0
+    ) -> Tuple[int, str]:
+        """
+        Status code and final URL of a URL (see WebScraper.check) under the
+        host's politeness policy.
+
+        `limit` replaces the global fetch concurrency: checks are cheap and
+        run with a much higher overall concurrency than page fetches, while
+        each host still gets at most its own concurrency and delay. 429/503
+        are retried like fetches; the last status is returned.
+        """
+        self._check_loop()
+
+        async def call() -> Tuple[int, str]:
+            status, final_url, retry_after = await self.scraper.check(url, timeout=timeout)
+            if status in (429, 503):
+                # Let _scheduled back off (honouring Retry-After) and retry
+                request = httpx.Request("HEAD", url)
+                headers = {"retry-after": retry_after} if retry_after else None
+                raise httpx.HTTPStatusError(
+                    f"HTTP {status}",
+                    request=request,
+                    response=httpx.Response(status, headers=headers, request=request),
+                )
+            return status, final_url
+
+        state = self._get_host(url)
+        try:
+            return await self._scheduled(state, state.policy.delay, limit, call)
+        except httpx.HTTPStatusError as e:
+            return e.response.status_code, url
+
+    async def _scheduled(
+        self,
+        state: _HostState,
+        delay: float,
+        limit: asyncio.Semaphore,
+        call: Callable[[], Awaitable[T]],
+    ) -> T:
+        """Run a request against a host: slots, start spacing, Retry-After backoff"""
+        attempt = 0
+        while True:
+            async with state.slots:
+                acquired = False
+                try:
+                    # Space out request starts for this host. The start time is
+                    # taken once the global slot is held too, so requests queued
+                    # on `limit` cannot start back-to-back against one host
+                    async with state.start_lock:
+                        while True:
+                            wait = max(state.next_start, state.blocked_until) - time.monotonic()
+                            if wait > 0:
+                                await asyncio.sleep(wait)
+                            await limit.acquire()
+                            acquired = True
+                            if max(state.next_start, state.blocked_until) <= time.monotonic():
+                                break
+                            # Blocked by a Retry-After meanwhile: wait again without the slot
+                            limit.release()
+                            acquired = False
+                        state.next_start = time.monotonic() + delay
+
+                    state.requests += 1
+                    try:
+                        return await call()
+
+                    except httpx.HTTPStatusError as e:
+                        status = e.response.status_code
+                        if status not in (429, 503) or attempt >= self.max_retries:
+                            state.errors += 1
+                            raise
+                        retry_after = self._parse_retry_after(
+                            e.response.headers.get("retry-after")
+                        )
+                        if retry_after is None:
+                            retry_after = max(delay, 1.0) * 2 ** attempt
+                        if retry_after > self.max_retry_after:
+                            state.errors += 1
+                            raise
+                        # Block the whole host, not just this request
+                        state.blocked_until = max(
+                            state.blocked_until, time.monotonic() + retry_after
+                        )
+                        state.retries += 1
+                        attempt += 1
+
+                    except Exception:
+                        state.errors += 1
+                        raise
+                finally:
+                    if acquired:
+                        limit.release()
+
+    async def fetch_many(
+        self, urls: List[str], bulk: bool = True
+    ) -> List[Union[ScrapedContent, Exception]]:
+        """Fetch many URLs concurrently; failures are returned in place"""
+        return await asyncio.gather(
+            *(self.fetch(url, bulk=bulk) for url in urls), return_exceptions=True
+        )
+
+    def stats(self) -> dict:
+        """Per-host counters"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "robots_blocked": self._robots_blocked,
+            "hosts": {
+                host: {
+                    "concurrency": state.policy.concurrency,
+                    "delay": state.policy.delay,
+                    "requests": state.requests,
+                    "retries": state.retries,
+                    "errors": state.errors,
+                    "blocked_for": round(max(0.0, state.blocked_until - time.monotonic()), 1),
+                }
+                for host, state in self._hosts.items()
+            },
+        }
+
+
+# Global instance
+fetch_scheduler = FetchScheduler(
+    web_scraper,
+    max_concurrency=settings.FETCH_MAX_CONCURRENCY,
+    default_policy=DomainPolicy(
+        concurrency=settings.FETCH_DOMAIN_CONCURRENCY,
+        delay=settings.FETCH_DOMAIN_DELAY,
+    ),
+    policies={
+        domain: DomainPolicy(concurrency=concurrency, delay=delay)
+        for domain, (concurrency, delay) in settings.get_domain_policies().items()
+    },
+    respect_robots=settings.FETCH_RESPECT_ROBOTS,
+)
@@ -0,0 +1,123 @@
+"""HTML Extractor - Single-pass page extraction on one lxml tree
+
+The page is parsed exactly once. Metadata (title, og:*, twitter:*, icons) is
+collected in a single walk over <title>/<meta>/<link>, then the same tree is
+handed to readability for article scoring and the text is read straight from
+the resulting article node.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Optional
+from urllib.parse import urljoin, urlparse
+
+from lxml.html import HtmlElement
+from readability import Document
+from readability.htmls import build_doc, norm_title
+
+
+@dataclass
+class ExtractedPage:
+    """Content and metadata extracted from an HTML page"""
+
+    title: Optional[str]
+    text_content: str
+    favicon_url: Optional[str]
+    og_image_url: Optional[str]
+    og_description: Optional[str]
+
+
+# Elements whose end starts a new line of extracted text
+_BLOCK_TAGS = (
+    "p", "div", "section", "article", "li", "dd", "dt", "tr", "br", "pre",
+    "blockquote", "h1", "h2", "h3", "h4", "h5", "h6", "table", "ul", "ol",
+)
+_BREAK = "\ue000"  # private use character, never present in real text
+
+
+class _TreeDocument(Document):
+    """readability Document that returns plain text instead of serialized HTML"""
+
+    def get_clean_html(self):
+        # summary() stores the sanitized article node in self.html right
+        # before calling this hook, so text comes directly from the tree.
+        # Block elements end with a marker so paragraphs become lines.
+        for element in self.html.iter(*_BLOCK_TAGS):
+            element.tail = _BREAK + (element.tail or "")
+        text = " ".join(
+            text.strip() for text in self.html.itertext() if text and text.strip()
+        )
+        lines = (" ".join(line.split()) for line in text.split(_BREAK))
+        return "\n".join(line for line in lines if line)
+
+
+def _collect_metadata(doc: HtmlElement) -> Dict[str, str]:
+    """Collect first non-empty value of each interesting head element in one pass"""
+    meta: Dict[str, str] = {}
+
+    for elem in doc.iter("title", "meta", "link"):
+        if elem.tag == "title":
+            text = elem.text_content().strip()
+            if text:
+                meta.setdefault("title", text)
+
+        elif elem.tag == "meta":
+            content = elem.get("content")
+            if not content:
+                continue
+            key = elem.get("property") or elem.get("name")
+            if key:
+                meta.setdefault(key.strip().lower(), content)
+
+        else:  # <link>
+            rel = (elem.get("rel") or "").lower()
+            href = elem.get("href")
+            # "icon" also matches "shortcut icon" and "apple-touch-icon"
+            if href and "icon" in rel:
+                meta.setdefault("icon", href)
+
+    return meta
+
+
+def default_favicon_url(url: str) -> str:
+    """Conventional /favicon.ico location for a page's origin"""
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}/favicon.ico"
+
+
+def extract_page(html: str, url: str, max_length: int = 20000) -> ExtractedPage:
+    """
+    Extract readable text and metadata from an HTML document.
+
+    Args:
+        html: Decoded HTML source
+        url: Final page URL, used to resolve relative icon and image links
+        max_length: Maximum length of extracted text
+
+    Returns:
+        ExtractedPage with title, text and metadata
+    """
+    doc, _ = build_doc(html)
+
+    # Metadata must be read before readability mutates the tree
+    meta = _collect_metadata(doc)
+
+    content = _TreeDocument(doc).summary(html_partial=True)
+    content = content[:max_length] if content else ""
+
+    title = meta.get("title")
+    title = norm_title(title) if title else meta.get("og:title")
+
+    if meta.get("icon"):
+        favicon_url = urljoin(url, meta["icon"])
+    else:
+        favicon_url = default_favicon_url(url)
+
+    og_image = meta.get("og:image") or meta.get("twitter:image")
+
+    return ExtractedPage(
+        title=title,
+        text_content=content,
+        favicon_url=favicon_url,
+        og_image_url=urljoin(url, og_image) if og_image else None,
+        og_description=meta.get("og:description") or meta.get("description"),
+    )
@@ -0,0 +1,245 @@
+"""Image Cache Service - Resized WebP thumbnails of og:images on local disk"""
+
+import asyncio
+import hashlib
+import io
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from app.config import settings
+from app.services.extraction_pool import extraction_pool
+from app.services.fetch_scheduler import fetch_scheduler
+
+# Refuse to decode images larger than this (decompression bombs)
+Image.MAX_IMAGE_PIXELS = 40_000_000
+
+PLACEHOLDER_WIDTH = 16
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def image_version(url: str) -> str:
+    """Cache key of a source image URL, also used as ?v= in thumbnail URLs"""
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+
+
+def thumbnail_url(link_id: int, og_image_url: Optional[str]) -> Optional[str]:
+    """Versioned proxy URL for a link's og:image; changes whenever the image URL does"""
+    if not og_image_url:
+        return None
+    return f"/api/images/{link_id}?v={image_version(og_image_url)}"
+
+
+def _encode(image: Image.Image, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, "WEBP", quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def render_thumbnails(
+    data: bytes, widths: List[int], quality: int
+) -> Tuple[Dict[int, bytes], bytes]:
+    """
+    WebP thumbnails of an image at each width (never upscaled) and a tiny
+    blurred placeholder. Runs in the extraction pool.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        # JPEG: let the decoder downscale, much faster for multi-megapixel photos
+        source.draft("RGB", (max(widths), max(widths)))
+        image = ImageOps.exif_transpose(source)  # 首帧；按 EXIF 方向旋转
+        if image.mode not in ("RGB", "RGBA"):
+            has_alpha = image.mode in ("LA", "PA") or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+
+        thumbnails = {}
+        for width in widths:
+            if image.width > width:
+                height = max(1, round(image.height * width / image.width))
+                resized = image.resize((width, height), Image.Resampling.LANCZOS)
+            else:
+                resized = image
+            thumbnails[width] = _encode(resized, quality)
+
+        small = image.copy()
+        small.thumbnail((PLACEHOLDER_WIDTH, PLACEHOLDER_WIDTH))
+        placeholder = _encode(small, 30)
+
+    return thumbnails, placeholder
+
+
+class ImageCache:
+    """
+    Thumbnails of og:images, fetched once and kept on disk.
+
+    The source image is downloaded through fetch_scheduler (shared client,
+    per-host limits) and decoded in the extraction pool. Every configured
+    width plus a 16px placeholder for progressive rendering are written
+    at once as <key>-<width>.webp / <key>-placeholder.webp, the key being
+    a digest of the image URL. Serving a file touches it; once the
+    directory grows beyond `max_bytes`, the least recently served images
+    are evicted. Images that fail to download or decode are not retried
+    for `retry_seconds`.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 500 * 1024 * 1024,
+        widths: Optional[List[int]] = None,
+        quality: int = 75,
+        max_source_bytes: int = 10 * 1024 * 1024,
+        retry_seconds: float = 86400,
+    ):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.widths = widths or [320, 640]
+        self.quality = quality
+        self.max_source_bytes = max_source_bytes
+        self.retry_seconds = retry_seconds
+
+        self._size: Optional[int] = None  # 目录总大小，首次使用时统计
+        self._pending: Dict[str, asyncio.Future] = {}  # 正在生成的图片，并发请求共用
+
+        # Counters since process start
+        self.hits = 0
+        self.generated = 0
+        self.failures = 0
+        self.evicted = 0
+
+    def _path(self, key: str, name: str) -> Path:
+        return self.directory / f"{key}-{name}.webp"
+
+    def _failed_marker(self, key: str) -> Path:
+        return self.directory / f"{key}.failed"
+
+    def _width_for(self, requested: Optional[int]) -> int:
+        """Smallest configured width covering the requested one"""
+        if requested is None:
+            return self.widths[0]
+        return next((w for w in self.widths if w >= requested), self.widths[-1])
+
+    async def thumbnail(self, url: str, width: Optional[int] = None) -> Optional[Path]:
+        """Thumbnail file for an image URL, generating it if needed; None if unavailable"""
+        return await self._get(url, str(self._width_for(width)))
+
+    async def placeholder(self, url: str) -> Optional[Path]:
+        """Tiny placeholder file for an image URL; None if unavailable"""
+        return await self._get(url, "placeholder")
+
+    async def _get(self, url: str, name: str) -> Optional[Path]:
+        key = image_version(url)
+        path = self._path(key, name)
+        if not path.exists():
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = asyncio.ensure_future(self._generate(url, key))
+                pending.add_done_callback(lambda _: self._pending.pop(key, None))
+            if not await asyncio.shield(pending):
+                return None
+        else:
+            self.hits += 1
+
+        try:
+            os.utime(path)  # 记录最近访问时间，用于 LRU 淘汰
+        except FileNotFoundError:
+            return None  # evicted in the meantime
+        return path
+
+    async def _generate(self, url: str, key: str) -> bool:
+        """Download and render every size of an image; False if unavailable"""
+        marker = self._failed_marker(key)
+        if marker.exists() and time.time() - marker.stat().st_mtime < self.retry_seconds:
+            return False
+
+        try:
+            data, _ = await fetch_scheduler.download(url, self.max_source_bytes)
+            thumbnails, placeholder = await extraction_pool.run(
+                render_thumbnails, data, self.widths, self.quality, label=url
+            )
+        except Exception as e:
+            print(f"Thumbnail failed for {url}: {e}")
+            self.failures += 1
+            self.directory.mkdir(parents=True, exist_ok=True)
+            marker.touch()
+            return False
+
+        files = {str(width): body for width, body in thumbnails.items()}
+        files["placeholder"] = placeholder
+        self._write(key, files)
+        marker.unlink(missing_ok=True)
+        self.generated += 1
+        return True
+
+    def _write(self, key: str, files: Dict[str, bytes]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        written = 0
+        for name, body in files.items():
+            path = self._path(key, name)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_bytes(body)
+            os.replace(tmp, path)
+            written += len(body)
+
+        self._size = self._scan_size() if self._size is None else self._size + written
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _scan_size(self) -> int:
+        if not self.directory.exists():
+            return 0
+        return sum(entry.stat().st_size for entry in os.scandir(self.directory) if entry.is_file())
+
+    def _evict(self) -> None:
+        """Delete least recently served images until 90% of max_bytes is left"""
+        groups: Dict[str, List[os.DirEntry]] = {}
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".webp"):
+                groups.setdefault(entry.name.split("-", 1)[0], []).append(entry)
+
+        # An image counts as used when any of its sizes was served
+        order = sorted(groups.values(), key=lambda files: max(f.stat().st_mtime for f in files))
+        target = self.max_bytes * 0.9
+        size = self._scan_size()
+        for files in order:
+            if size <= target:
+                break
+            for entry in files:
+                size -= entry.stat().st_size
+                Path(entry.path).unlink(missing_ok=True)
+            self.evicted += 1
+        self._size = size
+
+    def cache_control(self, url: str, version: Optional[str]) -> str:
+        """Immutable when requested through the versioned URL of the current image"""
+        if version and version == image_version(url):
+            return IMMUTABLE
+        return "public, max-age=86400"
+
+    def stats(self) -> dict:
+        if self._size is None:
+            self._size = self._scan_size()
+        return {
+            "directory": str(self.directory),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "widths": self.widths,
+            "hits": self.hits,
+            "generated": self.generated,
+            "failures": self.failures,
+            "evicted": self.evicted,
+        }
+
+
+# Global instance
+image_cache = ImageCache(
+    directory=settings.IMAGE_CACHE_DIR,
+    max_bytes=settings.IMAGE_CACHE_MAX_MB * 1024 * 1024,
+    widths=settings.get_thumb_widths(),
+    quality=settings.IMAGE_THUMB_QUALITY,
+    max_source_bytes=int(settings.IMAGE_MAX_SOURCE_MB * 1024 * 1024),
+    retry_seconds=settings.IMAGE_RETRY_HOURS * 3600,
+)
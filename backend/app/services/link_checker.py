@@ -0,0 +1,241 @@
+"""Link Checker Service - Concurrent dead-link and redirect detection"""
+
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+from sqlalchemy import and_, func, or_, update
+from sqlmodel import Session, select
+
+from app.config import settings
+from app.database import engine
+from app.models import Link
+from app.services.fetch_scheduler import fetch_scheduler
+
+# 这些状态码说明链接仍然存在，只是需要登录或暂时限流
+ALIVE_ERROR_STATUSES = (401, 403, 429)
+
+HEALTH_FILTERS = ("ok", "broken", "redirected", "unchecked")
+
+# (完成数, 总数)
+CheckProgressCallback = Callable[[int, int], Awaitable[None]]
+
+
+def health_condition(health: str):
+    """SQL condition selecting links by health: ok / broken / redirected / unchecked"""
+    broken = or_(
+        Link.http_status == 0,
+        and_(Link.http_status >= 400, Link.http_status.not_in(ALIVE_ERROR_STATUSES)),
+    )
+    if health == "broken":
+        return broken
+    if health == "ok":
+        return and_(Link.http_status.is_not(None), ~broken)
+    if health == "redirected":
+        return Link.final_url.is_not(None)
+    if health == "unchecked":
+        return Link.checked_at.is_(None)
+    raise ValueError(f"Unknown health filter: {health}")
+
+
+def _interleave_hosts(links: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+    """Round-robin over hosts, so concurrent checks spread across domains"""
+    by_host: Dict[str, List[Tuple[int, str]]] = defaultdict(list)
+    for link in links:
+        by_host[(urlparse(link[1]).hostname or "").lower()].append(link)
+
+    queues = sorted(by_host.values(), key=len, reverse=True)
+    ordered = []
+    for i in range(len(queues[0]) if queues else 0):
+        ordered.extend(queue[i] for queue in queues if i < len(queue))
+    return ordered
+
+
+class LinkChecker:
+    """
+    Checks every link for dead pages and redirects.
+
+    Requests go through fetch_scheduler.check(): the shared scraper client
+    (HEAD, falling back to GET), each host's concurrency and delay, and
+    Retry-After backoff. Overall concurrency is `concurrency` rather than
+    the page fetch limit, and links are interleaved by host so hosts with
+    thousands of links do not hold up the rest. Results are written in
+    batches of `batch_size` rows with one bulk UPDATE each.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 64,
+        timeout: float = 10.0,
+        max_age_hours: float = 0,
+        batch_size: int = 500,
+    ):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_age_hours = max_age_hours
+        self.batch_size = batch_size
+
+        # Current or last run
+        self.running = False
+        self.progress = {"checked": 0, "total": 0, "broken": 0, "redirected": 0}
+        self.started_at: Optional[float] = None
+        self.seconds: Optional[float] = None
+
+    def select_links(
+        self, session: Session, max_age_hours: Optional[float] = None
+    ) -> List[Tuple[int, str]]:
+        """(link_id, url) pairs not checked within max_age_hours (0 = all)"""
+        max_age = self.max_age_hours if max_age_hours is None else max_age_hours
+        query = select(Link.id, Link.url).order_by(Link.id)
+        if max_age > 0:
+            cutoff = datetime.utcnow() - timedelta(hours=max_age)
+            query = query.where(or_(Link.checked_at.is_(None), Link.checked_at < cutoff))
+        return [(link_id, url) for link_id, url in session.exec(query).all()]
+
+    async def check_url(
+        self, url: str, limit: asyncio.Semaphore
+    ) -> Tuple[int, Optional[str], Optional[str]]:
+        """(status, final URL if redirected, error) of one URL; status 0 when unreachable"""
+        try:
+            status, final_url = await fetch_scheduler.check(url, limit, timeout=self.timeout)
+        except httpx.HTTPError as e:
+            return 0, None, (f"{type(e).__name__}: {e}" if str(e) else type(e).__name__)[:255]
+        except Exception as e:
+            return 0, None, f"{type(e).__name__}: {e}"[:255]
+        # "https://a.com" -> "https://a.com/" is not a redirect worth reporting
+        redirected = final_url.rstrip("/") != url.rstrip("/")
+        return status, (final_url if redirected else None), None
+
+    def _write(self, rows: List[dict]) -> None:
+        if not rows:
+            return
+        with Session(engine) as session:
+            session.execute(update(Link), rows)
+            session.commit()
+
+    async def run(
+        self,
+        link_ids: Optional[List[int]] = None,
+        max_age_hours: Optional[float] = None,
+        on_progress: Optional[CheckProgressCallback] = None,
+    ) -> dict:
+        """
+        Check links and record http_status, final_url, check_error and checked_at.
+
+        Args:
+            link_ids: Only these links; default all links not checked
+                within max_age_hours
+            max_age_hours: Overrides the configured LINK_CHECK_MAX_AGE_HOURS
+            on_progress: Awaited after every written batch
+
+        Returns:
+            Counts of this run (see stats()["last_run"])
+        """
+        if self.running:
+            raise RuntimeError("A link check is already running")
+
+        with Session(engine) as session:
+            if link_ids is None:
+                links = self.select_links(session, max_age_hours)
+            else:
+                links = [
+                    (link_id, url)
+                    for link_id, url in session.exec(
+                        select(Link.id, Link.url).where(Link.id.in_(link_ids))
+                    ).all()
+                ]
+
+        queue = list(reversed(_interleave_hosts(links)))
+        limit = asyncio.Semaphore(max(1, self.concurrency))
+        pending: List[dict] = []
+
+        self.running = True
+        self.progress = {"checked": 0, "total": len(links), "broken": 0, "redirected": 0}
+        self.started_at = time.monotonic()
+        self.seconds = None
+
+        async def flush() -> None:
+            rows = pending[:]
+            pending.clear()
+            self._write(rows)
+            if on_progress:
+                await on_progress(self.progress["checked"], len(links))
+
+        async def worker() -> None:
+            while queue:
+                link_id, url = queue.pop()
+                status, final_url, error = await self.check_url(url, limit)
+
+                self.progress["checked"] += 1
+                if status == 0 or (status >= 400 and status not in ALIVE_ERROR_STATUSES):
+                    self.progress["broken"] += 1
+                if final_url:
+                    self.progress["redirected"] += 1
+                pending.append(
+                    {
+                        "id": link_id,
+                        "http_status": status,
+                        "final_url": final_url,
+                        "check_error": error,
+                        "checked_at": datetime.utcnow(),
+                    }
+                )
+                if len(pending) >= self.batch_size:
+                    await flush()
+
+        try:
+            # More workers than request slots: workers waiting on a busy
+            # host do not leave the slots of other hosts idle
+            workers = min(len(links), max(1, self.concurrency) * 4)
+            await asyncio.gather(*(worker() for _ in range(workers)))
+            await flush()
+        finally:
+            self.running = False
+            self.seconds = round(time.monotonic() - self.started_at, 1)
+
+        print(
+            f"Link check: {self.progress['checked']} links in {self.seconds}s, "
+            f"{self.progress['broken']} broken, {self.progress['redirected']} redirected"
+        )
+        return {**self.progress, "seconds": self.seconds}
+
+    def stats(self) -> dict:
+        """Health of all links, plus the current or last run"""
+        with Session(engine) as session:
+            counts = {
+                health: session.exec(
+                    select(func.count(Link.id)).where(health_condition(health))
+                ).one()
+                for health in HEALTH_FILTERS
+            }
+            total = session.exec(select(func.count(Link.id))).one()
+            by_status = session.exec(
+                select(Link.http_status, func.count(Link.id))
+                .where(Link.http_status.is_not(None))
+                .group_by(Link.http_status)
+                .order_by(Link.http_status)
+            ).all()
+
+        elapsed = self.seconds
+        if self.running and self.started_at is not None:
+            elapsed = round(time.monotonic() - self.started_at, 1)
+
+        return {
+            "total": total,
+            **counts,
+            "by_status": {str(status): count for status, count in by_status},
+            "running": self.running,
+            "last_run": {**self.progress, "seconds": elapsed},
+        }
+
+
+# Global instance
+link_checker = LinkChecker(
+    concurrency=settings.LINK_CHECK_CONCURRENCY,
+    timeout=settings.LINK_CHECK_TIMEOUT,
+    max_age_hours=settings.LINK_CHECK_MAX_AGE_HOURS,
+)
@@ -1,12 +1,46 @@
 """Link Processor Service - Orchestrates web scraping and AI processing"""
 
+import asyncio
+import hashlib
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional, List
+from typing import Awaitable, Callable, Dict, Optional, List, Tuple
+from sqlalchemy import delete, insert, or_
 from sqlmodel import Session, select
 
-from app.models import Link, Tag, TagLinkAssociation
-from app.services.web_scraper import web_scraper
-from app.services.ai_processor import ai_processor
+from app.database import engine
+from app.models import Link, Tag, TagLinkAssociation, TagLinkAssociationStaging, TagStaging
+from app.services.content_store import content_store
+from app.services.fetch_scheduler import fetch_scheduler
+from app.services.ai_processor import PartialCallback, ai_processor
+from app.services.llm_client import LLMUnavailableError
+from app.services.related_links import related_links
+from app.services.shadow_taxonomy import shadow_taxonomy
+from app.services.tag_cooccurrence import tag_cooccurrence
+from app.services.tag_vocabulary import TagVocabulary, staging_vocabulary, tag_vocabulary
+
+# (完成数, 总数, url, 异常或 None)
+ProgressCallback = Callable[[int, int, str, Optional[Exception]], Awaitable[None]]
+
+# full: 重新处理全部链接，标签写入影子表，全部完成后一次性替换
+# stale: 只处理未处理、失败或处理版本过期的链接（不抓取其他链接）
+# changed: stale 之外再重新抓取其余链接，只有页面内容变化的才重新调用 LLM
+# full / stale 优先使用 content_store 中保存的正文，changed 总是重新抓取
+REBUILD_MODES = ("full", "stale", "changed")
+
+
+@dataclass
+class ReprocessResult:
+    """Outcome of a batch reprocess"""
+
+    total: int
+    failed: int = 0
+    skipped: int = 0  # 内容与处理版本均未变化，保留原结果
+
+
+def content_hash(title: Optional[str], text: str) -> str:
+    """Digest of the scraped page content used for change detection"""
+    return hashlib.sha256(f"{title or ''}\n{text}".encode("utf-8")).hexdigest()
 
 
 class LinkProcessor:
@@ -25,6 +59,12 @@ class LinkProcessor:
         session: Session,
         hint: Optional[str] = None,
         force: bool = False,
+        bulk: bool = False,
+        use_cache: bool = True,
+        on_partial: Optional[PartialCallback] = None,
+        skip_unchanged: bool = False,
+        staging: bool = False,
+        use_stored: bool = False,
     ) -> Link:
         """
         Process a link: fetch content, generate AI summary, and update tags.
@@ -34,6 +74,20 @@ class LinkProcessor:
             session: Database session
             hint: Optional hint to guide AI tag generation
             force: Force reprocess even if already processed
+            bulk: Part of a batch job (fetch honours robots.txt, LLM calls
+                are batched and pause while the provider is unavailable)
+            use_cache: Reuse cached LLM responses for identical prompts
+            on_partial: Receives the title and description while the first
+                LLM call is still streaming (see AIProcessor.process)
+            skip_unchanged: Keep the current result of an up-to-date link
+                (see is_current) whose page content has not changed; such
+                a link is also left untouched when the fetch fails
+            staging: Write tags into the staging tables of a full rebuild
+                (see ShadowTaxonomy); on failure the link is left untouched
+                and keeps its current tags
+            use_stored: Reuse the content stored on the last fetch (see
+                ContentStore) instead of fetching the page again; links
+                without stored content are fetched
 
         Returns:
             Updated Link object
@@ -46,16 +100,29 @@ class LinkProcessor:
         if link.is_processed and not force:
             return link
 
+        current = skip_unchanged and self.is_current(link)
+        digest = None
+        vocabulary = staging_vocabulary if staging else tag_vocabulary
+
         try:
-            # 1. Fetch web content
-            scraped = await web_scraper.fetch(link.url)
+            # 1. Fetch web content (or reuse the stored copy)
+            scraped = content_store.load(session, link.id) if use_stored else None
+            fetched = scraped is None
+            if fetched:
+                scraped = await fetch_scheduler.fetch(link.url, bulk=bulk)
+            digest = content_hash(scraped.title, scraped.text_content)
+            if current and link.content_hash == digest:
+                if fetched:
+                    content_store.save(session, link.id, scraped, digest)
+                    session.commit()
+                return link
 
             # 2. Get existing tags and categories for reference
-            existing_tags = self._get_existing_tags(session)
-            existing_categories = self._get_existing_categories(session)
+            existing_tags = vocabulary.tags()
+            existing_categories = vocabulary.categories()
 
             # 3. AI processing
-            result = await ai_processor.process_two_stage(
+            result = await ai_processor.process(
                 url=link.url,
                 title=scraped.title,
                 content=scraped.text_content,
@@ -63,6 +130,9 @@ class LinkProcessor:
                 existing_tags=existing_tags,
                 existing_categories=existing_categories,
                 hint=hint,
+                use_cache=use_cache,
+                bulk=bulk,
+                on_partial=on_partial,
             )
 
             # 4. Update link
@@ -71,21 +141,54 @@ class LinkProcessor:
             link.favicon_url = scraped.favicon_url
             link.og_image_url = scraped.og_image_url
             link.is_processed = True
-            link.updated_at = datetime.utcnow()
+            link.processing_failed = False
+            link.processing_version = ai_processor.version
+            link.content_hash = digest
+            link.processed_at = link.updated_at = datetime.utcnow()
 
             # 5. Handle tags (category + sub-tags)
-            self._update_link_tags(link, result.category, result.tags, session)
+            self._update_link_tags(link, result.category, result.tags, session, staging=staging)
+            if fetched:
+                content_store.save(session, link.id, scraped, digest)
 
             session.add(link)
             session.commit()
             session.refresh(link)
 
+            if not bulk:
+                # Batch jobs rebuild the whole table once they are done
+                try:
+                    await related_links.update(link.id)
+                except Exception as e:
+                    print(f"Related links update failed for {link_id}: {e}")
+
             return link
 
+        except LLMUnavailableError as e:
+            print(f"Error processing link {link_id}: {e}")
+            if staging:
+                raise
+            # Provider outage: leave the link unprocessed so it is retried
+            # later, instead of storing fallback tags as if they were real
+            link.is_processed = False
+            link.processing_failed = True
+            link.description = f"处理失败: {str(e)}"
+            session.add(link)
+            session.commit()
+            raise
+
         except Exception as e:
             print(f"Error processing link {link_id}: {e}")
-            # Mark as processed to avoid retrying failed links
+            # Tags written through to the dictionary may not have been committed
+            vocabulary.invalidate()
+            tag_cooccurrence.invalidate()
+            if staging or (current and digest is None):
+                # The previous result still holds (staged rebuild, or the
+                # page is temporarily unreachable)
+                raise
+            # Mark as processed to avoid retrying failed links (until the next rebuild)
             link.is_processed = True
+            link.processing_failed = True
             link.description = f"处理失败: {str(e)}"
             session.add(link)
             session.commit()
@@ -97,6 +200,7 @@ class LinkProcessor:
         user_note: Optional[str],
         session: Session,
         submitted_by: Optional[str] = None,
+        on_partial: Optional[PartialCallback] = None,
     ) -> Link:
         """
         Add a new link and process it immediately.
@@ -106,6 +210,7 @@ class LinkProcessor:
             user_note: Optional user note
             session: Database session
             submitted_by: Optional submitter identifier
+            on_partial: Receives partial AI results while processing
 
         Returns:
             Processed Link object
@@ -140,21 +245,127 @@ class LinkProcessor:
         session.refresh(link)
 
         # Process the link
-        return await self.process_link(link.id, session)
+        return await self.process_link(link.id, session, on_partial=on_partial)
+
+    def is_current(self, link: Link) -> bool:
+        """Processed successfully with the current prompts and models"""
+        return (
+            link.is_processed
+            and not link.processing_failed
+            and link.processing_version == ai_processor.version
+        )
 
-    def _get_existing_categories(self, session: Session) -> List[str]:
-        """Get list of existing category names"""
-        categories = session.exec(
-            select(Tag).where(Tag.is_category == True)
-        ).all()
-        return [cat.name for cat in categories]
+    def select_links(self, session: Session, mode: str = "full") -> List[Tuple[int, str]]:
+        """
+        (link_id, url) pairs a rebuild in `mode` has to visit.
 
-    def _get_existing_tags(self, session: Session) -> List[str]:
-        """Get list of existing sub-tag names"""
-        tags = session.exec(
-            select(Tag).where(Tag.is_category == False)
-        ).all()
-        return [tag.name for tag in tags]
+        "stale" selects links that were never processed, failed, or were
+        processed with an older ai_processor.version. "full" and "changed"
+        visit every link; "changed" then skips unchanged pages (see
+        reprocess_links).
+        """
+        if mode not in REBUILD_MODES:
+            raise ValueError(f"Unknown rebuild mode: {mode}")
+
+        query = select(Link.id, Link.url).order_by(Link.id)
+        if mode == "stale":
+            query = query.where(
+                or_(
+                    Link.is_processed == False,  # noqa: E712
+                    Link.processing_failed == True,  # noqa: E712
+                    Link.processing_version.is_(None),
+                    Link.processing_version != ai_processor.version,
+                )
+            )
+        return [(link_id, url) for link_id, url in session.exec(query).all()]
+
+    async def reprocess_links(
+        self,
+        links: List[Tuple[int, str]],
+        concurrency: int = 4,
+        on_progress: Optional[ProgressCallback] = None,
+        mode: str = "full",
+    ) -> ReprocessResult:
+        """
+        Reprocess many links concurrently.
+
+        Links on different domains are fetched in parallel; fetch_scheduler
+        keeps each domain within its politeness limits.
+
+        Args:
+            links: (link_id, url) pairs, usually from select_links
+            concurrency: Number of links processed at the same time
+            on_progress: Awaited after each link finishes
+            mode: "full" and "stale" retag from stored page content (links
+                without it are fetched), "changed" refetches every page.
+                "full" builds a new taxonomy in the staging tables and
+                swaps it in once every link is done; readers see the old
+                tags until then. The incremental modes replace each link's
+                tags as soon as its new result is written and leave
+                up-to-date links whose page content is unchanged as they are
+
+        Returns:
+            Counts of failed and skipped links
+        """
+        if mode not in REBUILD_MODES:
+            raise ValueError(f"Unknown rebuild mode: {mode}")
+
+        queue = list(reversed(links))
+        result = ReprocessResult(total=len(links))
+        done = 0
+        staging = mode == "full"
+
+        async def worker():
+            nonlocal done
+            while queue:
+                link_id, url = queue.pop()
+                error = None
+                try:
+                    # Reprocess (raises if the link was deleted meanwhile)
+                    with Session(engine) as session:
+                        link = session.get(Link, link_id)
+                        processed_at = link.processed_at if link else None
+                        link = await self.process_link(
+                            link_id,
+                            session,
+                            force=True,
+                            bulk=True,
+                            skip_unchanged=not staging,
+                            staging=staging,
+                            use_stored=mode != "changed",
+                        )
+                        if not staging and link.processed_at == processed_at:
+                            result.skipped += 1
+
+                except Exception as e:
+                    error = e
+                    result.failed += 1
+
+                done += 1
+                if on_progress:
+                    await on_progress(done, len(links), url, error)
+
+        if staging:
+            shadow_taxonomy.begin()
+        try:
+            await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+        except BaseException:
+            if staging:
+                shadow_taxonomy.discard()
+            raise
+
+        if staging:
+            try:
+                shadow_taxonomy.swap()
+            except BaseException:
+                shadow_taxonomy.discard()
+                raise
+        if result.failed + result.skipped < result.total:
+            try:
+                await related_links.rebuild()
+            except Exception as e:
+                print(f"Related links rebuild failed: {e}")
+        return result
 
     def _update_link_tags(
         self,
@@ -162,54 +373,133 @@ class LinkProcessor:
         category_name: str,
         tag_names: List[str],
         session: Session,
+        staging: bool = False,
     ) -> None:
-        """Update link's tags with hierarchical structure (category + sub-tags)"""
-        # Clear existing tags
-        link.tags = []
+        """
+        Update link's tags with hierarchical structure (category + sub-tags).
+
+        Tags are resolved through the vocabulary's in-memory dictionary; only
+        names missing from it hit the database (one query, one flush for all
+        new tags). Associations are replaced with one DELETE and one
+        multi-row INSERT. With `staging` the staging tables are written.
+        """
+        association = TagLinkAssociationStaging if staging else TagLinkAssociation
 
         # 1. Find or create category
-        category = session.exec(
-            select(Tag).where(Tag.name == category_name, Tag.is_category == True)
-        ).first()
-
-        if not category:
-            # Create new category with a distinct color
-            category = Tag(
-                name=category_name,
-                is_category=True,
-                parent_id=None,
-                color=self._generate_category_color(session),
+        category_id, category_color = self._find_or_create_tags(
+            session, [category_name], parent_id=None, is_category=True, staging=staging
+        )[category_name]
+
+        # 2. Find or create sub-tags under this category
+        tag_names = list(dict.fromkeys(tag_names))
+        sub_tags = self._find_or_create_tags(
+            session,
+            tag_names,
+            parent_id=category_id,
+            is_category=False,
+            color=category_color,
+            staging=staging,
+        )
+        tag_ids = list(dict.fromkeys([category_id] + [sub_tags[name][0] for name in tag_names]))
+
+        # 3. Replace associations
+        session.exec(delete(association).where(association.link_id == link.id))
+        session.exec(
+            insert(association).values(
+                [{"tag_id": tag_id, "link_id": link.id} for tag_id in tag_ids]
             )
-            session.add(category)
-            session.flush()
+        )
+        # Written outside the ORM, reload link.tags on next access
+        session.expire(link, ["tags"])
+        if not staging:
+            tag_cooccurrence.set_link_tags(link.id, tag_ids)
 
-        link.tags.append(category)
+    def _find_or_create_tags(
+        self,
+        session: Session,
+        names: List[str],
+        parent_id: Optional[int],
+        is_category: bool,
+        color: Optional[str] = None,
+        staging: bool = False,
+    ) -> Dict[str, Tuple[int, str]]:
+        """
+        name -> (id, color) for tags under parent_id, creating missing ones.
 
-        # 2. Add sub-tags under this category
-        for tag_name in tag_names:
-            # Find existing sub-tag under this category
-            tag = session.exec(
-                select(Tag).where(
-                    Tag.name == tag_name,
-                    Tag.parent_id == category.id,
-                    Tag.is_category == False
-                )
-            ).first()
-
-            if not tag:
-                # Create new sub-tag
-                tag = Tag(
-                    name=tag_name,
-                    parent_id=category.id,
-                    is_category=False,
-                    color=category.color,  # Inherit category color
-                )
-                session.add(tag)
-                session.flush()
+        New categories get a distinct color, new sub-tags inherit `color`.
+        """
+        tag_model = TagStaging if staging else Tag
+        vocabulary = staging_vocabulary if staging else tag_vocabulary
+
+        found: Dict[str, Tuple[int, str]] = {}
+        missing = []
+        for name in names:
+            entry = vocabulary.lookup(name, parent_id, is_category)
+            if entry:
+                found[name] = entry
+            else:
+                missing.append(name)
+
+        if found:
+            # The snapshot may predate a delete, merge or swap in another
+            # process; only ids still naming the same tag are used
+            current = set(
+                session.exec(
+                    select(tag_model.id, tag_model.name).where(
+                        tag_model.id.in_([tag_id for tag_id, _ in found.values()]),
+                        tag_model.parent_id == parent_id,
+                        tag_model.is_category == is_category,
+                    )
+                ).all()
+            )
+            stale = [name for name, (tag_id, _) in found.items() if (tag_id, name) not in current]
+            if stale:
+                vocabulary.invalidate()
+                for name in stale:
+                    del found[name]
+                missing.extend(stale)
+
+        if not missing:
+            return found
+
+        # Another process (bot / API / CLI) may have created them since the snapshot
+        existing = session.exec(
+            select(tag_model)
+            .where(
+                tag_model.name.in_(missing),
+                tag_model.parent_id == parent_id,
+                tag_model.is_category == is_category,
+            )
+            .order_by(tag_model.id)
+        ).all()
+        for tag in existing:
+            if tag.name not in found:
+                found[tag.name] = (tag.id, tag.color)
+                vocabulary.add(tag)
+
+        new_tags = []
+        for name in missing:
+            if name in found:
+                continue
+            tag = tag_model(
+                name=name,
+                parent_id=parent_id,
+                is_category=is_category,
+                color=self._generate_category_color(vocabulary) if is_category else color,
+            )
+            new_tags.append(tag)
+            found[name] = (0, tag.color)  # id assigned after flush
 
-            link.tags.append(tag)
+        if new_tags:
+            session.add_all(new_tags)
+            session.flush()
+            for tag in new_tags:
+                found[tag.name] = (tag.id, tag.color)
+                vocabulary.add(tag)
+
+        return found
 
-    def _generate_category_color(self, session: Session) -> str:
+    def _generate_category_color(self, vocabulary: TagVocabulary = tag_vocabulary) -> str:
         """Generate a color for new category based on existing count"""
         colors = [
             "#8B5CF6",  # Purple
@@ -223,10 +513,7 @@ class LinkProcessor:
             "#14B8A6",  # Teal
             "#F97316",  # Deep Orange
         ]
-        category_count = session.exec(
-            select(Tag).where(Tag.is_category == True)
-        ).all()
-        return colors[len(category_count) % len(colors)]
+        return colors[vocabulary.category_count() % len(colors)]
 
 
 # Global instance
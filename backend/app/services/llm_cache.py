@@ -0,0 +1,167 @@
+"""LLM Cache Service - Persistent chat completion cache keyed by request digest"""
+
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete
+from sqlmodel import Session, select, func
+
+from app.config import settings
+from app.database import engine
+from app.models import LLMCacheEntry
+
+
+@dataclass
+class CachedCompletion:
+    """A cached completion"""
+
+    content: str
+    prompt_tokens: int
+    completion_tokens: int
+
+
+class LLMCache:
+    """
+    Stores chat completions in the database.
+
+    The key covers everything that determines the response: model,
+    messages, temperature, max_tokens and response_format. Entries expire
+    after `ttl_days`; when the table grows beyond `max_entries` the least
+    recently hit entries are evicted.
+    """
+
+    def __init__(self, enabled: bool = True, ttl_days: int = 30, max_entries: int = 20000):
+        self.enabled = enabled
+        self.ttl = timedelta(days=ttl_days)
+        self.max_entries = max_entries
+
+        # Counters since process start
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.tokens_saved = 0
+
+    @staticmethod
+    def make_key(
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: Optional[int],
+        response_format: Optional[Dict[str, Any]],
+    ) -> str:
+        """sha256 digest of the request parameters"""
+        payload = json.dumps(
+            {
+                "model": model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "response_format": response_format,
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[CachedCompletion]:
+        """Look up a fresh entry and record the hit"""
+        if not self.enabled:
+            return None
+
+        with Session(engine) as session:
+            entry = session.get(LLMCacheEntry, key)
+            if entry is None or entry.created_at < datetime.utcnow() - self.ttl:
+                self.misses += 1
+                return None
+
+            entry.hits += 1
+            entry.last_hit_at = datetime.utcnow()
+            session.add(entry)
+            session.commit()
+
+            self.hits += 1
+            self.tokens_saved += entry.prompt_tokens + entry.completion_tokens
+            return CachedCompletion(
+                content=entry.response,
+                prompt_tokens=entry.prompt_tokens,
+                completion_tokens=entry.completion_tokens,
+            )
+
+    def put(
+        self,
+        key: str,
+        model: str,
+        content: str,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+    ) -> None:
+        """Store (or overwrite) an entry, evicting old ones if over capacity"""
+        if not self.enabled:
+            return
+
+        with Session(engine) as session:
+            entry = session.get(LLMCacheEntry, key) or LLMCacheEntry(key=key, model=model)
+            entry.model = model
+            entry.response = content
+            entry.prompt_tokens = prompt_tokens
+            entry.completion_tokens = completion_tokens
+            entry.created_at = datetime.utcnow()
+            entry.last_hit_at = entry.created_at
+            session.add(entry)
+            session.commit()
+
+            self._evict(session)
+
+    def _evict(self, session: Session) -> None:
+        """Drop expired entries, then least recently hit ones beyond max_entries"""
+        session.exec(
+            delete(LLMCacheEntry).where(
+                LLMCacheEntry.created_at < datetime.utcnow() - self.ttl
+            )
+        )
+
+        count = session.exec(select(func.count()).select_from(LLMCacheEntry)).one()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            # Evict 10% extra so we don't run this on every insert
+            overflow += self.max_entries // 10
+            stale = select(LLMCacheEntry.key).order_by(LLMCacheEntry.last_hit_at).limit(overflow)
+            session.exec(delete(LLMCacheEntry).where(LLMCacheEntry.key.in_(stale)))
+
+        session.commit()
+
+    def clear(self) -> int:
+        """Delete all entries, returns the number removed"""
+        with Session(engine) as session:
+            result = session.exec(delete(LLMCacheEntry))
+            session.commit()
+            return result.rowcount
+
+    def stats(self) -> dict:
+        """Hit/miss counters and table size"""
+        with Session(engine) as session:
+            entries = session.exec(select(func.count()).select_from(LLMCacheEntry)).one()
+
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_days": self.ttl.days,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+# Global instance
+llm_cache = LLMCache(
+    enabled=settings.LLM_CACHE_ENABLED,
+    ttl_days=settings.LLM_CACHE_TTL_DAYS,
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+)
@@ -0,0 +1,348 @@
+"""LLM Client Service - Deadlines, retries, circuit breaker and hedging around chat completions"""
+
+import asyncio
+import random
+import time
+from typing import Callable, Dict, Optional
+
+import openai
+from openai.types.chat import ChatCompletion
+
+from app.config import settings
+from app.services.content_condenser import estimate_tokens
+from app.services.rate_limiter import RateLimiter, rate_limiter
+
+
+class LLMUnavailableError(Exception):
+    """The provider kept failing (retries exhausted, deadline passed or circuit open)"""
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failed calls.
+
+    While open, interactive calls fail fast and bulk calls wait. After
+    `cooldown` seconds the breaker is half-open: calls go through again and
+    the next result closes it or re-opens it.
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 60.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = 0.0
+        self.opens = 0
+
+    @property
+    def state(self) -> str:
+        if self.failures < self.threshold:
+            return "closed"
+        if time.monotonic() < self.open_until:
+            return "open"
+        return "half_open"
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.open_until = 0.0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.threshold and self.state != "open":
+            self.open_until = time.monotonic() + self.cooldown
+            self.opens += 1
+            print(f"LLM circuit breaker opened for {self.cooldown:g}s after {self.failures} failures")
+
+    async def wait(self) -> None:
+        """Sleep until the breaker is no longer open"""
+        while self.state == "open":
+            await asyncio.sleep(max(0.1, self.open_until - time.monotonic()))
+
+
+class LLMClient:
+    """
+    Wraps AsyncOpenAI chat completions with:
+
+    - a deadline per stage covering all attempts of one call, and a
+      timeout per attempt (a fraction of the deadline) so that a hung
+      request is retried instead of using up the whole deadline
+    - retries with exponential backoff and full jitter on 429, 5xx,
+      connection errors and timeouts (Retry-After is honoured)
+    - a circuit breaker shared by all calls
+    - optional hedging for interactive calls: if the first attempt has not
+      answered after `hedge_delay` seconds a second identical request is
+      sent and whichever finishes first wins
+    - an optional shared RateLimiter: every request waits for budget first
+      and reports the provider's x-ratelimit-* headers back to it
+    - optional streaming: the text generated so far is reported while the
+      response arrives, and the assembled completion is returned as usual
+    """
+
+    def __init__(
+        self,
+        client: openai.AsyncOpenAI,
+        deadlines: Optional[Dict[str, float]] = None,
+        default_deadline: float = 60.0,
+        attempt_ratio: float = 0.5,
+        max_retries: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 20.0,
+        breaker: Optional[CircuitBreaker] = None,
+        hedge_delay: float = 0.0,
+        limiter: Optional[RateLimiter] = None,
+    ):
+        self.client = client
+        self.deadlines = deadlines or {}
+        self.default_deadline = default_deadline
+        self.attempt_ratio = attempt_ratio
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge_delay = hedge_delay
+        self.limiter = limiter
+
+        # Counters since process start
+        self.calls = 0
+        self.retries = 0
+        self.deadline_exceeded = 0
+        self.attempt_timeouts = 0
+        self.failures = 0
+        self.rejected = 0  # 熔断期间直接拒绝的交互请求
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    async def create(
+        self,
+        stage: str,
+        bulk: bool = False,
+        on_text: Optional[Callable[[str], None]] = None,
+        **kwargs,
+    ):
+        """
+        chat.completions.create with the resilience policy applied.
+
+        Args:
+            stage: Name used to pick the deadline (e.g. "stage1", "stage2")
+            bulk: Batch traffic waits while the breaker is open instead of
+                failing fast, and is never hedged
+            on_text: Stream the response and call this with the accumulated
+                content after every chunk. The deadline and the attempt
+                timeout cover the whole stream; a retry starts over from
+                empty text. Not hedged
+
+        Raises:
+            LLMUnavailableError: provider failures that retrying did not fix
+        """
+        if bulk:
+            await self.breaker.wait()
+        elif self.breaker.state == "open":
+            self.rejected += 1
+            raise LLMUnavailableError("AI 服务暂时不可用，请稍后重试")
+
+        # Waiting for rate limit budget is not the provider's fault, so the
+        # first acquire happens before the deadline starts
+        await self._acquire(kwargs, bulk)
+
+        if on_text is not None:
+            kwargs = {**kwargs, "stream": True, "stream_options": {"include_usage": True}}
+
+        self.calls += 1
+        deadline = self.deadlines.get(stage, self.default_deadline)
+        hedge = not bulk and on_text is None and self.hedge_delay > 0
+        try:
+            response = await asyncio.wait_for(
+                self._with_retries(
+                    kwargs, bulk, hedge=hedge, timeout=deadline * self.attempt_ratio, on_text=on_text
+                ),
+                timeout=deadline,
+            )
+        except asyncio.TimeoutError:
+            self.deadline_exceeded += 1
+            self.failures += 1
+            self.breaker.record_failure()
+            raise LLMUnavailableError(f"AI 请求超时（{stage} 超过 {deadline:g} 秒）")
+        except LLMUnavailableError:
+            self.failures += 1
+            self.breaker.record_failure()
+            raise
+
+        self.breaker.record_success()
+        return response
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying, or None if the error is not retryable"""
+        if isinstance(error, openai.APIStatusError):
+            if error.status_code != 429 and error.status_code < 500:
+                return None
+            retry_after = error.response.headers.get("retry-after")
+            if retry_after and retry_after.replace(".", "", 1).isdigit():
+                return min(float(retry_after), self.max_delay)
+        elif not isinstance(error, (openai.APIConnectionError, asyncio.TimeoutError)):
+            return None
+        # Full jitter: uniform over [0, capped exponential]
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def _acquire(self, kwargs: dict, bulk: bool) -> None:
+        if self.limiter is None:
+            return
+        prompt = "".join(message.get("content") or "" for message in kwargs.get("messages", []))
+        tokens = estimate_tokens(prompt) + (kwargs.get("max_tokens") or 0)
+        await self.limiter.acquire(kwargs["model"], tokens, bulk=bulk)
+
+    async def _attempt(
+        self, kwargs: dict, timeout: float, on_text: Optional[Callable[[str], None]] = None
+    ):
+        """One request given at most `timeout` seconds; a timeout is retryable"""
+        try:
+            return await asyncio.wait_for(self._send(kwargs, on_text), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.attempt_timeouts += 1
+            raise
+
+    async def _send(self, kwargs: dict, on_text: Optional[Callable[[str], None]] = None):
+        """One request, reporting rate limit headers to the limiter"""
+        if self.limiter is None:
+            response = await self.client.chat.completions.create(**kwargs)
+        else:
+            try:
+                raw = await self.client.chat.completions.with_raw_response.create(**kwargs)
+            except openai.APIStatusError as e:
+                if e.status_code == 429:
+                    self.limiter.observe(kwargs["model"], e.response.headers, throttled=True)
+                raise
+            self.limiter.observe(kwargs["model"], raw.headers)
+            response = raw.parse()
+
+        if on_text is None:
+            return response
+        return await self._collect(response, on_text)
+
+    @staticmethod
+    async def _collect(stream, on_text: Callable[[str], None]) -> ChatCompletion:
+        """Consume a completion stream into a regular ChatCompletion"""
+        parts = []
+        chunk = None
+        finish_reason = None
+        usage = None
+        async for chunk in stream:
+            # With include_usage the last chunk carries usage and no choices
+            if chunk.usage:
+                usage = chunk.usage.model_dump()
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            finish_reason = choice.finish_reason or finish_reason
+            if choice.delta.content:
+                parts.append(choice.delta.content)
+                on_text("".join(parts))
+
+        return ChatCompletion.model_validate(
+            {
+                "id": chunk.id if chunk else "",
+                "object": "chat.completion",
+                "created": chunk.created if chunk else 0,
+                "model": chunk.model if chunk else "",
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": finish_reason or "stop",
+                        "message": {"role": "assistant", "content": "".join(parts)},
+                    }
+                ],
+                "usage": usage,
+            }
+        )
+
+    async def _with_retries(
+        self,
+        kwargs: dict,
+        bulk: bool,
+        hedge: bool,
+        timeout: float,
+        on_text: Optional[Callable[[str], None]] = None,
+    ):
+        attempt = 0
+        while True:
+            try:
+                if attempt:
+                    await self._acquire(kwargs, bulk)
+                if hedge:
+                    return await self._hedged(kwargs, timeout)
+                return await self._attempt(kwargs, timeout, on_text)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                if attempt >= self.max_retries:
+                    raise LLMUnavailableError(f"AI 服务请求失败（已重试 {attempt} 次）: {e}") from e
+                self.retries += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def _hedged(self, kwargs: dict, timeout: float):
+        first = asyncio.ensure_future(self._attempt(kwargs, timeout))
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay)
+            if done:
+                return first.result()
+
+            self.hedged += 1
+            await self._acquire(kwargs, bulk=False)
+            second = asyncio.ensure_future(self._attempt(kwargs, timeout))
+            tasks.add(second)
+
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "breaker": self.breaker.state,
+            "breaker_failures": self.breaker.failures,
+            "breaker_opens": self.breaker.opens,
+            "calls": self.calls,
+            "retries": self.retries,
+            "deadline_exceeded": self.deadline_exceeded,
+            "attempt_timeouts": self.attempt_timeouts,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "deadlines": self.deadlines,
+        }
+
+
+def create_llm_client(client: openai.AsyncOpenAI) -> LLMClient:
+    """LLMClient configured from settings"""
+    return LLMClient(
+        client,
+        deadlines={
+            "stage1": settings.LLM_STAGE1_TIMEOUT,
+            "stage2": settings.LLM_STAGE2_TIMEOUT,
+            "stage2_batch": settings.LLM_STAGE2_TIMEOUT * 2,
+            "single": settings.LLM_SINGLE_TIMEOUT,
+        },
+        attempt_ratio=settings.LLM_ATTEMPT_TIMEOUT_RATIO,
+        max_retries=settings.LLM_MAX_RETRIES,
+        base_delay=settings.LLM_RETRY_BASE_DELAY,
+        max_delay=settings.LLM_RETRY_MAX_DELAY,
+        breaker=CircuitBreaker(
+            threshold=settings.LLM_BREAKER_THRESHOLD,
+            cooldown=settings.LLM_BREAKER_COOLDOWN,
+        ),
+        hedge_delay=settings.LLM_HEDGE_DELAY,
+        limiter=rate_limiter,
+    )
@@ -0,0 +1,106 @@
+"""LLM Usage Service - Token, latency and cost accounting per model and stage"""
+
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from app.config import settings
+
+
+@dataclass
+class _UsageStats:
+    calls: int = 0
+    cached: int = 0  # 命中 llm_cache，未调用 API
+    failures: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    seconds: float = 0.0
+    recent: deque = field(default_factory=lambda: deque(maxlen=500))  # 最近的耗时，用于分位数
+
+
+def _percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class UsageTracker:
+    """
+    Aggregates every LLM call by (model, stage).
+
+    Wall time covers the whole call as seen by the caller, including
+    retries and rate limit waits. Cost uses `prices` in USD per million
+    tokens (input, output) and is omitted for models without a price.
+    """
+
+    def __init__(self, prices: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.prices = prices or {}
+        self._stats: Dict[Tuple[str, str], _UsageStats] = {}
+
+    def _get(self, model: str, stage: str) -> _UsageStats:
+        key = (model, stage)
+        if key not in self._stats:
+            self._stats[key] = _UsageStats()
+        return self._stats[key]
+
+    def record(
+        self,
+        model: str,
+        stage: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        seconds: float,
+    ) -> None:
+        stats = self._get(model, stage)
+        stats.calls += 1
+        stats.prompt_tokens += prompt_tokens
+        stats.completion_tokens += completion_tokens
+        stats.seconds += seconds
+        stats.recent.append(seconds)
+
+    def record_cached(self, model: str, stage: str) -> None:
+        self._get(model, stage).cached += 1
+
+    def record_failure(self, model: str, stage: str, seconds: float) -> None:
+        stats = self._get(model, stage)
+        stats.failures += 1
+        stats.seconds += seconds
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+        price = self.prices.get(model)
+        if price is None:
+            return None
+        return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+
+    def stats(self) -> dict:
+        rows = []
+        for (model, stage), s in sorted(self._stats.items()):
+            cost = self.cost(model, s.prompt_tokens, s.completion_tokens)
+            rows.append(
+                {
+                    "model": model,
+                    "stage": stage,
+                    "calls": s.calls,
+                    "cached": s.cached,
+                    "failures": s.failures,
+                    "prompt_tokens": s.prompt_tokens,
+                    "completion_tokens": s.completion_tokens,
+                    "avg_prompt_tokens": round(s.prompt_tokens / s.calls) if s.calls else 0,
+                    "avg_completion_tokens": round(s.completion_tokens / s.calls) if s.calls else 0,
+                    "avg_seconds": round(s.seconds / (s.calls + s.failures), 3) if s.calls + s.failures else 0.0,
+                    "p50_seconds": round(_percentile(s.recent, 50), 3),
+                    "p95_seconds": round(_percentile(s.recent, 95), 3),
+                    "cost_usd": round(cost, 6) if cost is not None else None,
+                }
+            )
+
+        costs = [row["cost_usd"] for row in rows if row["cost_usd"] is not None]
+        return {
+            "total_cost_usd": round(sum(costs), 6) if costs else None,
+            "by_model_stage": rows,
+        }
+
+
+# Global instance
+llm_usage = UsageTracker(prices=settings.get_model_prices())
@@ -0,0 +1,241 @@
+"""Rate Limiter Service - Token buckets in the database shared by the API, bot and CLI"""
+
+import asyncio
+import re
+import time
+from typing import Mapping, Optional
+
+from sqlalchemy import case, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.config import settings
+from app.database import engine
+from app.models import RateLimitBucket
+
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """x-ratelimit-reset-* value ("20ms", "1s", "6m0s") in seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _UNITS[unit] for number, unit in parts)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute buckets per model.
+
+    Bucket state lives in the rate_limit_bucket table and every take is a
+    single conditional UPDATE, so the web API, the polling bot and the CLI
+    draw from the same budget. Capacities start from LLM_RATE_RPM /
+    LLM_RATE_TPM and are replaced by the provider's x-ratelimit-* headers
+    as soon as a response carries them. Bulk traffic may not dip into the
+    last `bulk_reserve` share of a bucket, which keeps headroom for links
+    submitted interactively during a rebuild.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        rpm: int = 60,
+        tpm: int = 100000,
+        bulk_reserve: float = 0.2,
+        poll_interval: float = 2.0,
+    ):
+        self.enabled = enabled
+        self.rpm = rpm
+        self.tpm = tpm
+        self.bulk_reserve = bulk_reserve
+        self.poll_interval = poll_interval
+
+        # Counters since process start
+        self.acquired = 0
+        self.waits = {"interactive": 0, "bulk": 0}
+        self.waited_seconds = {"interactive": 0.0, "bulk": 0.0}
+        self.throttled = 0
+
+    def _ensure_bucket(self, session: Session, name: str, capacity: float) -> RateLimitBucket:
+        bucket = session.get(RateLimitBucket, name)
+        if bucket is None:
+            bucket = RateLimitBucket(
+                name=name,
+                capacity=capacity,
+                rate=capacity / 60,
+                tokens=capacity,
+                updated_at=time.time(),
+            )
+            session.add(bucket)
+            try:
+                session.commit()
+            except IntegrityError:
+                # Created by another process in the meantime
+                session.rollback()
+                bucket = session.get(RateLimitBucket, name)
+        return bucket
+
+    @staticmethod
+    def _available(now: float):
+        """SQL expression: current bucket level after refilling up to now"""
+        refilled = RateLimitBucket.tokens + (now - RateLimitBucket.updated_at) * RateLimitBucket.rate
+        return case((refilled > RateLimitBucket.capacity, RateLimitBucket.capacity), else_=refilled)
+
+    def _take(self, name: str, default_capacity: float, cost: float, reserve: float) -> float:
+        """Take `cost` from a bucket; returns 0 on success, else seconds to wait"""
+        now = time.time()
+        with Session(engine) as session:
+            bucket = self._ensure_bucket(session, name, default_capacity)
+            # A request larger than the usable part of the bucket could never
+            # be admitted, let it through once the bucket is full
+            cost = min(cost, bucket.capacity * (1 - reserve))
+            floor = bucket.capacity * reserve
+
+            available = self._available(now)
+            result = session.exec(
+                update(RateLimitBucket)
+                .where(RateLimitBucket.name == name, available - cost >= floor)
+                .values(tokens=available - cost, updated_at=now)
+            )
+            session.commit()
+            if result.rowcount:
+                return 0.0
+
+            session.refresh(bucket)
+            level = min(bucket.capacity, bucket.tokens + (now - bucket.updated_at) * bucket.rate)
+            return max(0.01, (cost + floor - level) / max(bucket.rate, 1e-6))
+
+    def _give_back(self, name: str, amount: float) -> None:
+        with Session(engine) as session:
+            session.exec(
+                update(RateLimitBucket)
+                .where(RateLimitBucket.name == name)
+                .values(tokens=RateLimitBucket.tokens + amount)
+            )
+            session.commit()
+
+    async def acquire(self, model: str, tokens: int, bulk: bool = False) -> None:
+        """Wait until one request of about `tokens` tokens fits the model's budget"""
+        if not self.enabled:
+            return
+
+        kind = "bulk" if bulk else "interactive"
+        reserve = self.bulk_reserve if bulk else 0.0
+        started = time.monotonic()
+        waited = False
+
+        while True:
+            wait = self._take(f"{model}:requests", self.rpm, 1, reserve)
+            if not wait:
+                wait = self._take(f"{model}:tokens", self.tpm, tokens, reserve)
+                if not wait:
+                    break
+                self._give_back(f"{model}:requests", 1)
+
+            waited = True
+            # Other processes may refill or drain the bucket meanwhile, so re-check periodically
+            await asyncio.sleep(min(wait, self.poll_interval))
+
+        self.acquired += 1
+        if waited:
+            self.waits[kind] += 1
+            self.waited_seconds[kind] += time.monotonic() - started
+
+    def observe(self, model: str, headers: Mapping[str, str], throttled: bool = False) -> None:
+        """
+        Learn limits from x-ratelimit-* response headers.
+
+        Capacity and refill rate follow x-ratelimit-limit-*, the level is
+        lowered to x-ratelimit-remaining-*. After a 429 the bucket is put
+        into debt until x-ratelimit-reset-* (or Retry-After) has passed.
+        """
+        if not self.enabled:
+            return
+        if throttled:
+            self.throttled += 1
+
+        now = time.time()
+        retry_after = parse_reset(headers.get("retry-after"))
+        # Without per-kind headers a 429 is charged to the request bucket
+        has_headers = any(
+            headers.get(f"x-ratelimit-remaining-{kind}") is not None for kind in ("requests", "tokens")
+        )
+
+        with Session(engine) as session:
+            for kind, default in (("requests", self.rpm), ("tokens", self.tpm)):
+                limit = headers.get(f"x-ratelimit-limit-{kind}")
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                reset = parse_reset(headers.get(f"x-ratelimit-reset-{kind}"))
+                try:
+                    limit = float(limit) if limit is not None else None
+                    remaining = float(remaining) if remaining is not None else None
+                except ValueError:
+                    continue
+
+                exhausted = throttled and (
+                    (remaining is not None and remaining <= 0)
+                    or (not has_headers and kind == "requests")
+                )
+                if limit is None and remaining is None and not exhausted:
+                    continue
+
+                bucket = self._ensure_bucket(session, f"{model}:{kind}", default)
+                level = min(bucket.capacity, bucket.tokens + (now - bucket.updated_at) * bucket.rate)
+
+                if limit:
+                    bucket.capacity = limit
+                    bucket.rate = limit / 60
+                    bucket.learned = True
+                if remaining is not None:
+                    level = min(level, remaining)
+                if exhausted:
+                    wait = reset if reset is not None else retry_after
+                    level = min(level, -(wait or 1.0) * bucket.rate)
+
+                bucket.tokens = level
+                bucket.updated_at = now
+                session.add(bucket)
+            session.commit()
+
+    def stats(self) -> dict:
+        now = time.time()
+        with Session(engine) as session:
+            buckets = session.exec(select(RateLimitBucket)).all()
+
+        return {
+            "enabled": self.enabled,
+            "bulk_reserve": self.bulk_reserve,
+            "acquired": self.acquired,
+            "waits": self.waits,
+            "waited_seconds": {k: round(v, 1) for k, v in self.waited_seconds.items()},
+            "throttled": self.throttled,
+            "buckets": {
+                bucket.name: {
+                    "capacity": bucket.capacity,
+                    "level": round(
+                        min(bucket.capacity, bucket.tokens + (now - bucket.updated_at) * bucket.rate), 1
+                    ),
+                    "learned": bucket.learned,
+                }
+                for bucket in buckets
+            },
+        }
+
+
+# Global instance
+rate_limiter = RateLimiter(
+    enabled=settings.LLM_RATE_LIMIT_ENABLED,
+    rpm=settings.LLM_RATE_RPM,
+    tpm=settings.LLM_RATE_TPM,
+    bulk_reserve=settings.LLM_RATE_BULK_RESERVE,
+)
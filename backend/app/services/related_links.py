@@ -0,0 +1,533 @@
+"""Related Links Service - Precomputed top-k similar links from shared tags and text"""
+
+import asyncio
+import heapq
+import math
+import multiprocessing
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, func, insert, or_
+from sqlmodel import Session, select
+
+from app.config import settings
+from app.database import engine
+from app.models import Link, RelatedLink, Tag, TagLinkAssociation
+from app.services.extraction_pool import extraction_pool
+from app.services.taxonomy_state import taxonomy_state
+
+# ASCII 单词或连续的非 ASCII 字符（中文按二元组切分）
+_TERM_RE = re.compile(r"[a-z0-9+#.]{2,}|[^\x00-\x7f\s\W]+")
+
+# 出现在超过这个比例的链接中的词不参与文本相似度（相当于停用词）
+MAX_TERM_DF = 0.3
+
+# 每条链接只保留权重最高的若干个词，限制候选链接数量
+MAX_TERMS_PER_LINK = 32
+
+# Links per task during a rebuild
+REBUILD_CHUNK = 200
+
+# (related_id, score)
+Neighbors = List[Tuple[int, float]]
+
+
+def text_terms(text: str) -> Counter:
+    """Term counts of a title/description: ASCII words and CJK character bigrams"""
+    terms: Counter = Counter()
+    for token in _TERM_RE.findall(text.lower()):
+        if token.isascii():
+            terms[token.strip(".")] += 1
+        elif len(token) == 1:
+            terms[token] += 1
+        else:
+            terms.update(token[i : i + 2] for i in range(len(token) - 1))
+    terms.pop("", None)
+    return terms
+
+
+class NeighborIndex:
+    """
+    Tag sets and TF-IDF vectors of all processed links, with inverted
+    indexes: the columns of the sparse link x tag and link x term
+    matrices, so each query row only meets the rows it overlaps with.
+    Links can be replaced or removed one at a time.
+    """
+
+    def __init__(
+        self,
+        tags: Dict[int, FrozenSet[int]],
+        category_ids: FrozenSet[int],
+        vectors: Dict[int, Dict[str, float]],
+    ):
+        self.tags: Dict[int, FrozenSet[int]] = {}
+        self.category_ids: Set[int] = set(category_ids)
+        self.vectors: Dict[int, Dict[str, float]] = {}
+        self.tag_postings: Dict[int, Set[int]] = defaultdict(set)
+        self.term_postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        for link_id, link_tags in tags.items():
+            self.set(link_id, link_tags, vectors.get(link_id))
+
+    def set(self, link_id: int, tags: FrozenSet[int], vector: Optional[Dict[str, float]]) -> None:
+        """Add a link, or replace its tags and text vector"""
+        self.remove(link_id)
+        self.tags[link_id] = tags
+        for tag_id in tags - self.category_ids:  # 分类太宽泛，只在计算 Jaccard 时计入
+            self.tag_postings[tag_id].add(link_id)
+        if vector:
+            self.vectors[link_id] = vector
+            for term, weight in vector.items():
+                self.term_postings[term][link_id] = weight
+
+    def remove(self, link_id: int) -> None:
+        for tag_id in self.tags.pop(link_id, ()):
+            postings = self.tag_postings.get(tag_id)
+            if postings is not None:
+                postings.discard(link_id)
+        for term in self.vectors.pop(link_id, {}):
+            self.term_postings[term].pop(link_id, None)
+
+    def query(
+        self, query_ids: List[int], k: Optional[int], text_weight: float, min_score: float
+    ) -> Dict[int, Neighbors]:
+        """
+        Most similar links of each query link, best first (all of them when
+        k is None). Score is the tag Jaccard similarity, blended with the
+        cosine of the TF-IDF vectors by text_weight when both links have text.
+        """
+        tags, vectors = self.tags, self.vectors
+        result: Dict[int, Neighbors] = {}
+        for link_id in query_ids:
+            own_tags = tags.get(link_id, frozenset())
+            own_categories = own_tags & self.category_ids
+
+            # Row of A·Aᵀ (shared sub-tags) and of V·Vᵀ (cosine) for this link
+            shared: Dict[int, int] = defaultdict(int)
+            for tag_id in own_tags - own_categories:
+                for other in self.tag_postings.get(tag_id, ()):
+                    shared[other] += 1
+            dots: Dict[int, float] = defaultdict(float)
+            for term, weight in vectors.get(link_id, {}).items():
+                for other, other_weight in self.term_postings.get(term, {}).items():
+                    dots[other] += weight * other_weight
+
+            has_text = link_id in vectors
+            scored = []
+            for other in shared.keys() | dots.keys():
+                if other == link_id:
+                    continue
+                other_tags = tags[other]
+                common = shared.get(other, 0)
+                for category_id in own_categories:
+                    if category_id in other_tags:
+                        common += 1
+                union = len(own_tags) + len(other_tags) - common
+                score = common / union if union else 0.0
+                if has_text and other in vectors:
+                    score = (1 - text_weight) * score + text_weight * min(1.0, dots.get(other, 0.0))
+                if score >= min_score:
+                    scored.append((other, score))
+
+            if k is not None:
+                scored = heapq.nsmallest(k, scored, key=lambda item: (-item[1], item[0]))
+            else:
+                scored.sort(key=lambda item: (-item[1], item[0]))
+            result[link_id] = [(other, round(score, 4)) for other, score in scored]
+        return result
+
+
+# Index of a rebuild worker, built once from the dataset passed to the initializer
+# (per thread, so concurrent rebuilds in thread mode do not share it)
+_worker = threading.local()
+
+
+def _init_rebuild_worker(
+    tags: Dict[int, FrozenSet[int]],
+    category_ids: FrozenSet[int],
+    vectors: Dict[int, Dict[str, float]],
+) -> None:
+    _worker.index = NeighborIndex(tags, category_ids, vectors)
+
+
+def _query_chunk(query_ids: List[int], k: int, text_weight: float, min_score: float) -> Dict[int, Neighbors]:
+    return _worker.index.query(query_ids, k, text_weight, min_score)
+
+
+class RelatedLinks:
+    """
+    Top-k related links of every link, stored in the related_link table.
+
+    rebuild() recomputes the whole table (after batch reprocessing, or
+    from the CLI/admin API); update() refreshes one link after it has been
+    processed or edited: its own neighbors are replaced, and it is added
+    to the lists of links it now beats. Links that drop out of a list on
+    update() are only backfilled by the next rebuild. Reading neighbors
+    is a single indexed query.
+
+    Features are the link's tags and the terms of its title and AI
+    description (TF-IDF); term counts are cached per link and only
+    recomputed when the text changes.
+
+    update() works on an in-memory NeighborIndex of all links: only the
+    changed link is read from the database and re-indexed, with the term
+    weights (IDF) of the last full load. The index is loaded in a thread
+    by rebuild(), on first use, after `ttl` seconds (to pick up writes
+    from other processes) and after a taxonomy swap.
+    """
+
+    def __init__(
+        self,
+        k: int = 10,
+        text_weight: float = 0.4,
+        min_score: float = 0.05,
+        rebuild_timeout: float = 600.0,
+        ttl: float = 600.0,
+    ):
+        self.k = k
+        self.text_weight = text_weight
+        self.min_score = min_score
+        self.rebuild_timeout = rebuild_timeout
+        self.ttl = ttl
+
+        self._lock = threading.Lock()  # 加载在线程中进行
+        self._terms: Dict[int, Tuple[str, Counter]] = {}  # link_id -> (文本, 词频)
+        self._index: Optional[NeighborIndex] = None
+        self._idf: Dict[str, float] = {}  # 上次全量加载时参与相似度计算的词及其 IDF
+        self._loaded_at = 0.0
+        self._generation = 0
+
+        # Counters since process start
+        self.rebuilds = 0
+        self.updates = 0
+        self.last_rebuild: Optional[dict] = None
+
+        # Current or last rebuild, reported by stats()
+        self.running = False
+        self.progress = {"links": 0, "chunks": 0, "chunks_done": 0}
+        self.started_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def _counts(self, link_id: int, title: Optional[str], description: Optional[str]) -> Counter:
+        """Term counts of a link's text, cached until the text changes"""
+        text = f"{title or ''}\n{description or ''}"
+        cached = self._terms.get(link_id)
+        if cached is None or cached[0] != text:
+            cached = self._terms[link_id] = (text, text_terms(text))
+        return cached[1]
+
+    @staticmethod
+    def _vector(counts: Counter, idf: Dict[str, float]) -> Dict[str, float]:
+        """Normalized TF-IDF vector over the terms in idf, at most MAX_TERMS_PER_LINK of them"""
+        vector = {
+            term: (1 + math.log(count)) * idf[term] for term, count in counts.items() if term in idf
+        }
+        if len(vector) > MAX_TERMS_PER_LINK:
+            vector = dict(heapq.nlargest(MAX_TERMS_PER_LINK, vector.items(), key=lambda item: item[1]))
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {term: weight / norm for term, weight in vector.items()} if norm else {}
+
+    def _load(self, session: Session) -> Tuple[NeighborIndex, Dict[str, float]]:
+        """Index of all processed links (tag sets and TF-IDF vectors) and the term IDFs"""
+        rows = session.exec(
+            select(Link.id, Link.title, Link.description).where(
+                Link.is_processed == True,  # noqa: E712
+                Link.processing_failed == False,  # noqa: E712
+            )
+        ).all()
+
+        tag_sets: Dict[int, Set[int]] = {link_id: set() for link_id, _, _ in rows}
+        for tag_id, link_id in session.exec(
+            select(TagLinkAssociation.tag_id, TagLinkAssociation.link_id)
+        ).all():
+            if link_id in tag_sets:
+                tag_sets[link_id].add(tag_id)
+        category_ids = frozenset(session.exec(select(Tag.id).where(Tag.is_category == True)).all())  # noqa: E712
+
+        with self._lock:
+            counts: Dict[int, Counter] = {}
+            for link_id, title, description in rows:
+                terms = self._counts(link_id, title, description)
+                if terms:
+                    counts[link_id] = terms
+            for link_id in set(self._terms) - set(tag_sets):
+                del self._terms[link_id]  # deleted or no longer processed
+
+        df: Counter = Counter()
+        for terms in counts.values():
+            df.update(terms.keys())
+        total = len(counts)
+        max_df = max(10, int(total * MAX_TERM_DF))
+        idf = {
+            term: math.log(total / count)
+            for term, count in df.items()
+            if 1 < count <= max_df  # 只出现一次的词不会产生相似链接
+        }
+
+        vectors: Dict[int, Dict[str, float]] = {}
+        for link_id, terms in counts.items():
+            vector = self._vector(terms, idf)
+            if vector:
+                vectors[link_id] = vector
+
+        tags = {link_id: frozenset(ids) for link_id, ids in tag_sets.items()}
+        return NeighborIndex(tags, category_ids, vectors), idf
+
+    def _reload(self) -> NeighborIndex:
+        """Load the index from the database (blocking, run in a thread)"""
+        generation = taxonomy_state.generation()
+        with Session(engine) as session:
+            index, idf = self._load(session)
+        self._index, self._idf = index, idf
+        self._loaded_at = time.monotonic()
+        self._generation = generation
+        return index
+
+    async def _ensure_index(self) -> NeighborIndex:
+        index = self._index
+        if (
+            index is None
+            or time.monotonic() - self._loaded_at >= self.ttl
+            or taxonomy_state.generation() != self._generation
+        ):
+            index = await asyncio.to_thread(self._reload)
+        return index
+
+    @staticmethod
+    def _rebuild_executor(
+        tags: Dict[int, FrozenSet[int]],
+        category_ids: FrozenSet[int],
+        vectors: Dict[int, Dict[str, float]],
+    ) -> Executor:
+        """
+        Pool of its own for one rebuild: the dataset is sent once to each
+        worker through the initializer, chunks then only carry link ids
+        """
+        initargs = (tags, category_ids, vectors)
+        if extraction_pool.mode != "process":
+            # 线程模式下并行没有收益，用一个线程避免阻塞事件循环
+            return ThreadPoolExecutor(
+                max_workers=1, initializer=_init_rebuild_worker, initargs=initargs
+            )
+        return ProcessPoolExecutor(
+            max_workers=extraction_pool.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_rebuild_worker,
+            initargs=initargs,
+        )
+
+    async def rebuild(self) -> dict:
+        """
+        Recompute the neighbors of every link and replace the table
+
+        Progress is reported by stats() while it runs.
+
+        Raises:
+            RuntimeError: if a rebuild is already running
+            TimeoutError: if computing takes longer than `rebuild_timeout` seconds
+        """
+        if self.running:
+            raise RuntimeError("A related-links rebuild is already running")
+
+        self.running = True
+        self.progress = {"links": 0, "chunks": 0, "chunks_done": 0}
+        self.started_at = time.monotonic()
+        self.last_error = None
+        try:
+            return await self._rebuild()
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+        finally:
+            self.running = False
+
+    def _chunk_done(self, _) -> None:
+        self.progress["chunks_done"] += 1
+
+    async def _rebuild(self) -> dict:
+        start = time.monotonic()
+        index = await asyncio.to_thread(self._reload)
+        tags, vectors = dict(index.tags), dict(index.vectors)
+
+        link_ids = sorted(tags)
+        loop = asyncio.get_running_loop()
+        executor = self._rebuild_executor(tags, frozenset(index.category_ids), vectors)
+        futures = [
+            loop.run_in_executor(
+                executor,
+                _query_chunk,
+                link_ids[i : i + REBUILD_CHUNK],
+                self.k,
+                self.text_weight,
+                self.min_score,
+            )
+            for i in range(0, len(link_ids), REBUILD_CHUNK)
+        ]
+        self.progress = {"links": len(link_ids), "chunks": len(futures), "chunks_done": 0}
+        for future in futures:
+            future.add_done_callback(self._chunk_done)
+        try:
+            chunks = await asyncio.wait_for(asyncio.gather(*futures), timeout=self.rebuild_timeout)
+        except asyncio.TimeoutError:
+            if isinstance(executor, ProcessPoolExecutor):
+                for process in list((executor._processes or {}).values()):
+                    process.terminate()
+            raise TimeoutError(f"相关链接重算超时 ({self.rebuild_timeout}s)")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        rows = [
+            {"link_id": link_id, "related_id": other, "score": score}
+            for chunk in chunks
+            for link_id, neighbors in chunk.items()
+            for other, score in neighbors
+        ]
+
+        with Session(engine) as session:
+            session.exec(delete(RelatedLink))
+            if rows:
+                session.execute(insert(RelatedLink), rows)
+            session.commit()
+
+        self.rebuilds += 1
+        self.last_rebuild = {
+            "links": len(link_ids),
+            "with_text": len(vectors),
+            "pairs": len(rows),
+            "seconds": round(time.monotonic() - start, 2),
+        }
+        print(
+            f"Related links rebuilt: {len(rows)} pairs for {len(link_ids)} links "
+            f"in {self.last_rebuild['seconds']}s"
+        )
+        return self.last_rebuild
+
+    async def update(self, link_id: int) -> None:
+        """Refresh the neighbors of one link and its place in other links' lists"""
+        index = await self._ensure_index()
+        with Session(engine) as session:
+            link = session.exec(
+                select(Link.title, Link.description).where(
+                    Link.id == link_id,
+                    Link.is_processed == True,  # noqa: E712
+                    Link.processing_failed == False,  # noqa: E712
+                )
+            ).first()
+            link_tags = session.exec(
+                select(Tag.id, Tag.is_category)
+                .join(TagLinkAssociation, TagLinkAssociation.tag_id == Tag.id)
+                .where(TagLinkAssociation.link_id == link_id)
+            ).all()
+        if link is None:
+            self.remove(link_id)
+            return
+
+        index.category_ids.update(tag_id for tag_id, is_category in link_tags if is_category)
+        with self._lock:
+            counts = self._counts(link_id, *link)
+        index.set(link_id, frozenset(tag_id for tag_id, _ in link_tags), self._vector(counts, self._idf))
+        scores = index.query([link_id], None, self.text_weight, self.min_score)[link_id]
+
+        with Session(engine) as session:
+            session.exec(
+                delete(RelatedLink).where(
+                    or_(RelatedLink.link_id == link_id, RelatedLink.related_id == link_id)
+                )
+            )
+            rows = [
+                {"link_id": link_id, "related_id": other, "score": score}
+                for other, score in scores[: self.k]
+            ]
+
+            # Similarity is symmetric: this link joins every list whose
+            # weakest entry it beats (or that is not full yet)
+            score_of = dict(scores)
+            lists = session.exec(
+                select(RelatedLink.link_id, func.count(), func.min(RelatedLink.score))
+                .where(RelatedLink.link_id.in_(list(score_of)))
+                .group_by(RelatedLink.link_id)
+            ).all()
+            full = {other: weakest for other, count, weakest in lists if count >= self.k}
+            for other, score in scores:
+                if other in full:
+                    if score <= full[other]:
+                        continue
+                    weakest = session.exec(
+                        select(RelatedLink.related_id)
+                        .where(RelatedLink.link_id == other)
+                        .order_by(RelatedLink.score, RelatedLink.related_id.desc())
+                        .limit(1)
+                    ).one()
+                    session.exec(
+                        delete(RelatedLink).where(
+                            RelatedLink.link_id == other, RelatedLink.related_id == weakest
+                        )
+                    )
+                rows.append({"link_id": other, "related_id": link_id, "score": score})
+
+            if rows:
+                session.execute(insert(RelatedLink), rows)
+            session.commit()
+        self.updates += 1
+
+    def remove(self, link_id: int, session: Optional[Session] = None) -> None:
+        """Drop a link from the table; with a session, committed by the caller"""
+        if self._index is not None:
+            self._index.remove(link_id)
+        with self._lock:
+            self._terms.pop(link_id, None)
+        query = delete(RelatedLink).where(
+            or_(RelatedLink.link_id == link_id, RelatedLink.related_id == link_id)
+        )
+        if session is not None:
+            session.exec(query)
+            return
+        with Session(engine) as own:
+            own.exec(query)
+            own.commit()
+
+    def neighbors(self, session: Session, link_id: int, limit: Optional[int] = None) -> List[Tuple[Link, float]]:
+        """Stored related links of a link with their scores, best first"""
+        return session.exec(
+            select(Link, RelatedLink.score)
+            .join(RelatedLink, RelatedLink.related_id == Link.id)
+            .where(RelatedLink.link_id == link_id)
+            .order_by(RelatedLink.score.desc(), Link.id)
+            .limit(limit or self.k)
+        ).all()
+
+    def stats(self) -> dict:
+        with Session(engine) as session:
+            pairs, links = session.exec(
+                select(func.count(RelatedLink.link_id), func.count(func.distinct(RelatedLink.link_id)))
+            ).one()
+
+        elapsed = None
+        if self.running and self.started_at is not None:
+            elapsed = round(time.monotonic() - self.started_at, 1)
+        return {
+            "k": self.k,
+            "text_weight": self.text_weight,
+            "min_score": self.min_score,
+            "pairs": pairs,
+            "links_with_related": links,
+            "rebuilds": self.rebuilds,
+            "updates": self.updates,
+            "running": self.running,
+            "progress": {**self.progress, "seconds": elapsed},
+            "last_error": self.last_error,
+            "last_rebuild": self.last_rebuild,
+        }
+
+
+# Global instance
+related_links = RelatedLinks(
+    k=settings.RELATED_LINKS_K,
+    text_weight=settings.RELATED_LINKS_TEXT_WEIGHT,
+    min_score=settings.RELATED_LINKS_MIN_SCORE,
+    rebuild_timeout=settings.RELATED_LINKS_REBUILD_TIMEOUT,
+    ttl=settings.RELATED_LINKS_INDEX_TTL,
+)
@@ -0,0 +1,156 @@
+"""Shadow Taxonomy Service - Build a full rebuild's tags off to the side and swap them in at once"""
+
+from dataclasses import dataclass
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.database import engine
+from app.services.tag_cooccurrence import tag_cooccurrence
+from app.services.tag_vocabulary import staging_vocabulary, tag_vocabulary
+from app.services.taxonomy_state import taxonomy_state
+
+
+@dataclass
+class SwapResult:
+    """What the swap put into the live tables"""
+
+    tags: int
+    associations: int
+    carried_links: int  # 沿用旧标签的链接（重建失败或重建期间新增）
+
+
+class ShadowTaxonomy:
+    """
+    Staging tables for full rebuilds.
+
+    A full rebuild writes tags and associations into tag_staging and
+    tag_link_association_staging while the tag and tag_link_association
+    tables keep serving the old taxonomy. swap() replaces the live tables
+    with the staging content in a single transaction, so readers see
+    either the complete old or the complete new taxonomy.
+
+    Links without a staged result (processing failed, or added while the
+    rebuild ran) keep their current tags: those are copied into staging by
+    name and category name just before the swap.
+
+    There is one set of staging tables, so only one process (API, bot or
+    CLI) may rebuild at a time: begin() claims the rebuild lock in
+    taxonomy_state, swap() and discard() release it. The swap also bumps
+    the taxonomy generation so other processes reload their tag caches.
+    """
+
+    def begin(self) -> None:
+        """Start a rebuild with empty staging tables"""
+        holder = taxonomy_state.acquire_rebuild()
+        if holder:
+            raise RuntimeError(f"A full rebuild is already running: {holder}")
+        try:
+            self._clear()
+        except BaseException:
+            taxonomy_state.release_rebuild()
+            raise
+
+    def discard(self) -> None:
+        """Abandon the staged taxonomy, the live tables stay as they are"""
+        try:
+            self._clear()
+        finally:
+            taxonomy_state.release_rebuild()
+
+    def _clear(self) -> None:
+        with Session(engine) as session:
+            session.exec(text("DELETE FROM tag_link_association_staging"))
+            session.exec(text("DELETE FROM tag_staging"))
+            session.commit()
+        staging_vocabulary.invalidate()
+
+    def swap(self) -> SwapResult:
+        """Carry over tags of links without a staged result, then swap staging into the live tables"""
+        with Session(engine) as session:
+            session.exec(text("DROP TABLE IF EXISTS temp.carried_links"))
+            session.exec(
+                text(
+                    "CREATE TEMP TABLE carried_links AS "
+                    "SELECT DISTINCT link_id FROM tag_link_association "
+                    "WHERE link_id NOT IN (SELECT link_id FROM tag_link_association_staging)"
+                )
+            )
+            carried = session.exec(text("SELECT COUNT(*) FROM carried_links")).one()[0]
+
+            if carried:
+                # Categories of carried links missing from the new taxonomy
+                session.exec(
+                    text(
+                        "INSERT INTO tag_staging (name, color, parent_id, is_category, sort_order) "
+                        "SELECT t.name, MIN(t.color), NULL, 1, MIN(t.sort_order) FROM tag t "
+                        "JOIN tag_link_association a ON a.tag_id = t.id "
+                        "JOIN carried_links c ON c.link_id = a.link_id "
+                        "WHERE t.is_category = 1 AND NOT EXISTS (SELECT 1 FROM tag_staging s "
+                        "WHERE s.is_category = 1 AND s.name = t.name) "
+                        "GROUP BY t.name ORDER BY MIN(t.id)"
+                    )
+                )
+                # Sub-tags, under the staged category of the same name
+                session.exec(
+                    text(
+                        "INSERT INTO tag_staging (name, color, parent_id, is_category, sort_order) "
+                        "SELECT t.name, MIN(COALESCE(sp.color, t.color)), sp.id, 0, MIN(t.sort_order) FROM tag t "
+                        "JOIN tag_link_association a ON a.tag_id = t.id "
+                        "JOIN carried_links c ON c.link_id = a.link_id "
+                        "LEFT JOIN tag p ON p.id = t.parent_id "
+                        "LEFT JOIN tag_staging sp ON sp.is_category = 1 AND sp.name = p.name "
+                        "WHERE t.is_category = 0 AND NOT EXISTS (SELECT 1 FROM tag_staging s "
+                        "WHERE s.is_category = 0 AND s.name = t.name AND s.parent_id IS sp.id) "
+                        "GROUP BY t.name, sp.id ORDER BY MIN(t.id)"
+                    )
+                )
+                session.exec(
+                    text(
+                        "INSERT INTO tag_link_association_staging (tag_id, link_id) "
+                        "SELECT DISTINCT s.id, a.link_id FROM tag_link_association a "
+                        "JOIN carried_links c ON c.link_id = a.link_id "
+                        "JOIN tag t ON t.id = a.tag_id "
+                        "LEFT JOIN tag p ON p.id = t.parent_id "
+                        "JOIN tag_staging s ON s.is_category = t.is_category AND s.name = t.name "
+                        "LEFT JOIN tag_staging sp ON sp.id = s.parent_id "
+                        "WHERE sp.name IS p.name"
+                    )
+                )
+            session.exec(text("DROP TABLE temp.carried_links"))
+
+            # Swap: readers keep seeing the old rows until this commit
+            session.exec(text("DELETE FROM tag_link_association"))
+            session.exec(text("DELETE FROM tag"))
+            tags = session.exec(
+                text(
+                    "INSERT INTO tag (id, name, color, parent_id, is_category, sort_order) "
+                    "SELECT id, name, color, parent_id, is_category, sort_order FROM tag_staging ORDER BY id"
+                )
+            ).rowcount
+            # Links deleted while the rebuild ran are dropped
+            associations = session.exec(
+                text(
+                    "INSERT INTO tag_link_association (tag_id, link_id) "
+                    "SELECT tag_id, link_id FROM tag_link_association_staging "
+                    "WHERE link_id IN (SELECT id FROM link)"
+                )
+            ).rowcount
+            session.exec(text("DELETE FROM tag_link_association_staging"))
+            session.exec(text("DELETE FROM tag_staging"))
+            taxonomy_state.bump(session)
+            taxonomy_state.release_rebuild(session)
+            session.commit()
+
+        tag_vocabulary.invalidate()
+        staging_vocabulary.invalidate()
+        tag_cooccurrence.invalidate()
+        print(
+            f"Taxonomy swapped in: {tags} tags, {associations} associations, "
+            f"{carried} links kept their previous tags"
+        )
+        return SwapResult(tags=tags, associations=associations, carried_links=carried)
+
+
+# Global instance
+shadow_taxonomy = ShadowTaxonomy()
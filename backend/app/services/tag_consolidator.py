@@ -0,0 +1,408 @@
+"""Tag Consolidator Service - Find and merge near-duplicate tags and categories"""
+
+import hashlib
+import math
+from collections import Counter, defaultdict
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+from sqlmodel import Session, select
+
+from app.database import engine
+from app.models import Tag, TagLinkAssociation
+from app.services.tag_cooccurrence import tag_cooccurrence
+from app.services.tag_matcher import numbers_differ, tag_matcher
+from app.services.tag_vocabulary import tag_vocabulary
+
+
+@dataclass
+class MergeProposal:
+    """One cluster of names that should become `canonical`"""
+
+    id: str  # 由层级和成员名称计算，重复运行时保持不变
+    level: str  # "category" 或 "tag"
+    canonical: str
+    members: List[dict]  # {"name", "links", "score", "context", "reason"}，不含 canonical
+    links: int  # 涉及的链接数
+
+
+@dataclass
+class ConsolidationReport:
+    """Proposals and the effect of applying the accepted ones"""
+
+    dry_run: bool
+    proposals: List[MergeProposal]
+    accepted: List[str] = field(default_factory=list)
+    tags_removed: int = 0
+    tags_updated: int = 0  # 改名或移动到其他分类
+    associations_moved: int = 0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _cosine(a: Counter, b: Counter) -> float:
+    if not a or not b:
+        return 0.0
+    dot = sum(weight * b[key] for key, weight in a.items() if key in b)
+    norm = math.sqrt(sum(w * w for w in a.values())) * math.sqrt(sum(w * w for w in b.values()))
+    return dot / norm if norm else 0.0
+
+
+class TagConsolidator:
+    """
+    Clusters near-duplicate names ("大模型" / "LLM" / "大语言模型") and
+    merges them.
+
+    Sub-tags are compared by name across all categories, categories among
+    themselves. Two names are linked when:
+
+    - their normalized keys are equal (tag_matcher: width/case folding,
+      aliases), or
+    - their edit distance similarity reaches `name_threshold`, or
+    - one name contains the other and they are used in similar contexts:
+      cosine similarity of the sub-tags they co-occur with over
+      tag_link_association reaches `context_threshold`
+
+    Short names an edit apart in the same context ("React" / "Preact")
+    are usually different things, so similar spelling alone is not
+    combined with context evidence.
+
+    Names that appear together on many of the same links, or whose numbers
+    differ (GPT-3 / GPT-4), are never merged. Each cluster is the most used
+    name plus the names linked to it directly; links are not followed
+    transitively.
+
+    Applying rewrites everything in one transaction with set-based
+    statements: merged categories move their sub-tags to the canonical
+    category, merged sub-tags are renamed or folded into the canonical tag
+    of the same category, and associations are rewritten through a mapping
+    table.
+    """
+
+    def __init__(
+        self,
+        name_threshold: float = 0.85,
+        context_threshold: float = 0.5,
+        max_overlap: float = 0.5,
+        min_links: int = 2,
+    ):
+        self.name_threshold = name_threshold
+        self.context_threshold = context_threshold
+        self.max_overlap = max_overlap
+        self.min_links = min_links
+
+    # ---- analysis ----
+
+    def _load(self, session: Session):
+        tags = {tag.id: tag for tag in session.exec(select(Tag)).all()}
+        links_by_tag: Dict[int, Set[int]] = defaultdict(set)
+        for tag_id, link_id in session.exec(
+            select(TagLinkAssociation.tag_id, TagLinkAssociation.link_id)
+        ).all():
+            links_by_tag[tag_id].add(link_id)
+        return tags, links_by_tag
+
+    def _profiles(
+        self,
+        tags: Dict[int, Tag],
+        links_by_tag: Dict[int, Set[int]],
+        is_category: bool,
+    ) -> Tuple[Dict[str, Set[int]], Dict[str, Counter]]:
+        """
+        Per name: links using it, and counts of the sub-tags on those links.
+
+        Categories are left out of the context: every link has one and they
+        are broad, so two unrelated names in the same category ("React" /
+        "macOS" under 技术) would look alike.
+        """
+        names_by_link: Dict[int, Set[str]] = defaultdict(set)
+        for tag_id, link_ids in links_by_tag.items():
+            tag = tags.get(tag_id)
+            if tag is not None and not tag.is_category:
+                for link_id in link_ids:
+                    names_by_link[link_id].add(tag.name)
+
+        links: Dict[str, Set[int]] = defaultdict(set)
+        for tag in tags.values():
+            if tag.is_category == is_category:
+                links[tag.name] |= links_by_tag.get(tag.id, set())
+
+        context: Dict[str, Counter] = {}
+        for name, link_ids in links.items():
+            counter: Counter = Counter()
+            for link_id in link_ids:
+                counter.update(names_by_link[link_id] - {name})
+            context[name] = counter
+        return links, context
+
+    @staticmethod
+    def _contains(a: str, b: str) -> bool:
+        """
+        Whether one name is a part of the other: a substring for Chinese
+        ("前端" / "前端开发"), whole words for English ("React" / "React
+        Native", but not "Java" / "JavaScript")
+        """
+        shorter, longer = sorted((a, b), key=lambda n: len(tag_matcher.normalize(n)))
+        short_key, long_key = tag_matcher.normalize(shorter), tag_matcher.normalize(longer)
+        if len(short_key) < 2 or short_key == long_key:
+            return False
+        if short_key.isascii():
+            return set(tag_matcher.tokens(shorter)) <= set(tag_matcher.tokens(longer))
+        return short_key in long_key
+
+    def _cluster(
+        self, level: str, links: Dict[str, Set[int]], context: Dict[str, Counter]
+    ) -> List[MergeProposal]:
+        names = sorted(links)
+        keys = {name: tag_matcher.normalize(name) for name in names}
+
+        # Only names sharing a key bigram are compared
+        index: Dict[str, List[str]] = defaultdict(list)
+        for name in names:
+            key = keys[name]
+            for gram in {key[i : i + 2] for i in range(max(1, len(key) - 1))}:
+                index[gram].append(name)
+        pairs = {
+            (a, b)
+            for bucket in index.values()
+            for i, a in enumerate(bucket)
+            for b in bucket[i + 1 :]
+        }
+
+        edges: Dict[str, Dict[str, Tuple[float, float, str]]] = defaultdict(dict)
+        for a, b in sorted(pairs):
+            if not keys[a] or not keys[b] or numbers_differ(keys[a], keys[b]):
+                # Python 3.11 / Python 3.12, Vue 2 / Vue 3 are different things
+                continue
+            smaller = min(len(links[a]), len(links[b]))
+            if smaller and len(links[a] & links[b]) / smaller > self.max_overlap:
+                continue
+
+            score = 1.0 if keys[a] == keys[b] else tag_matcher.edit_similarity(a, b)
+            similarity = _cosine(
+                Counter({k: v for k, v in context[a].items() if k != b}),
+                Counter({k: v for k, v in context[b].items() if k != a}),
+            )
+            if keys[a] == keys[b]:
+                reason = "同义词"
+            elif score >= self.name_threshold:
+                reason = "名称相似"
+            elif (
+                # "前端" / "前端开发": only merged on context evidence
+                self._contains(a, b)
+                and similarity >= self.context_threshold
+                and smaller >= self.min_links
+            ):
+                reason = "名称包含且共现标签相似"
+            else:
+                continue
+            edges[a][b] = edges[b][a] = (score, similarity, reason)
+
+        # Most used names first claim the names linked to them directly;
+        # similarity is not transitive, so clusters are never chained
+        # (A ~ B and B ~ C does not make A ~ C)
+        proposals = []
+        claimed: Set[str] = set()
+        for canonical in sorted(edges, key=lambda n: (-len(links[n]), len(n), n)):
+            if canonical in claimed:
+                continue
+            linked = [name for name in edges[canonical] if name not in claimed]
+            if not linked:
+                continue
+            members = [canonical] + linked
+            claimed.update(members)
+            others = []
+            for name in sorted(linked, key=lambda n: (-len(links[n]), n)):
+                score, similarity, reason = edges[canonical][name]
+                others.append(
+                    {
+                        "name": name,
+                        "links": len(links[name]),
+                        "score": round(score, 3),
+                        "context": round(similarity, 3),
+                        "reason": reason,
+                    }
+                )
+            digest = hashlib.sha1("\0".join([level] + sorted(members)).encode("utf-8")).hexdigest()
+            proposals.append(
+                MergeProposal(
+                    id=digest[:10],
+                    level=level,
+                    canonical=canonical,
+                    members=others,
+                    links=len(set().union(*(links[n] for n in members))),
+                )
+            )
+
+        proposals.sort(key=lambda p: (-p.links, p.canonical))
+        return proposals
+
+    def propose(self, session: Optional[Session] = None) -> List[MergeProposal]:
+        """Merge proposals for categories and sub-tags"""
+        if session is None:
+            with Session(engine) as session:
+                return self.propose(session)
+
+        tags, links_by_tag = self._load(session)
+        proposals = []
+        for level, is_category in (("category", True), ("tag", False)):
+            links, context = self._profiles(tags, links_by_tag, is_category)
+            proposals.extend(self._cluster(level, links, context))
+        return proposals
+
+    # ---- applying ----
+
+    def _plan(
+        self,
+        tags: Dict[int, Tag],
+        links_by_tag: Dict[int, Set[int]],
+        accepted: List[MergeProposal],
+    ) -> Tuple[Dict[int, int], Dict[int, dict]]:
+        """
+        Tag id mapping (removed -> kept) and the new state of changed tags.
+
+        Categories are merged first so that sub-tags arriving in the
+        canonical category are deduplicated together with its own. Rows
+        with the same name under the same category are always folded.
+        """
+        state = {
+            tag.id: {"name": tag.name, "parent_id": tag.parent_id, "color": tag.color}
+            for tag in tags.values()
+        }
+        mapping: Dict[int, int] = {}
+
+        def pick(ids: List[int], name: str) -> int:
+            """Row to keep: one already carrying the name, else the most used"""
+            named = [i for i in ids if state[i]["name"] == name]
+            if named:
+                return min(named)
+            return min(ids, key=lambda i: (-len(links_by_tag.get(i, ())), i))
+
+        # 1. Categories
+        category_ids: Dict[str, List[int]] = defaultdict(list)
+        for tag in tags.values():
+            if tag.is_category:
+                category_ids[tag.name].append(tag.id)
+        for proposal in (p for p in accepted if p.level == "category"):
+            names = [proposal.canonical] + [m["name"] for m in proposal.members]
+            ids = [i for name in names for i in category_ids.get(name, [])]
+            if len(ids) < 2:
+                continue
+            keep = pick(ids, proposal.canonical)
+            state[keep]["name"] = proposal.canonical
+            for i in ids:
+                if i != keep:
+                    mapping[i] = keep
+            for tag in tags.values():
+                if not tag.is_category and tag.parent_id in ids and tag.parent_id != keep:
+                    state[tag.id]["parent_id"] = keep
+                    state[tag.id]["color"] = state[keep]["color"]
+
+        # 2. Sub-tags, per (final) category
+        renames = {
+            member["name"]: proposal.canonical
+            for proposal in accepted
+            if proposal.level == "tag"
+            for member in proposal.members
+        }
+        groups: Dict[Tuple[Optional[int], str], List[int]] = defaultdict(list)
+        for tag in tags.values():
+            if not tag.is_category:
+                name = renames.get(state[tag.id]["name"], state[tag.id]["name"])
+                groups[(state[tag.id]["parent_id"], name)].append(tag.id)
+        for (_, name), ids in groups.items():
+            keep = pick(ids, name)
+            state[keep]["name"] = name
+            for i in ids:
+                if i != keep:
+                    mapping[i] = keep
+
+        changed = {
+            tag_id: new
+            for tag_id, new in state.items()
+            if tag_id not in mapping
+            and (
+                new["name"] != tags[tag_id].name
+                or new["parent_id"] != tags[tag_id].parent_id
+                or new["color"] != tags[tag_id].color
+            )
+        }
+        return mapping, changed
+
+    def consolidate(
+        self, ids: Optional[List[str]] = None, dry_run: bool = True
+    ) -> ConsolidationReport:
+        """
+        Propose merges and apply the accepted ones.
+
+        Args:
+            ids: Proposal ids to apply; None accepts every proposal
+            dry_run: Only report what would change
+        """
+        with Session(engine) as session:
+            tags, links_by_tag = self._load(session)
+            proposals = self.propose(session)
+            accepted = [p for p in proposals if ids is None or p.id in ids]
+            mapping, changed = self._plan(tags, links_by_tag, accepted)
+
+            report = ConsolidationReport(
+                dry_run=dry_run,
+                proposals=proposals,
+                accepted=[p.id for p in accepted],
+                tags_removed=len(mapping),
+                tags_updated=len(changed),
+                associations_moved=sum(len(links_by_tag.get(i, ())) for i in mapping),
+            )
+            if dry_run or not (mapping or changed):
+                return report
+
+            session.exec(text("DROP TABLE IF EXISTS temp.tag_merge_map"))
+            session.exec(
+                text(
+                    "CREATE TEMP TABLE tag_merge_map "
+                    "(old_id INTEGER PRIMARY KEY, new_id INTEGER NOT NULL)"
+                )
+            )
+            if mapping:
+                session.exec(
+                    text("INSERT INTO tag_merge_map (old_id, new_id) VALUES (:old_id, :new_id)"),
+                    params=[{"old_id": old, "new_id": new} for old, new in mapping.items()],
+                )
+            if changed:
+                session.exec(
+                    text("UPDATE tag SET name = :name, parent_id = :parent_id, color = :color WHERE id = :id"),
+                    params=[{"id": tag_id, **new} for tag_id, new in changed.items()],
+                )
+            # Re-point associations, skipping links that already carry the kept tag
+            session.exec(
+                text(
+                    "INSERT INTO tag_link_association (tag_id, link_id) "
+                    "SELECT DISTINCT m.new_id, a.link_id FROM tag_link_association a "
+                    "JOIN tag_merge_map m ON a.tag_id = m.old_id "
+                    "WHERE NOT EXISTS (SELECT 1 FROM tag_link_association b "
+                    "WHERE b.tag_id = m.new_id AND b.link_id = a.link_id)"
+                )
+            )
+            session.exec(
+                text(
+                    "DELETE FROM tag_link_association "
+                    "WHERE tag_id IN (SELECT old_id FROM tag_merge_map)"
+                )
+            )
+            session.exec(text("DELETE FROM tag WHERE id IN (SELECT old_id FROM tag_merge_map)"))
+            session.exec(text("DROP TABLE temp.tag_merge_map"))
+            session.commit()
+
+        tag_vocabulary.invalidate()
+        tag_cooccurrence.invalidate()
+        print(
+            f"Tag consolidation: {len(accepted)} merges, {report.tags_removed} tags removed, "
+            f"{report.tags_updated} updated, {report.associations_moved} associations moved"
+        )
+        return report
+
+
+# Global instance
+tag_consolidator = TagConsolidator()
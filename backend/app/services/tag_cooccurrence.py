@@ -0,0 +1,241 @@
+"""Tag Co-occurrence Service - Sparse in-memory tag x tag link counts for related tags and suggestions"""
+
+import heapq
+import threading
+import time
+from itertools import combinations
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+from sqlmodel import Session, select
+
+from app.config import settings
+from app.database import engine
+from app.models import TagLinkAssociation
+from app.services.taxonomy_state import taxonomy_state
+
+# (tag_id, 共现链接数, 得分)
+ScoredTag = Tuple[int, int, float]
+
+
+class TagCooccurrence:
+    """
+    How often every two tags are used on the same link.
+
+    The matrix is sparse and symmetric: one dict per tag mapping each tag
+    it co-occurs with to the number of shared links, plus the link count
+    of every tag and the current tag set of every link. It is loaded with
+    one scan of tag_link_association, then maintained incrementally:
+    set_link_tags() applies the difference between a link's old and new
+    tags, touching only the pairs that changed. Bulk rewrites (rebuild
+    swap, consolidation, tag deletion) call invalidate(). A swap in another
+    process is noticed through the taxonomy_state generation; other writes
+    from other processes are picked up by a reload after `ttl` seconds.
+
+    related() and suggest() read one or a few rows, so they stay well
+    under a millisecond regardless of the number of links.
+    """
+
+    def __init__(self, ttl: float = 600.0):
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._loaded_at = 0.0
+        self._generation = 0
+        self._link_tags: Dict[int, FrozenSet[int]] = {}
+        self._totals: Dict[int, int] = {}  # tag_id -> 关联链接数
+        self._pairs: Dict[int, Dict[int, int]] = {}  # tag_id -> {tag_id: 共现链接数}
+        self._sorted: Dict[int, List[Tuple[int, int]]] = {}  # 按共现数降序排列的行，修改时失效
+
+        # Counters since process start
+        self.reloads = 0
+        self.updates = 0
+
+    def invalidate(self) -> None:
+        """Force a reload on next access"""
+        self._loaded_at = 0.0
+
+    def _is_fresh(self, generation: int) -> bool:
+        return generation == self._generation and time.monotonic() - self._loaded_at < self.ttl
+
+    def _ensure_loaded(self) -> None:
+        generation = taxonomy_state.generation()
+        if self._is_fresh(generation):
+            return
+
+        with self._lock:
+            if self._is_fresh(generation):
+                return  # reloaded by another thread meanwhile
+
+            with Session(engine) as session:
+                rows = session.exec(
+                    select(TagLinkAssociation.link_id, TagLinkAssociation.tag_id)
+                ).all()
+
+            link_tags: Dict[int, set] = {}
+            for link_id, tag_id in rows:
+                link_tags.setdefault(link_id, set()).add(tag_id)
+
+            self._link_tags = {}
+            self._totals = {}
+            self._pairs = {}
+            self._sorted = {}
+            for link_id, tags in link_tags.items():
+                self._link_tags[link_id] = frozenset(tags)
+                self._add(tags, (), 1)
+
+            self._loaded_at = time.monotonic()
+            self._generation = generation
+            self.reloads += 1
+
+    def _adjust(self, a: int, b: int, delta: int) -> None:
+        for x, y in ((a, b), (b, a)):
+            self._sorted.pop(x, None)
+            row = self._pairs.setdefault(x, {})
+            count = row.get(y, 0) + delta
+            if count > 0:
+                row[y] = count
+            else:
+                row.pop(y, None)
+                if not row:
+                    del self._pairs[x]
+
+    def _add(self, tags: Iterable[int], kept: Iterable[int], delta: int) -> None:
+        """Add (delta=1) or remove (delta=-1) `tags` on a link that keeps `kept`"""
+        tags = sorted(tags)
+        for tag_id in tags:
+            count = self._totals.get(tag_id, 0) + delta
+            if count > 0:
+                self._totals[tag_id] = count
+            else:
+                self._totals.pop(tag_id, None)
+            for other in kept:
+                self._adjust(tag_id, other, delta)
+        for a, b in combinations(tags, 2):
+            self._adjust(a, b, delta)
+
+    def set_link_tags(self, link_id: int, tag_ids: Iterable[int]) -> None:
+        """Record the current tags of a link (empty when its tags were cleared or it was deleted)"""
+        self._ensure_loaded()
+        new = frozenset(tag_ids)
+        with self._lock:
+            old = self._link_tags.get(link_id, frozenset())
+            if old == new:
+                return
+            kept = old & new
+            self._add(old - new, kept, -1)
+            self._add(new - old, kept, 1)
+            if new:
+                self._link_tags[link_id] = new
+            else:
+                self._link_tags.pop(link_id, None)
+            self.updates += 1
+
+    def remove_link(self, link_id: int) -> None:
+        """Drop a deleted link's tags from the counts"""
+        self.set_link_tags(link_id, ())
+
+    def count(self, a: int, b: int) -> int:
+        """Number of links tagged with both tags"""
+        self._ensure_loaded()
+        return self._pairs.get(a, {}).get(b, 0)
+
+    def _row(self, tag_id: int) -> List[Tuple[int, int]]:
+        """(tag_id, count) pairs co-occurring with a tag, most shared links first"""
+        row = self._sorted.get(tag_id)
+        if row is None:
+            row = sorted(self._pairs.get(tag_id, {}).items(), key=lambda item: -item[1])
+            self._sorted[tag_id] = row
+        return row
+
+    @staticmethod
+    def _push(heap: list, limit: int, item: tuple) -> None:
+        if len(heap) < limit:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+
+    @staticmethod
+    def _ranked(heap: list) -> List[ScoredTag]:
+        return [(-neg_id, count, score) for score, count, neg_id in sorted(heap, reverse=True)]
+
+    def related(self, tag_id: int, limit: int = 10) -> List[ScoredTag]:
+        """
+        Tags most often used together with a tag, by Jaccard similarity of
+        their link sets (shared links / links with either tag).
+
+        The row is walked by descending count; since Jaccard is at most
+        count / links of this tag, the walk stops as soon as no remaining
+        tag can enter the top `limit`.
+        """
+        self._ensure_loaded()
+        with self._lock:
+            total = self._totals.get(tag_id, 0)
+            heap: list = []
+            for other, count in self._row(tag_id):
+                if len(heap) == limit and count / total < heap[0][0]:
+                    break
+                score = count / (total + self._totals[other] - count)
+                self._push(heap, limit, (score, count, -other))
+        return self._ranked(heap)
+
+    def suggest(self, tag_ids: Iterable[int], limit: int = 10) -> List[ScoredTag]:
+        """
+        Tags to add to a link that has `tag_ids`: the mean probability of
+        seeing each other tag on a link with one of them.
+
+        The rows of the selected tags are walked in parallel by descending
+        count (threshold algorithm): a tag not seen yet scores at most the
+        mean of the current counts, so the walk stops once the top `limit`
+        are certain.
+        """
+        self._ensure_loaded()
+        with self._lock:
+            selected = set(tag_ids)
+            rows = [
+                (self._row(tag_id), self._pairs.get(tag_id, {}), 1 / self._totals[tag_id])
+                for tag_id in selected
+                if self._totals.get(tag_id)
+            ]
+            if not rows:
+                return []
+
+            seen = set(selected)
+            heap: list = []
+            depth = 0
+            while True:
+                threshold = 0.0
+                exhausted = True
+                for row, _, weight in rows:
+                    if depth >= len(row):
+                        continue
+                    exhausted = False
+                    other, count = row[depth]
+                    threshold += count * weight
+                    if other in seen:
+                        continue
+                    seen.add(other)
+                    shared = [(pairs.get(other, 0), w) for _, pairs, w in rows]
+                    score = sum(c * w for c, w in shared) / len(selected)
+                    self._push(heap, limit, (score, sum(c for c, _ in shared), -other))
+                if exhausted or (len(heap) == limit and heap[0][0] >= threshold / len(selected)):
+                    break
+                depth += 1
+        return self._ranked(heap)
+
+    def stats(self) -> dict:
+        self._ensure_loaded()
+        tags = len(self._totals)
+        pairs = sum(len(row) for row in self._pairs.values()) // 2
+        possible = tags * (tags - 1) // 2
+        return {
+            "links": len(self._link_tags),
+            "tags": tags,
+            "pairs": pairs,
+            "density": round(pairs / possible, 4) if possible else 0.0,
+            "reloads": self.reloads,
+            "updates": self.updates,
+        }
+
+
+# Global instance
+tag_cooccurrence = TagCooccurrence(ttl=settings.TAG_COOCCURRENCE_TTL)
@@ -0,0 +1,337 @@
+"""Tag Matcher Service - Map candidate tags onto existing tags without an LLM call"""
+
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+
+
+# 常见的中英文同义词和缩写，按归一化后的词元匹配（两侧都会替换）
+DEFAULT_ALIASES: Dict[str, str] = {
+    "engineering": "工程",
+    "development": "开发",
+    "dev": "开发",
+    "frontend": "前端",
+    "backend": "后端",
+    "design": "设计",
+    "security": "安全",
+    "testing": "测试",
+    "test": "测试",
+    "database": "数据库",
+    "db": "数据库",
+    "architecture": "架构",
+    "framework": "框架",
+    "tutorial": "教程",
+    "tool": "工具",
+    "opensource": "开源",
+    "machinelearning": "机器学习",
+    "ml": "机器学习",
+    "deeplearning": "深度学习",
+    "dl": "深度学习",
+    "ai": "人工智能",
+    "llm": "大模型",
+    "大语言模型": "大模型",
+    "js": "javascript",
+    "ts": "typescript",
+    "py": "python",
+    "k8s": "kubernetes",
+    "golang": "go",
+    "postgres": "postgresql",
+    "nodejs": "node",
+    "node.js": "node",
+    "vuejs": "vue",
+    "reactjs": "react",
+}
+
+# ASCII 单词、数字（允许 + # . 以保留 C++ / C# / Node.js）或连续的非 ASCII 字符
+_TOKEN_RE = re.compile(r"[a-z0-9+#.]+|[^\x00-\x7f\s]+")
+
+# 名称中的数字（版本号、代数），不同则视为不同的标签
+_DIGITS_RE = re.compile(r"\d+")
+
+
+@dataclass
+class TagMatch:
+    """Result of matching one candidate set against the vocabulary"""
+
+    category: Optional[str]  # 匹配到的现有分类
+    tags: List[str]  # 匹配到的现有标签（去重，已排除分类名）
+    scores: Dict[str, float] = field(default_factory=dict)  # 候选标签 -> 最佳得分
+    confident: bool = False  # 所有候选均超过阈值，可直接使用
+
+
+class _Vocabulary:
+    """Normalized keys and bigrams of one tag list"""
+
+    def __init__(self, names: List[str], normalize):
+        self.names = names
+        self.keys: Dict[str, str] = {}  # key -> 第一个出现的名称
+        self.entries: List[Tuple[str, str, set]] = []  # (name, key, bigrams)
+        for name in names:
+            key = normalize(name)
+            if not key or key in self.keys:
+                continue
+            self.keys[key] = name
+            self.entries.append((name, key, _bigrams(key)))
+
+
+def _bigrams(key: str) -> set:
+    if len(key) < 2:
+        return {key}
+    return {key[i : i + 2] for i in range(len(key) - 1)}
+
+
+def numbers_differ(a: str, b: str) -> bool:
+    """Whether two names carry different numbers (versions, generations)"""
+    return _DIGITS_RE.findall(a) != _DIGITS_RE.findall(b)
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, giving up (returning limit + 1) once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(
+                min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            )
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class TagMatcher:
+    """
+    Scores candidate tags against existing tag names.
+
+    Names are compared by a normalized key (NFKC width folding, case
+    folding, separators removed, aliases applied per token). Keys that
+    differ are scored by edit distance and character bigram overlap, and
+    never match when their numbers (versions, generations) differ. When
+    the first candidate category and every candidate tag clear `threshold`,
+    the mapping can be used instead of the stage 2 LLM call.
+
+    A `shadow_rate` fraction of confident matches still goes to the LLM, and
+    every LLM decision is compared against the matcher's proposal, so the
+    stats show how well bypassing agrees with the model.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        threshold: float = 0.9,
+        shadow_rate: float = 0.1,
+        aliases: Optional[Dict[str, str]] = None,
+        min_fuzzy_length: int = 4,
+    ):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.shadow_rate = shadow_rate
+        self.min_fuzzy_length = min_fuzzy_length
+        self.aliases = {
+            self._stem(self._fold(k)): self._stem(self._fold(v))
+            for k, v in {**DEFAULT_ALIASES, **(aliases or {})}.items()
+        }
+
+        # 最近一次使用的词表，重建时每条链接的词表基本相同
+        self._vocab_cache: Dict[str, Tuple[tuple, _Vocabulary]] = {}
+
+        # Counters since process start
+        self.lookups = 0
+        self.bypassed = 0
+        self.shadowed = 0
+        self.compared = 0  # 与 LLM 结果比较的次数
+        self.category_agree = 0
+        self.tag_jaccard_sum = 0.0
+        self.confident_compared = 0  # 其中匹配器本可跳过 LLM 的次数
+        self.confident_category_agree = 0
+        self.confident_tag_jaccard_sum = 0.0
+
+    @staticmethod
+    def _fold(text: str) -> str:
+        return unicodedata.normalize("NFKC", text).casefold().strip()
+
+    @staticmethod
+    def _stem(token: str) -> str:
+        """简单的复数处理: tools -> tool"""
+        if token.isascii() and len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            return token[:-1]
+        return token
+
+    def tokens(self, name: str) -> List[str]:
+        """Normalized words of a tag name, aliases applied"""
+        tokens = []
+        for token in _TOKEN_RE.findall(self._fold(name)):
+            token = self._stem(token.strip("."))
+            tokens.append(self.aliases.get(token, token))
+        return tokens
+
+    def normalize(self, name: str) -> str:
+        """Comparison key of a tag name"""
+        key = "".join(self.tokens(name))
+        # 整体别名（如 "machine learning" -> machinelearning -> 机器学习）
+        return self.aliases.get(key, key)
+
+    def _vocabulary(self, kind: str, names: List[str]) -> _Vocabulary:
+        signature = tuple(names)
+        cached = self._vocab_cache.get(kind)
+        if cached and cached[0] == signature:
+            return cached[1]
+        vocab = _Vocabulary(names, self.normalize)
+        self._vocab_cache[kind] = (signature, vocab)
+        return vocab
+
+    def score(self, a: str, b: str) -> float:
+        """Similarity of two tag names in [0, 1]"""
+        return self._score_keys(self.normalize(a), self.normalize(b))
+
+    def _score_keys(self, a: str, b: str, b_grams: Optional[set] = None) -> float:
+        if a == b:
+            return 1.0
+        if min(len(a), len(b)) < self.min_fuzzy_length:
+            # 短名称（Go / AI / Vue）只接受完全匹配
+            return 0.0
+        if numbers_differ(a, b):
+            # Python 3.11 / Python 3.12、GPT-3 / GPT-4 只差一个数字，但不是同一个标签
+            return 0.0
+        edit = self._edit_similarity(a, b, self.threshold)
+        a_grams, b_grams = _bigrams(a), b_grams or _bigrams(b)
+        dice = 2 * len(a_grams & b_grams) / (len(a_grams) + len(b_grams))
+        return max(0.0, edit, dice)
+
+    @staticmethod
+    def _edit_similarity(a: str, b: str, threshold: float) -> float:
+        """1 - normalized edit distance; only exact down to `threshold`"""
+        longest = max(len(a), len(b))
+        limit = int(longest * (1 - threshold)) + 1
+        return 1 - _edit_distance(a, b, limit) / longest
+
+    def edit_similarity(self, a: str, b: str) -> float:
+        """
+        Edit distance similarity of two tag names in [0, 1]. Stricter than
+        score(), which also accepts bigram overlap: "React" / "Preact"
+        share most bigrams but are an edit apart in a short word.
+        """
+        a, b = self.normalize(a), self.normalize(b)
+        if a == b:
+            return 1.0
+        if min(len(a), len(b)) < self.min_fuzzy_length or numbers_differ(a, b):
+            return 0.0
+        return max(0.0, self._edit_similarity(a, b, 0.0))
+
+    def best_match(self, name: str, vocab: _Vocabulary) -> Tuple[Optional[str], float]:
+        """Closest existing name and its score"""
+        key = self.normalize(name)
+        if not key:
+            return None, 0.0
+        if key in vocab.keys:
+            return vocab.keys[key], 1.0
+
+        best, best_score = None, 0.0
+        for existing, existing_key, grams in vocab.entries:
+            score = self._score_keys(key, existing_key, grams)
+            if score > best_score:
+                best, best_score = existing, score
+        return best, best_score
+
+    def match(
+        self,
+        candidate_categories: List[str],
+        candidate_tags: List[str],
+        existing_tags: List[str],
+        existing_categories: List[str],
+        max_tags: int = 4,
+    ) -> TagMatch:
+        """Map candidates onto the existing vocabulary"""
+        self.lookups += 1
+        tag_vocab = self._vocabulary("tags", existing_tags)
+        category_vocab = self._vocabulary("categories", existing_categories)
+
+        category, category_score = None, 0.0
+        if candidate_categories:
+            category, category_score = self.best_match(candidate_categories[0], category_vocab)
+
+        tags: List[str] = []
+        scores: Dict[str, float] = {}
+        for candidate in candidate_tags:
+            existing, score = self.best_match(candidate, tag_vocab)
+            scores[candidate] = score
+            if (
+                existing
+                and score >= self.threshold
+                and existing not in tags
+                and existing != category
+            ):
+                tags.append(existing)
+
+        confident = (
+            self.enabled
+            and category is not None
+            and category_score >= self.threshold
+            and bool(scores)
+            and min(scores.values()) >= self.threshold
+            and len(tags) >= min(3, len(candidate_tags))
+        )
+        return TagMatch(
+            category=category if category_score >= self.threshold else None,
+            tags=tags[:max_tags],
+            scores=scores,
+            confident=confident,
+        )
+
+    def record(self, match: TagMatch, category: str, tags: List[str]) -> None:
+        """Compare a matcher proposal with the LLM's final decision"""
+        norm = self.normalize
+        category_agree = match.category is not None and norm(match.category) == norm(category)
+        proposed, decided = {norm(t) for t in match.tags}, {norm(t) for t in tags}
+        union = proposed | decided
+        jaccard = len(proposed & decided) / len(union) if union else 1.0
+
+        self.compared += 1
+        self.category_agree += category_agree
+        self.tag_jaccard_sum += jaccard
+        if match.confident:
+            self.confident_compared += 1
+            self.confident_category_agree += category_agree
+            self.confident_tag_jaccard_sum += jaccard
+
+    def stats(self) -> dict:
+        """Bypass rate and agreement with LLM decisions"""
+
+        def ratio(a: float, b: int) -> Optional[float]:
+            return round(a / b, 4) if b else None
+
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "shadow_rate": self.shadow_rate,
+            "lookups": self.lookups,
+            "bypassed": self.bypassed,
+            "bypass_rate": ratio(self.bypassed, self.lookups),
+            "shadowed": self.shadowed,
+            "compared": self.compared,
+            "category_agreement": ratio(self.category_agree, self.compared),
+            "tag_jaccard": ratio(self.tag_jaccard_sum, self.compared),
+            # 只统计匹配器有把握的样本：这部分的一致性决定了跳过 LLM 是否可靠
+            "confident_compared": self.confident_compared,
+            "confident_category_agreement": ratio(
+                self.confident_category_agree, self.confident_compared
+            ),
+            "confident_tag_jaccard": ratio(
+                self.confident_tag_jaccard_sum, self.confident_compared
+            ),
+        }
+
+
+# Global instance
+tag_matcher = TagMatcher(
+    enabled=settings.TAG_MATCH_ENABLED,
+    threshold=settings.TAG_MATCH_THRESHOLD,
+    shadow_rate=settings.TAG_MATCH_SHADOW_RATE,
+    aliases=settings.get_tag_aliases(),
+)
@@ -0,0 +1,200 @@
+"""Tag Vocabulary Service - Cached tag dictionary with usage counts and relevance ranking"""
+
+import time
+from typing import Dict, List, Optional, Tuple, Type
+
+from sqlmodel import Session, SQLModel, select, func
+
+from app.config import settings
+from app.database import engine
+from app.models import Tag, TagLinkAssociation, TagLinkAssociationStaging, TagStaging
+from app.services.tag_matcher import tag_matcher
+from app.services.taxonomy_state import taxonomy_state
+
+
+def _bigrams(key: str) -> set:
+    if len(key) < 2:
+        return {key}
+    return {key[i : i + 2] for i in range(len(key) - 1)}
+
+
+# (name, parent_id, is_category) -> (id, color)
+TagKey = Tuple[str, Optional[int], bool]
+
+
+class TagVocabulary:
+    """
+    In-memory snapshot of the tag table: names with link counts, and a
+    dictionary from (name, parent_id, is_category) to tag id and color.
+
+    The snapshot is reloaded with a single aggregate query when it is older
+    than `ttl` seconds, after invalidate() (called whenever tags are
+    renamed or deleted), or when another process swapped in a new taxonomy
+    (taxonomy_state generation). Tags created while processing links are written
+    through with add(), so a rebuild creating hundreds of tags never has to
+    reload. top_k() picks the part of the vocabulary worth showing the LLM
+    for one link, so prompt size stays bounded however large the
+    vocabulary grows.
+
+    `tag_model` / `association_model` select the tables, so the staging
+    tables of a full rebuild get a vocabulary of their own.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 60.0,
+        tag_model: Type[SQLModel] = Tag,
+        association_model: Type[SQLModel] = TagLinkAssociation,
+    ):
+        self.ttl = ttl
+        self.tag_model = tag_model
+        self.association_model = association_model
+
+        self._loaded_at = 0.0
+        self._generation = 0
+        self._tags: List[str] = []  # 按使用次数降序
+        self._categories: List[str] = []
+        self._counts: Dict[str, int] = {}  # 名称 -> 关联链接数（同名子标签合并）
+        self._ids: Dict[TagKey, Tuple[int, str]] = {}
+        # 最近一次排序用到的词表索引: (签名, [(name, key, bigrams)])
+        self._index: Optional[Tuple[tuple, List[Tuple[str, str, set]]]] = None
+
+    def invalidate(self) -> None:
+        """Force a reload on next access"""
+        self._loaded_at = 0.0
+
+    def _ensure_loaded(self) -> None:
+        generation = taxonomy_state.generation()
+        if generation == self._generation and time.monotonic() - self._loaded_at < self.ttl:
+            return
+
+        tag, association = self.tag_model, self.association_model
+        with Session(engine) as session:
+            rows = session.exec(
+                select(
+                    tag.id,
+                    tag.name,
+                    tag.parent_id,
+                    tag.is_category,
+                    tag.color,
+                    func.count(association.link_id),
+                )
+                .outerjoin(association, association.tag_id == tag.id)
+                .group_by(tag.id)
+                .order_by(tag.id)
+            ).all()
+
+        tag_counts: Dict[str, int] = {}
+        category_counts: Dict[str, int] = {}
+        ids: Dict[TagKey, Tuple[int, str]] = {}
+        for tag_id, name, parent_id, is_category, color, count in rows:
+            target = category_counts if is_category else tag_counts
+            target[name] = target.get(name, 0) + count
+            # Duplicates (legacy data): keep the oldest tag, as a first() query would
+            ids.setdefault((name, parent_id, is_category), (tag_id, color))
+
+        def by_usage(counts: Dict[str, int]) -> List[str]:
+            return sorted(counts, key=lambda name: (-counts[name], name))
+
+        self._tags = by_usage(tag_counts)
+        self._categories = by_usage(category_counts)
+        self._counts = {**tag_counts, **category_counts}
+        self._ids = ids
+        self._loaded_at = time.monotonic()
+        self._generation = generation
+
+    def lookup(
+        self, name: str, parent_id: Optional[int], is_category: bool
+    ) -> Optional[Tuple[int, str]]:
+        """(id, color) of a tag, or None if it is not in the snapshot"""
+        self._ensure_loaded()
+        return self._ids.get((name, parent_id, is_category))
+
+    def add(self, tag: SQLModel) -> None:
+        """Write a tag created (or found) in the database through to the snapshot"""
+        self._ensure_loaded()
+        key = (tag.name, tag.parent_id, tag.is_category)
+        if key in self._ids:
+            return
+        self._ids[key] = (tag.id, tag.color)
+        names = self._categories if tag.is_category else self._tags
+        if tag.name not in names:
+            names.append(tag.name)
+            self._counts.setdefault(tag.name, 0)
+
+    def category_count(self) -> int:
+        """Number of category rows"""
+        self._ensure_loaded()
+        return sum(1 for _, _, is_category in self._ids if is_category)
+
+    def tags(self) -> List[str]:
+        """Sub-tag names, most used first"""
+        self._ensure_loaded()
+        return list(self._tags)
+
+    def categories(self) -> List[str]:
+        """Category names, most used first"""
+        self._ensure_loaded()
+        return list(self._categories)
+
+    def count(self, name: str) -> int:
+        """Number of links using a tag or category name"""
+        self._ensure_loaded()
+        return self._counts.get(name, 0)
+
+    def _get_index(self, names: List[str]) -> List[Tuple[str, str, set]]:
+        signature = tuple(names)
+        if self._index is None or self._index[0] != signature:
+            entries = []
+            for name in names:
+                key = tag_matcher.normalize(name)
+                if key:
+                    entries.append((name, key, _bigrams(key)))
+            self._index = (signature, entries)
+        return self._index[1]
+
+    def top_k(self, queries: List[str], names: List[str], k: int) -> List[str]:
+        """
+        The k names most relevant to the queries, sorted by name.
+
+        Relevance is lexical: a name whose normalized key occurs in a query
+        (or vice versa) scores 1, otherwise the character bigram overlap
+        with the closest query counts. Ties are broken by name. Usage counts
+        and the order of `names` play no part, so the same queries against
+        the same vocabulary always give the same prompt (and llm_cache key),
+        however link counts change or in which order tags were created.
+
+        Args:
+            queries: Candidate tags, or title/content text
+            names: Vocabulary to choose from (e.g. tags())
+            k: Maximum number of names returned
+        """
+        if len(names) <= k:
+            return sorted(names)
+
+        query_keys = [
+            (key, _bigrams(key)) for key in (tag_matcher.normalize(q) for q in queries) if key
+        ]
+
+        scored = []
+        for name, key, grams in self._get_index(names):
+            relevance = 0.0
+            for query, query_grams in query_keys:
+                if (len(key) >= 2 and key in query) or (len(query) >= 2 and query in key):
+                    relevance = 1.0
+                    break
+                dice = 2 * len(grams & query_grams) / (len(grams) + len(query_grams))
+                relevance = max(relevance, dice)
+            scored.append((-relevance, name))
+
+        scored.sort()
+        return sorted(name for _, name in scored[:k])
+
+
+# Global instances
+tag_vocabulary = TagVocabulary(ttl=settings.TAG_VOCABULARY_TTL)
+staging_vocabulary = TagVocabulary(
+    ttl=settings.TAG_VOCABULARY_TTL,
+    tag_model=TagStaging,
+    association_model=TagLinkAssociationStaging,
+)
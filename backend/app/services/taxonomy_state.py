@@ -0,0 +1,111 @@
+"""Taxonomy State Service - Tag table generation and full rebuild lock shared by all processes"""
+
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+
+from app.config import settings
+from app.database import engine
+from app.models import TaxonomyState as TaxonomyStateRow
+
+
+class TaxonomyState:
+    """
+    The taxonomy_state row, shared by the API, the bot and the CLI.
+
+    `generation` is bumped in the same transaction that replaces the tag
+    tables wholesale (shadow taxonomy swap), so in-memory caches of the
+    tag table in every process can tell they are stale. Reading it is
+    throttled to one query per `check_interval` seconds.
+
+    The full rebuild lock is claimed with a single conditional UPDATE and
+    released by swap or discard. A lock held longer than `lock_timeout`
+    seconds is taken to belong to a crashed process and can be claimed.
+    """
+
+    def __init__(self, check_interval: float = 1.0, lock_timeout: float = 12 * 3600):
+        self.check_interval = check_interval
+        self.lock_timeout = lock_timeout
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._generation = 0
+        self._checked_at = 0.0
+
+    def _ensure_row(self, session: Session) -> TaxonomyStateRow:
+        row = session.get(TaxonomyStateRow, 1)
+        if row is None:
+            row = TaxonomyStateRow(id=1)
+            session.add(row)
+            try:
+                session.commit()
+            except IntegrityError:
+                # Created by another process in the meantime
+                session.rollback()
+                row = session.get(TaxonomyStateRow, 1)
+        return row
+
+    def generation(self) -> int:
+        """Current tag table generation, re-read at most every check_interval seconds"""
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            with Session(engine) as session:
+                self._generation = self._ensure_row(session).generation
+            self._checked_at = time.monotonic()
+        return self._generation
+
+    def bump(self, session: Session) -> None:
+        """Advance the generation; committed by the caller with the rewrite itself"""
+        result = session.exec(
+            update(TaxonomyStateRow)
+            .where(TaxonomyStateRow.id == 1)
+            .values(generation=TaxonomyStateRow.generation + 1)
+        )
+        if not result.rowcount:
+            session.add(TaxonomyStateRow(id=1, generation=1))
+        self._checked_at = 0.0
+
+    def acquire_rebuild(self) -> Optional[str]:
+        """Claim the full rebuild lock; None on success, else the current holder"""
+        now = datetime.utcnow()
+        with Session(engine) as session:
+            self._ensure_row(session)
+            result = session.exec(
+                update(TaxonomyStateRow)
+                .where(
+                    TaxonomyStateRow.id == 1,
+                    or_(
+                        TaxonomyStateRow.rebuild_owner.is_(None),
+                        TaxonomyStateRow.rebuild_started_at < now - timedelta(seconds=self.lock_timeout),
+                    ),
+                )
+                .values(rebuild_owner=self.owner, rebuild_started_at=now)
+            )
+            session.commit()
+            if result.rowcount:
+                return None
+            row = session.get(TaxonomyStateRow, 1)
+            session.refresh(row)
+            return f"{row.rebuild_owner} (since {row.rebuild_started_at:%Y-%m-%d %H:%M:%S} UTC)"
+
+    def release_rebuild(self, session: Optional[Session] = None) -> None:
+        """Release the full rebuild lock if this process holds it; with a session, committed by the caller"""
+        query = (
+            update(TaxonomyStateRow)
+            .where(TaxonomyStateRow.id == 1, TaxonomyStateRow.rebuild_owner == self.owner)
+            .values(rebuild_owner=None, rebuild_started_at=None)
+        )
+        if session is not None:
+            session.exec(query)
+            return
+        with Session(engine) as own:
+            own.exec(query)
+            own.commit()
+
+
+# Global instance
+taxonomy_state = TaxonomyState(lock_timeout=settings.TAXONOMY_REBUILD_LOCK_HOURS * 3600)
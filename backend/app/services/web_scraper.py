@@ -1,11 +1,48 @@
 """Web Scraper Service - Fetch and extract content from URLs"""
 
+import asyncio
+import ipaddress
 from dataclasses import dataclass
-from typing import Optional
+from typing import Optional, Tuple
 from urllib.parse import urljoin, urlparse
 import httpx
-from bs4 import BeautifulSoup
-from readability import Document
+
+from app.config import settings
+from app.services import content_handlers
+from app.services.content_handlers import (
+    HTML,
+    IMAGE,
+    PDF,
+    TEXT,
+    UNKNOWN,
+    UNSUPPORTED,
+)
+from app.services.extraction_pool import extraction_pool
+from app.services.html_extractor import ExtractedPage
+
+# Redirects followed by download(), each target checked again
+MAX_DOWNLOAD_REDIRECTS = 5
+
+
+async def check_public_host(url: str) -> None:
+    """
+    Raise ValueError unless the URL's host resolves to public addresses
+    only. URLs taken from page metadata (og:image, icons) are fetched by
+    unauthenticated endpoints and must not reach loopback, private or
+    link-local services.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError(f"不支持的 URL: {url}")
+    infos = await asyncio.get_running_loop().getaddrinfo(
+        parsed.hostname, parsed.port or (443 if parsed.scheme == "https" else 80)
+    )
+    for *_, sockaddr in infos:
+        address = ipaddress.ip_address(sockaddr[0].split("%", 1)[0])
+        if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise ValueError(f"不允许访问内网地址: {parsed.hostname} ({address})")
 
 
 @dataclass
@@ -18,108 +55,181 @@ class ScrapedContent:
     favicon_url: Optional[str]
     og_image_url: Optional[str]
     og_description: Optional[str]
+    content_kind: str = HTML  # html / text / pdf / image
+    truncated: bool = False  # 响应体超过 FETCH_MAX_BYTES 被截断
 
 
 class WebScraper:
     """Web scraper for fetching and extracting page content"""
 
-    def __init__(self):
+    def __init__(self, max_bytes: int = 2 * 1024 * 1024):
+        self.max_bytes = max_bytes
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
             "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
         }
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Shared client bound to the running loop, so keep-alive connections are reused"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                timeout=15.0,
+                follow_redirects=True,
+                headers=self.headers,
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def close(self) -> None:
+        """Close the shared client"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    async def fetch_robots(self, origin: str) -> Optional[str]:
+        """
+        Fetch robots.txt for an origin (scheme://host).
+
+        Returns:
+            File content, "" when there is no robots.txt (everything allowed),
+            or None when the server could not be reached
+        """
+        try:
+            response = await self._get_client().get(f"{origin}/robots.txt", timeout=5.0)
+        except httpx.HTTPError:
+            return None
+        if response.status_code >= 500:
+            return None
+        if response.status_code >= 400:
+            return ""
+        return response.text
+
+    async def check(self, url: str, timeout: float = 10.0) -> Tuple[int, str, Optional[str]]:
+        """
+        Status code, final URL (after redirects) and Retry-After header of a
+        URL, without downloading the body.
+
+        Tries HEAD first and falls back to a streamed GET when the server
+        rejects or mishandles HEAD (any error status or protocol error).
+        Connection errors and timeouts raise httpx.HTTPError.
+        """
+        client = self._get_client()
+        try:
+            response = await client.head(url, timeout=timeout)
+            if response.status_code < 400:
+                return response.status_code, str(response.url), None
+        except (httpx.ConnectError, httpx.TimeoutException):
+            raise  # GET would not fare better
+        except httpx.HTTPError:
+            pass
+
+        async with client.stream("GET", url, timeout=timeout) as response:
+            return response.status_code, str(response.url), response.headers.get("retry-after")
 
     async def fetch(self, url: str) -> ScrapedContent:
         """Fetch and extract content from a URL"""
-        async with httpx.AsyncClient(
-            timeout=15.0,
-            follow_redirects=True,
-            headers=self.headers,
-        ) as client:
-            response = await client.get(url)
+        async with self._get_client().stream("GET", url) as response:
             response.raise_for_status()
-            html = response.text
-
-        # Parse HTML
-        soup = BeautifulSoup(html, "html.parser")
-
-        # Extract readable content using readability
-        doc = Document(html)
-        title = doc.title() or self._get_title(soup)
-        content = BeautifulSoup(doc.summary(), "html.parser").get_text(
-            separator=" ", strip=True
-        )
-
-        # Limit content length
-        content = content[:5000] if content else ""
-
-        # Extract metadata
-        favicon_url = self._get_favicon(soup, url)
-        og_image_url = self._get_og_image(soup)
-        og_description = self._get_og_description(soup)
-
+            final_url = str(response.url)
+            content_type = response.headers.get("content-type", "")
+
+            # Route on the header first so unwanted bodies are never downloaded
+            kind = content_handlers.classify_content_type(content_type)
+            if kind == UNSUPPORTED:
+                raise ValueError(f"不支持的内容类型: {content_type}")
+            if kind == IMAGE:
+                return self._to_scraped(
+                    url, content_handlers.describe_image(final_url), IMAGE, False
+                )
+
+            body, truncated = await self._read_capped(response)
+
+        if kind == UNKNOWN:
+            kind = content_handlers.sniff_content(body)
+        elif kind == TEXT and content_handlers.sniff_content(body) == HTML:
+            kind = HTML  # HTML 被错误标记为 text/plain
+
+        if kind == HTML:
+            html = content_handlers.decode_body(content_type, body)
+            # Parsing is CPU-bound, keep it off the event loop
+            page = await extraction_pool.extract(html, final_url, settings.CONTENT_MAX_CHARS)
+        elif kind == TEXT:
+            text = content_handlers.decode_body(content_type, body)
+            page = content_handlers.extract_text(text, final_url, settings.CONTENT_MAX_CHARS)
+        elif kind == PDF:
+            page = await extraction_pool.run(
+                content_handlers.extract_pdf,
+                body,
+                final_url,
+                settings.CONTENT_MAX_CHARS,
+                label=url,
+            )
+        elif kind == IMAGE:
+            page = content_handlers.describe_image(final_url)
+        else:
+            raise ValueError(f"不支持的内容类型: {content_type or '未知'}")
+
+        return self._to_scraped(url, page, kind, truncated)
+
+    async def download(self, url: str, max_bytes: int) -> Tuple[bytes, str]:
+        """
+        Body and content type of a URL (images, favicons).
+
+        The URL and every redirect target must resolve to public addresses.
+
+        Raises:
+            httpx.HTTPStatusError: error status
+            ValueError: body larger than max_bytes, non-public host, or
+                too many redirects
+        """
+        for _ in range(MAX_DOWNLOAD_REDIRECTS + 1):
+            await check_public_host(url)
+            async with self._get_client().stream("GET", url, follow_redirects=False) as response:
+                if response.is_redirect:
+                    url = urljoin(str(response.url), response.headers["location"])
+                    continue
+                response.raise_for_status()
+                body, truncated = await self._read_capped(response, max_bytes)
+                if truncated:
+                    raise ValueError(f"响应体超过 {max_bytes} 字节: {url}")
+                return body, response.headers.get("content-type", "")
+        raise ValueError(f"重定向次数过多: {url}")
+
+    async def _read_capped(
+        self, response: httpx.Response, max_bytes: Optional[int] = None
+    ) -> Tuple[bytes, bool]:
+        """Read a streaming response body, stopping at max_bytes (default self.max_bytes)"""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        chunks = []
+        size = 0
+        async for chunk in response.aiter_bytes():
+            remaining = limit - size
+            if len(chunk) > remaining:
+                chunks.append(chunk[:remaining])
+                return b"".join(chunks), True
+            chunks.append(chunk)
+            size += len(chunk)
+        return b"".join(chunks), False
+
+    def _to_scraped(
+        self, url: str, page: ExtractedPage, kind: str, truncated: bool
+    ) -> ScrapedContent:
+        """Convert an extractor result into ScrapedContent"""
         return ScrapedContent(
             url=url,
-            title=title,
-            text_content=content,
-            favicon_url=favicon_url,
-            og_image_url=og_image_url,
-            og_description=og_description,
+            title=page.title,
+            text_content=page.text_content,
+            favicon_url=page.favicon_url,
+            og_image_url=page.og_image_url,
+            og_description=page.og_description,
+            content_kind=kind,
+            truncated=truncated,
         )
 
-    def _get_title(self, soup: BeautifulSoup) -> Optional[str]:
-        """Extract page title"""
-        # Try og:title first
-        og_title = soup.find("meta", property="og:title")
-        if og_title and og_title.get("content"):
-            return og_title["content"]
-
-        # Fall back to <title> tag
-        title_tag = soup.find("title")
-        if title_tag:
-            return title_tag.get_text(strip=True)
-
-        return None
-
-    def _get_favicon(self, soup: BeautifulSoup, base_url: str) -> Optional[str]:
-        """Extract favicon URL"""
-        # Try various favicon link types
-        for rel in ["icon", "shortcut icon", "apple-touch-icon"]:
-            link = soup.find("link", rel=lambda x: x and rel in x.lower() if x else False)
-            if link and link.get("href"):
-                return urljoin(base_url, link["href"])
-
-        # Default to /favicon.ico
-        parsed = urlparse(base_url)
-        return f"{parsed.scheme}://{parsed.netloc}/favicon.ico"
-
-    def _get_og_image(self, soup: BeautifulSoup) -> Optional[str]:
-        """Extract Open Graph image"""
-        og_image = soup.find("meta", property="og:image")
-        if og_image and og_image.get("content"):
-            return og_image["content"]
-
-        # Try twitter:image
-        twitter_image = soup.find("meta", attrs={"name": "twitter:image"})
-        if twitter_image and twitter_image.get("content"):
-            return twitter_image["content"]
-
-        return None
-
-    def _get_og_description(self, soup: BeautifulSoup) -> Optional[str]:
-        """Extract Open Graph description"""
-        og_desc = soup.find("meta", property="og:description")
-        if og_desc and og_desc.get("content"):
-            return og_desc["content"]
-
-        # Try meta description
-        meta_desc = soup.find("meta", attrs={"name": "description"})
-        if meta_desc and meta_desc.get("content"):
-            return meta_desc["content"]
-
-        return None
-
 
 # Global instance
-web_scraper = WebScraper()
+web_scraper = WebScraper(max_bytes=settings.FETCH_MAX_BYTES)
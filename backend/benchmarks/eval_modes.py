@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+AI processing mode evaluation - two-stage vs. single-call
+
+Usage:
+    python benchmarks/eval_modes.py
+    python benchmarks/eval_modes.py --fixtures benchmarks/fixtures/eval_links.json
+    python benchmarks/eval_modes.py --modes two_stage single --output report.json
+
+Runs every fixture link through each mode against the configured provider
+(OPENAI_BASE_URL / OPENAI_MODEL_NAME) with the LLM cache bypassed, then
+reports per-link latency, token usage and tag agreement between modes and,
+when fixtures carry expected_category / expected_tags, against those.
+
+A link counts as failed in a mode when the processor fell back (no
+successful LLM call, or the "未分类" placeholder category), the provider
+was unavailable or it rejected the request. Failed links are reported
+separately and left out of latency, token and agreement figures.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from openai import APIError
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import app.models  # noqa: F401  (registers the tables)
+from app.database import init_db
+from app.services.ai_processor import AIProcessor, ProcessResult
+from app.services.llm_client import LLMUnavailableError
+
+
+DEFAULT_FIXTURES = Path(__file__).parent / "fixtures" / "eval_links.json"
+
+
+class UsageRecorder:
+    """Wraps the processor's LLM client to count calls and tokens"""
+
+    def __init__(self, processor: AIProcessor):
+        self._create = processor.llm.create
+        processor.llm.create = self.create
+        self.reset()
+
+    def reset(self) -> None:
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    async def create(self, **kwargs):
+        response = await self._create(**kwargs)
+        self.calls += 1
+        if response.usage:
+            self.prompt_tokens += response.usage.prompt_tokens
+            self.completion_tokens += response.usage.completion_tokens
+        return response
+
+
+def _norm(name: str) -> str:
+    return name.strip().lower().replace(" ", "")
+
+
+def jaccard(a: List[str], b: List[str]) -> float:
+    """Jaccard similarity of two tag lists (case and whitespace insensitive)"""
+    sa, sb = {_norm(x) for x in a}, {_norm(x) for x in b}
+    if not sa and not sb:
+        return 1.0
+    return len(sa & sb) / len(sa | sb)
+
+
+def is_fallback(result: ProcessResult, calls: int) -> bool:
+    """Whether the processor returned its placeholder result instead of a classification"""
+    return calls == 0 or result.category == "未分类"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def evaluate(fixtures: dict, modes: List[str]) -> List[Dict]:
+    """Run each link through each mode, returning one row per link"""
+    processor = AIProcessor()
+    recorder = UsageRecorder(processor)
+    rows = []
+
+    for item in fixtures["links"]:
+        row = {"url": item["url"], "modes": {}}
+        for mode in modes:
+            recorder.reset()
+            start = time.perf_counter()
+            try:
+                result: ProcessResult = await processor.process(
+                    url=item["url"],
+                    title=item.get("title"),
+                    content=item.get("content", ""),
+                    existing_tags=fixtures.get("existing_tags", []),
+                    existing_categories=fixtures.get("existing_categories", []),
+                    use_cache=False,
+                    mode=mode,
+                )
+            except (LLMUnavailableError, APIError) as e:
+                print(f"  ✗ {item['url']} ({mode}): {e}")
+                result = ProcessResult(title="", description="", category="未分类", tags=[])
+            row["modes"][mode] = {
+                "latency": time.perf_counter() - start,
+                "calls": recorder.calls,
+                "prompt_tokens": recorder.prompt_tokens,
+                "completion_tokens": recorder.completion_tokens,
+                "category": result.category,
+                "tags": result.tags,
+                "failed": is_fallback(result, recorder.calls),
+            }
+            if row["modes"][mode]["failed"]:
+                continue
+            if "expected_tags" in item:
+                row["modes"][mode]["gold_tag_jaccard"] = jaccard(result.tags, item["expected_tags"])
+            if "expected_category" in item:
+                row["modes"][mode]["gold_category_match"] = (
+                    _norm(result.category) == _norm(item["expected_category"])
+                )
+
+        if len(modes) == 2 and not any(row["modes"][m]["failed"] for m in modes):
+            a, b = (row["modes"][m] for m in modes)
+            row["category_agree"] = _norm(a["category"]) == _norm(b["category"])
+            row["tag_jaccard"] = jaccard(a["tags"], b["tags"])
+
+        rows.append(row)
+        print(f"  ✓ {item['url']}")
+
+    return rows
+
+
+def report(rows: List[Dict], modes: List[str]) -> Dict:
+    """Print per-link and aggregate tables, return the aggregate"""
+    print("\n逐条结果:")
+    for row in rows:
+        print(f"\n  {row['url']}")
+        for mode in modes:
+            r = row["modes"][mode]
+            outcome = "✗ 失败（回退结果）" if r["failed"] else f"{r['category']} | {', '.join(r['tags'])}"
+            print(
+                f"    {mode:<10} {r['latency']:6.2f}s  calls={r['calls']}  "
+                f"tokens={r['prompt_tokens']}+{r['completion_tokens']}  {outcome}"
+            )
+        if "tag_jaccard" in row:
+            print(f"    一致性     分类={'✓' if row['category_agree'] else '✗'}  标签 Jaccard={row['tag_jaccard']:.2f}")
+
+    summary = {}
+    print("\n汇总:")
+    for mode in modes:
+        failures = sum(row["modes"][mode]["failed"] for row in rows)
+        results = [row["modes"][mode] for row in rows if not row["modes"][mode]["failed"]]
+        latencies = [r["latency"] for r in results]
+        gold_tags = [r["gold_tag_jaccard"] for r in results if "gold_tag_jaccard" in r]
+        gold_cats = [r["gold_category_match"] for r in results if "gold_category_match" in r]
+        summary[mode] = {
+            "succeeded": len(results),
+            "failures": failures,
+            "latency_mean": statistics.mean(latencies) if latencies else 0.0,
+            "latency_p50": percentile(latencies, 50),
+            "latency_p95": percentile(latencies, 95),
+            "calls": sum(r["calls"] for r in results),
+            "prompt_tokens": sum(r["prompt_tokens"] for r in results),
+            "completion_tokens": sum(r["completion_tokens"] for r in results),
+            "gold_tag_jaccard": statistics.mean(gold_tags) if gold_tags else None,
+            "gold_category_accuracy": sum(gold_cats) / len(gold_cats) if gold_cats else None,
+        }
+        s = summary[mode]
+        gold = ""
+        if s["gold_tag_jaccard"] is not None:
+            gold = f"  期望标签 Jaccard={s['gold_tag_jaccard']:.2f}"
+        if s["gold_category_accuracy"] is not None:
+            gold += f"  期望分类准确率={s['gold_category_accuracy']:.0%}"
+        print(
+            f"  {mode:<10} 成功 {s['succeeded']}/{len(rows)}  失败 {s['failures']}  "
+            f"平均 {s['latency_mean']:.2f}s  p50 {s['latency_p50']:.2f}s  "
+            f"p95 {s['latency_p95']:.2f}s  calls={s['calls']}  "
+            f"tokens={s['prompt_tokens']}+{s['completion_tokens']}{gold}"
+        )
+
+    compared = [row for row in rows if "tag_jaccard" in row]
+    if len(modes) == 2 and compared:
+        summary["agreement"] = {
+            "links": len(compared),
+            "category": sum(row["category_agree"] for row in compared) / len(compared),
+            "tag_jaccard": statistics.mean(row["tag_jaccard"] for row in compared),
+        }
+        print(
+            f"  模式间一致性（{len(compared)} 条均成功）: 分类 {summary['agreement']['category']:.0%}  "
+            f"标签 Jaccard {summary['agreement']['tag_jaccard']:.2f}"
+        )
+
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比 AI 处理模式的延迟、token 用量和标签一致性")
+    parser.add_argument("--fixtures", "-f", type=Path, default=DEFAULT_FIXTURES, help="评测数据集 JSON")
+    parser.add_argument("--modes", "-m", nargs="+", default=["two_stage", "single"], help="要对比的模式")
+    parser.add_argument("--limit", "-l", type=int, help="只评测前 N 条")
+    parser.add_argument("--output", "-o", type=Path, help="将完整结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    fixtures = json.loads(args.fixtures.read_text(encoding="utf-8"))
+    if args.limit:
+        fixtures["links"] = fixtures["links"][: args.limit]
+
+    # LLM 缓存和限流桶存放在数据库中
+    init_db()
+
+    print(f"评测 {len(fixtures['links'])} 条链接，模式: {', '.join(args.modes)}")
+    rows = asyncio.run(evaluate(fixtures, args.modes))
+    summary = report(rows, args.modes)
+
+    if args.output:
+        args.output.write_text(
+            json.dumps({"summary": summary, "links": rows}, ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+        print(f"\n结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
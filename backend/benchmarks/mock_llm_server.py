@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+OpenAI-compatible mock LLM server for offline load testing
+
+Usage:
+    python benchmarks/mock_llm_server.py
+    python benchmarks/mock_llm_server.py --port 8001 --latency lognormal:0.8:0.4
+    python benchmarks/mock_llm_server.py --error-429 0.05 --error-500 0.02 --error-timeout 0.01
+    python benchmarks/mock_llm_server.py --rpm 60 --tpm 100000 --seed 7
+
+Then point the backend at it:
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=mock python cli.py add http://127.0.0.1:8001/pages/1
+
+Implements POST /v1/chat/completions (JSON mode, optionally streamed) for
+the prompts AIProcessor sends: stage 1 candidates, stage 2 classification
+(single and batched) and single-call mode. Responses are derived from the
+prompt content, so the same page always gets the same title and tags.
+
+Latency follows --latency (fixed:S, uniform:LO:HI, lognormal:MEDIAN:SIGMA)
+plus --token-latency seconds per completion token. Errors are injected at
+the given rates: 429 with Retry-After and x-ratelimit-* headers, 500, or a
+timeout (the request hangs for --timeout-seconds). With --rpm / --tpm the
+server also enforces real per-minute limits. GET /pages/{n} serves
+deterministic article pages so fetching can stay local too, and GET /stats
+reports request counters.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+
+from app.services.content_condenser import estimate_tokens
+
+
+CATEGORIES = ["前端开发", "后端开发", "大模型应用", "DevOps", "数据科学", "效率工具", "开源项目", "系统架构"]
+
+TOPICS = [
+    ("React", "前端开发"), ("Vue", "前端开发"), ("TypeScript", "前端开发"), ("Vite", "前端开发"),
+    ("FastAPI", "后端开发"), ("PostgreSQL", "后端开发"), ("Redis", "后端开发"), ("gRPC", "后端开发"),
+    ("LLM", "大模型应用"), ("RAG", "大模型应用"), ("Agent", "大模型应用"), ("Prompt", "大模型应用"),
+    ("Kubernetes", "DevOps"), ("Docker", "DevOps"), ("Terraform", "DevOps"), ("Prometheus", "DevOps"),
+    ("Pandas", "数据科学"), ("PyTorch", "数据科学"), ("DuckDB", "数据科学"), ("Spark", "数据科学"),
+]
+
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z0-9+#\-]{1,}")
+_CJK_RUN_RE = re.compile(r"[一-鿿]{2,}")
+_STOPWORDS = frozenset(
+    "the and for with that this from are was were you your our how what when into about "
+    "can will has have not but all any its use using used http https www com html".split()
+)
+
+
+def _digest(text: str) -> int:
+    return int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def _section(prompt: str, label: str) -> str:
+    """Text following `label` up to the end of its line"""
+    match = re.search(re.escape(label) + r"\s*(.*)", prompt)
+    return match.group(1).strip() if match else ""
+
+
+def _names(line: str) -> List[str]:
+    return [name.strip() for name in line.split(",") if name.strip()]
+
+
+def _key_terms(text: str, limit: int) -> List[str]:
+    """Most frequent words (English) and 2-character runs (CJK) of a text"""
+    counts: Counter = Counter()
+    spelling: Dict[str, str] = {}
+    for word in _WORD_RE.findall(text):
+        key = word.lower()
+        if key in _STOPWORDS or key.isdigit():
+            continue
+        counts[key] += 1
+        spelling.setdefault(key, word)
+    for run in _CJK_RUN_RE.findall(text):
+        for i in range(len(run) - 1):
+            counts[run[i : i + 2]] += 1
+            spelling.setdefault(run[i : i + 2], run[i : i + 2])
+    # Words before CJK fragments, ties broken alphabetically so the order never depends on hashing
+    ranked = sorted(counts, key=lambda key: (not key.isascii(), -counts[key], key))
+    return [spelling[key] for key in ranked[:limit]]
+
+
+def _prefer_existing(names: List[str], existing: List[str]) -> List[str]:
+    """Replace names by the existing spelling when they match case-insensitively"""
+    lookup = {name.casefold().replace(" ", ""): name for name in existing}
+    result = []
+    for name in names:
+        name = lookup.get(name.casefold().replace(" ", ""), name)
+        if name not in result:
+            result.append(name)
+    return result
+
+
+def analyze_page(prompt: str) -> dict:
+    """Deterministic title, description, categories and tags for a page prompt"""
+    title = _section(prompt, "原标题:")
+    content = prompt.split("网页内容摘要:", 1)[-1].split("\n现有", 1)[0].split("\n请返回", 1)[0].strip()
+    terms = _key_terms(f"{title} {content}", 8) or ["Misc"]
+
+    categories = []
+    for term in terms:
+        for topic, category in TOPICS:
+            if term.lower() == topic.lower() and category not in categories:
+                categories.append(category)
+    if not categories:
+        categories.append(CATEGORIES[_digest(content) % len(CATEGORIES)])
+
+    description = re.split(r"(?<=[。！？.!?])\s*", content, maxsplit=1)[0][:120]
+    return {
+        "title": (title if title and title != "无" else f"{terms[0]} 相关内容")[:30],
+        "description": description or f"介绍 {', '.join(terms[:3])} 的相关内容",
+        "candidate_categories": categories[:2],
+        "candidate_tags": terms[:8],
+    }
+
+
+def classify(candidate_categories: List[str], candidate_tags: List[str], prompt: str) -> dict:
+    """Stage 2: pick the first candidate category and up to 4 tags, preferring existing names"""
+    existing_categories = _names(_section(prompt, "现有分类库:"))
+    existing_tags = _names(_section(prompt, "现有标签库:"))
+    category = _prefer_existing(candidate_categories or ["未分类"], existing_categories)[0]
+    tags = [t for t in _prefer_existing(candidate_tags, existing_tags) if t != category]
+    return {"category": category, "tags": tags[:4]}
+
+
+def respond(messages: List[dict]) -> dict:
+    """JSON response for one of the prompts AIProcessor sends"""
+    prompt = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+
+    if '"results"' in prompt:
+        # Batched stage 2: one JSON object per line after "待处理链接"
+        results = []
+        for line in prompt.split("待处理链接", 1)[-1].splitlines():
+            line = line.strip()
+            if not line.startswith("{"):
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                continue
+            result = classify(item.get("candidate_categories", []), item.get("candidate_tags", []), prompt)
+            results.append({"id": item.get("id"), **result})
+        return {"results": results}
+
+    if '"candidate_categories"' in prompt:
+        return analyze_page(prompt)
+
+    if "网页内容摘要:" in prompt:
+        # Single-call mode
+        page = analyze_page(prompt)
+        result = classify(page["candidate_categories"], page["candidate_tags"], prompt)
+        return {"title": page["title"], "description": page["description"], **result}
+
+    return classify(_names(_section(prompt, "候选分类:")), _names(_section(prompt, "候选标签:")), prompt)
+
+
+class Limits:
+    """Per-minute request and token budgets, reported as x-ratelimit-* headers"""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = float(rpm)
+        self.tokens = float(tpm)
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed, self.updated = now - self.updated, now
+        self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60)
+        self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60)
+
+    def take(self, tokens: int) -> bool:
+        """Enforced only when --rpm / --tpm were given"""
+        self._refill()
+        if self.requests < 1 or self.tokens < tokens:
+            return False
+        self.requests -= 1
+        self.tokens -= tokens
+        return True
+
+    def headers(self) -> Dict[str, str]:
+        self._refill()
+        return {
+            "x-ratelimit-limit-requests": str(self.rpm),
+            "x-ratelimit-remaining-requests": str(max(0, int(self.requests))),
+            "x-ratelimit-reset-requests": f"{max(0.0, (1 - self.requests) * 60 / self.rpm):.3f}s",
+            "x-ratelimit-limit-tokens": str(self.tpm),
+            "x-ratelimit-remaining-tokens": str(max(0, int(self.tokens))),
+            "x-ratelimit-reset-tokens": f"{max(0.0, (self.tpm - self.tokens) * 60 / self.tpm):.3f}s",
+        }
+
+
+def parse_latency(spec: str):
+    """'fixed:0.5', 'uniform:0.2:1.5' or 'lognormal:MEDIAN:SIGMA' -> sampler(rng)"""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(":") if v]
+    if kind == "fixed":
+        return lambda rng: values[0] if values else 0.0
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda rng: rng.lognormvariate(math.log(median), sigma)
+    raise argparse.ArgumentTypeError(f"未知的延迟分布: {spec}")
+
+
+def _error(status: int, message: str, kind: str, headers: Optional[Dict[str, str]] = None):
+    return JSONResponse(
+        {"error": {"message": message, "type": kind, "code": None}},
+        status_code=status,
+        headers=headers,
+    )
+
+
+def create_app(args: argparse.Namespace) -> FastAPI:
+    app = FastAPI(title="Mock LLM")
+    rng = random.Random(args.seed)
+    sample_latency = parse_latency(args.latency)
+    enforce = bool(args.rpm or args.tpm)
+    limits = Limits(args.rpm or 10000, args.tpm or 10_000_000)
+    stats: Counter = Counter()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        prompt_tokens = sum(estimate_tokens(m.get("content") or "") for m in messages)
+        stats["requests"] += 1
+
+        roll = rng.random()
+        if roll < args.error_429 or (enforce and not limits.take(prompt_tokens)):
+            stats["429"] += 1
+            headers = {**limits.headers(), "retry-after": f"{args.retry_after:g}"}
+            if enforce:
+                headers["x-ratelimit-remaining-requests"] = "0"
+            return _error(429, "Rate limit reached (mock)", "rate_limit_exceeded", headers)
+        roll -= args.error_429
+        if roll < args.error_500:
+            stats["500"] += 1
+            await asyncio.sleep(sample_latency(rng) / 2)
+            return _error(500, "Internal server error (mock)", "server_error")
+        roll -= args.error_500
+        if roll < args.error_timeout:
+            stats["timeout"] += 1
+            await asyncio.sleep(args.timeout_seconds)
+            return _error(504, "Gateway timeout (mock)", "timeout")
+
+        content = json.dumps(respond(messages), ensure_ascii=False)
+        completion_tokens = estimate_tokens(content)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        completion_id = f"chatcmpl-mock{stats['requests']}"
+        model = body.get("model", "mock")
+        created = int(time.time())
+        stats["completion_tokens"] += completion_tokens
+        stats["prompt_tokens"] += prompt_tokens
+
+        # Time to first token
+        await asyncio.sleep(sample_latency(rng))
+
+        if not body.get("stream"):
+            await asyncio.sleep(completion_tokens * args.token_latency)
+            stats["ok"] += 1
+            return JSONResponse(
+                {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": content},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": usage,
+                },
+                headers=limits.headers(),
+            )
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        async def events():
+            def chunk(delta: dict, finish_reason=None, with_usage=False) -> str:
+                data = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [] if with_usage else [
+                        {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                    ],
+                }
+                if with_usage:
+                    data["usage"] = usage
+                return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+            yield chunk({"role": "assistant", "content": ""})
+            step = 8  # 字符数，约 2-8 个 token
+            for i in range(0, len(content), step):
+                piece = content[i : i + step]
+                await asyncio.sleep(estimate_tokens(piece) * args.token_latency)
+                yield chunk({"content": piece})
+            yield chunk({}, finish_reason="stop")
+            if include_usage:
+                yield chunk({}, with_usage=True)
+            yield "data: [DONE]\n\n"
+            stats["ok"] += 1
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers=limits.headers())
+
+    @app.get("/v1/models")
+    def list_models():
+        return {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]}
+
+    @app.get("/pages/{n}", response_class=HTMLResponse)
+    def page(n: int):
+        """Deterministic article page: topics and wording derived from n"""
+        page_rng = random.Random(n)
+        topics = page_rng.sample(TOPICS, 3)
+        names = [name for name, _ in topics]
+        paragraphs = "".join(
+            f"<p>{page_rng.choice(names)} 在实际项目中的应用第 {i + 1} 部分。本节讨论 "
+            f"{', '.join(page_rng.sample(names, 2))} 的设计取舍、性能表现和常见问题，"
+            f"并给出可以直接复用的配置示例。</p>"
+            for i in range(page_rng.randint(4, 12))
+        )
+        return (
+            f"<html><head><title>{names[0]} 实践指南 #{n}</title>"
+            f'<meta name="description" content="{names[0]} 与 {names[1]} 的实践经验">'
+            f"</head><body><nav>首页 | 归档 | 关于</nav><article><h1>{names[0]} 实践指南</h1>"
+            f"{paragraphs}</article><footer>© mock</footer></body></html>"
+        )
+
+    @app.get("/stats")
+    def get_stats():
+        return dict(stats)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容模拟服务，用于离线压测")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", "-p", type=int, default=8001)
+    parser.add_argument("--latency", default="lognormal:0.8:0.4", help="首 token 延迟分布: fixed:S / uniform:LO:HI / lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="每个输出 token 的额外耗时（秒）")
+    parser.add_argument("--error-429", type=float, default=0.0, help="注入 429 的比例")
+    parser.add_argument("--error-500", type=float, default=0.0, help="注入 500 的比例")
+    parser.add_argument("--error-timeout", type=float, default=0.0, help="注入超时（挂起）的比例")
+    parser.add_argument("--timeout-seconds", type=float, default=120.0, help="超时请求挂起的时间")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429 响应的 Retry-After（秒）")
+    parser.add_argument("--rpm", type=int, default=0, help="实际执行的每分钟请求数限制，0 表示不限")
+    parser.add_argument("--tpm", type=int, default=0, help="实际执行的每分钟 token 数限制，0 表示不限")
+    parser.add_argument("--seed", type=int, default=0, help="延迟和错误注入的随机种子")
+    args = parser.parse_args()
+    parse_latency(args.latency)  # 启动前校验
+
+    print(f"Mock LLM 服务: http://{args.host}:{args.port}/v1")
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
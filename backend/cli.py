@@ -6,6 +6,11 @@ Usage:
     python cli.py add <url> [--note "your note"]
     python cli.py list
     python cli.py search <keyword>
+    python cli.py consolidate-tags [--apply] [--ids ID ...]
+    python cli.py check-links [--max-age HOURS] [--broken]
+    python cli.py related [<link_id>] [--rebuild]
+    python cli.py storage
+    python cli.py vacuum
 """
 
 import asyncio
@@ -108,6 +113,136 @@ def list_tags() -> None:
             print(f"  • {tag.name} ({count})")
 
 
+def consolidate_tags(apply: bool = False, ids: list = None) -> None:
+    """Propose (and optionally apply) merges of near-duplicate tags"""
+    from app.services.tag_consolidator import tag_consolidator
+
+    report = tag_consolidator.consolidate(ids=ids, dry_run=not apply)
+
+    if not report.proposals:
+        print("\n没有发现需要合并的标签")
+        return
+
+    print(f"\n共 {len(report.proposals)} 组合并建议:")
+    for proposal in report.proposals:
+        mark = "✓" if proposal.id in report.accepted else " "
+        level = "分类" if proposal.level == "category" else "标签"
+        print(f"\n[{mark}] {proposal.id}  {level}: {proposal.canonical}  ({proposal.links} 条链接)")
+        for member in proposal.members:
+            print(
+                f"      ← {member['name']} ({member['links']})  "
+                f"名称 {member['score']:.2f}  共现 {member['context']:.2f}  {member['reason']}"
+            )
+
+    action = "将" if report.dry_run else "已"
+    print(
+        f"\n{action}删除 {report.tags_removed} 个标签，更新 {report.tags_updated} 个，"
+        f"迁移 {report.associations_moved} 条关联"
+    )
+    if report.dry_run:
+        print("预览模式，未修改数据。使用 --apply 应用，--ids 只应用指定的建议")
+
+
+def check_links(max_age_hours: float = None, show_broken: bool = False) -> None:
+    """Check links for dead pages and redirects"""
+    from app.services.link_checker import health_condition, link_checker
+
+    async def on_progress(done: int, total: int):
+        print(f"  已检查 {done}/{total}")
+
+    if not show_broken:
+        result = asyncio.run(link_checker.run(max_age_hours=max_age_hours, on_progress=on_progress))
+        print(
+            f"\n检查完成: {result['checked']} 条链接，用时 {result['seconds']} 秒，"
+            f"失效 {result['broken']} 条，重定向 {result['redirected']} 条"
+        )
+
+    with Session(engine) as session:
+        broken = session.exec(
+            select(Link).where(health_condition("broken")).order_by(Link.id)
+        ).all()
+        if not broken:
+            print("\n没有失效链接")
+            return
+
+        print(f"\n失效链接 {len(broken)} 条:")
+        for link in broken:
+            status = link.http_status or link.check_error or "无法访问"
+            print(f"  [{link.id}] {status}  {link.url}")
+
+
+def related(link_id: int = None, rebuild: bool = False) -> None:
+    """Rebuild the related-links table, or show the related links of one link"""
+    from app.services.related_links import related_links
+
+    if rebuild or link_id is None:
+        result = asyncio.run(related_links.rebuild())
+        print(
+            f"\n已重新计算 {result['links']} 条链接的相关链接，共 {result['pairs']} 对，"
+            f"用时 {result['seconds']} 秒"
+        )
+    if link_id is None:
+        return
+
+    with Session(engine) as session:
+        link = session.get(Link, link_id)
+        if not link:
+            print(f"\n链接 {link_id} 不存在")
+            return
+        neighbors = related_links.neighbors(session, link_id)
+        print(f"\n与「{link.title}」相关的链接:")
+        if not neighbors:
+            print("  暂无")
+        for other, score in neighbors:
+            print(f"  {score:.2f}  [{other.id}] {other.title}  {other.url}")
+
+
+def _format_bytes(size) -> str:
+    if size is None:
+        return "-"
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def show_storage() -> None:
+    """Show stored page content and database size"""
+    from app.services.content_store import content_store
+
+    stats = content_store.stats()
+    print(f"\n已保存正文: {stats['entries']} 条（{stats['links_without_content']} 条链接尚无保存内容）")
+    print(f"  原始大小: {_format_bytes(stats['raw_bytes'])}")
+    print(f"  压缩后:   {_format_bytes(stats['stored_bytes'])}", end="")
+    if stats["compression_ratio"]:
+        print(f"（压缩比 {stats['compression_ratio']}x）")
+    else:
+        print()
+    if stats["orphaned"]:
+        print(f"  已删除链接的残留内容: {stats['orphaned']} 条，可用 vacuum 清理")
+
+    if "database_bytes" in stats:
+        print(
+            f"\n数据库文件: {_format_bytes(stats['database_bytes'])}"
+            f"（空闲页 {_format_bytes(stats['free_bytes'])}）"
+        )
+        for name, size in list(stats.get("tables_bytes", {}).items())[:10]:
+            print(f"  {name}: {_format_bytes(size)}")
+
+
+def vacuum_storage() -> None:
+    """Drop content of deleted links and compact the database file"""
+    from app.services.content_store import content_store
+
+    result = content_store.vacuum()
+    print(f"\n已清理 {result['removed']} 条残留内容")
+    print(
+        f"数据库文件: {_format_bytes(result['database_bytes_before'])} → "
+        f"{_format_bytes(result['database_bytes_after'])}"
+    )
+
+
 def interactive_mode():
     """交互式对话模式"""
     print("\n🍋 LimeStar 链接收藏助手")
@@ -202,6 +337,15 @@ def main():
   python cli.py list
   python cli.py search AI
   python cli.py tags
+  python cli.py consolidate-tags                 # 预览近似重复标签的合并建议
+  python cli.py consolidate-tags --apply --ids 89b694fbcb
+  python cli.py check-links                      # 检查所有链接是否失效或重定向
+  python cli.py check-links --max-age 24         # 跳过 24 小时内检查过的链接
+  python cli.py check-links --broken             # 只列出上次检查失效的链接
+  python cli.py related                          # 重新计算所有链接的相关链接
+  python cli.py related 42                       # 查看链接 42 的相关链接
+  python cli.py storage                          # 查看保存的正文和数据库占用
+  python cli.py vacuum                           # 清理残留内容并压缩数据库
         """,
     )
 
@@ -223,6 +367,25 @@ def main():
     # tags command
     subparsers.add_parser("tags", help="列出所有标签")
 
+    # consolidate-tags command
+    consolidate_parser = subparsers.add_parser("consolidate-tags", help="合并近似重复的标签和分类")
+    consolidate_parser.add_argument("--apply", action="store_true", help="应用合并（默认只预览）")
+    consolidate_parser.add_argument("--ids", nargs="+", help="只应用指定 ID 的合并建议")
+
+    # check-links command
+    check_parser = subparsers.add_parser("check-links", help="检查失效链接和重定向")
+    check_parser.add_argument("--max-age", type=float, help="跳过 N 小时内检查过的链接")
+    check_parser.add_argument("--broken", action="store_true", help="不检查，只列出上次检查失效的链接")
+
+    # related command
+    related_parser = subparsers.add_parser("related", help="查看或重新计算相关链接")
+    related_parser.add_argument("link_id", type=int, nargs="?", help="查看该链接的相关链接（不填则重新计算全部）")
+    related_parser.add_argument("--rebuild", action="store_true", help="查看前先重新计算全部")
+
+    # storage / vacuum commands
+    subparsers.add_parser("storage", help="查看保存的网页正文和数据库占用空间")
+    subparsers.add_parser("vacuum", help="清理已删除链接的正文并压缩数据库文件")
+
     args = parser.parse_args()
 
     # Initialize database
@@ -236,6 +399,16 @@ def main():
         search_links(args.keyword)
     elif args.command == "tags":
         list_tags()
+    elif args.command == "consolidate-tags":
+        consolidate_tags(args.apply, args.ids)
+    elif args.command == "check-links":
+        check_links(args.max_age, args.broken)
+    elif args.command == "related":
+        related(args.link_id, args.rebuild)
+    elif args.command == "storage":
+        show_storage()
+    elif args.command == "vacuum":
+        vacuum_storage()
     else:
         # 无参数时进入交互式模式
         interactive_mode()
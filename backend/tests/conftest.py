@@ -0,0 +1,70 @@
+"""Shared fixtures: every test runs against a fresh SQLite database"""
+
+import os
+import tempfile
+from typing import List, Optional
+
+import pytest
+
+# Must be set before app.config is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='limestar-test-')}/test.db"
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from sqlmodel import Session, SQLModel, select  # noqa: E402
+
+import app.models  # noqa: E402,F401  (registers the tables)
+from app.database import engine, init_db  # noqa: E402
+from app.models import Link, Tag, TagLinkAssociation  # noqa: E402
+from app.services.tag_cooccurrence import tag_cooccurrence  # noqa: E402
+from app.services.tag_vocabulary import staging_vocabulary, tag_vocabulary  # noqa: E402
+from app.services.taxonomy_state import taxonomy_state  # noqa: E402
+
+# Each test starts from an empty database, never trust a cached generation
+taxonomy_state.check_interval = 0
+
+
+@pytest.fixture
+def session():
+    """Empty database; in-memory caches of the tag table are reset"""
+    SQLModel.metadata.drop_all(engine)
+    init_db()
+    for cache in (tag_vocabulary, staging_vocabulary, tag_cooccurrence):
+        cache.invalidate()
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def add_link(session):
+    """Create a processed link tagged with a category and sub-tags (created on first use)"""
+    counter = iter(range(1, 1_000_000))
+
+    def tag(name: str, category: Optional[Tag] = None) -> Tag:
+        query = select(Tag).where(Tag.name == name, Tag.is_category == (category is None))
+        if category is not None:
+            query = query.where(Tag.parent_id == category.id)
+        existing = session.exec(query).first()
+        if existing:
+            return existing
+        created = Tag(name=name, is_category=category is None, parent_id=category.id if category else None)
+        session.add(created)
+        session.flush()
+        return created
+
+    def add(category: str, tags: List[str], title: str = "") -> Link:
+        n = next(counter)
+        link = Link(
+            url=f"https://example.com/{n}",
+            title=title or f"Link {n}",
+            domain="example.com",
+            is_processed=True,
+        )
+        session.add(link)
+        session.flush()
+        parent = tag(category)
+        for tag_obj in [parent] + [tag(name, parent) for name in tags]:
+            session.add(TagLinkAssociation(tag_id=tag_obj.id, link_id=link.id))
+        session.commit()
+        return link
+
+    return add
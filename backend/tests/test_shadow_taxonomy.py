@@ -0,0 +1,65 @@
+"""Shadow taxonomy: staged rebuilds swapped into the live tag tables"""
+
+import pytest
+from sqlmodel import select
+
+from app.models import Link, Tag
+from app.services.link_processor import link_processor
+from app.services.shadow_taxonomy import shadow_taxonomy
+from app.services.tag_vocabulary import tag_vocabulary
+from app.services.taxonomy_state import taxonomy_state
+
+
+def tags_of(session, link_id):
+    """Category names and "category/sub-tag" paths of a link"""
+    session.expire_all()
+    names = {tag.id: tag.name for tag in session.exec(select(Tag)).all()}
+    return sorted(
+        f"{names[tag.parent_id]}/{tag.name}" if tag.parent_id else tag.name
+        for tag in session.get(Link, link_id).tags
+    )
+
+
+def test_swap_keeps_tags_of_carried_links(session, add_link):
+    rebuilt = add_link("技术", ["Python", "教程"])
+    failed = add_link("技术", ["Rust", "教程"])
+    added = add_link("设计", ["配色"])
+
+    shadow_taxonomy.begin()
+    link_processor._update_link_tags(rebuilt, "编程", ["Python", "入门"], session, staging=True)
+    session.commit()
+    # Added while the rebuild ran, after the staged tables were started
+    late = add_link("技术", ["Go"])
+    result = shadow_taxonomy.swap()
+
+    assert result.carried_links == 3
+    assert tags_of(session, rebuilt.id) == ["编程", "编程/Python", "编程/入门"]
+    assert tags_of(session, failed.id) == ["技术", "技术/Rust", "技术/教程"]
+    assert tags_of(session, added.id) == ["设计", "设计/配色"]
+    assert tags_of(session, late.id) == ["技术", "技术/Go"]
+
+
+def test_swap_bumps_generation_and_reloads_vocabulary(session, add_link):
+    link = add_link("技术", ["Python"])
+    assert tag_vocabulary.categories() == ["技术"]
+    generation = taxonomy_state.generation()
+
+    shadow_taxonomy.begin()
+    link_processor._update_link_tags(link, "编程", ["Python"], session, staging=True)
+    session.commit()
+    shadow_taxonomy.swap()
+
+    assert taxonomy_state.generation() == generation + 1
+    assert tag_vocabulary.categories() == ["编程"]
+
+
+def test_only_one_rebuild_at_a_time(session):
+    shadow_taxonomy.begin()
+    with pytest.raises(RuntimeError):
+        shadow_taxonomy.begin()
+
+    shadow_taxonomy.discard()
+    shadow_taxonomy.begin()
+    shadow_taxonomy.swap()
+    shadow_taxonomy.begin()
+    shadow_taxonomy.discard()
@@ -0,0 +1,114 @@
+"""Tag consolidator: which names are proposed for merging, and how merges are applied"""
+
+import pytest
+from sqlmodel import select
+
+from app.models import Link, Tag
+from app.services.tag_consolidator import tag_consolidator
+
+
+def merged_pairs(proposals):
+    return {
+        frozenset((proposal.canonical, member["name"]))
+        for proposal in proposals
+        for member in proposal.members
+    }
+
+
+@pytest.mark.parametrize(
+    "a, b",
+    [
+        ("Java", "JavaScript"),
+        ("GPT-3", "GPT-4"),
+        ("React", "Preact"),
+        ("React", "macOS"),
+        ("Python 3.11", "Python 3.12"),
+        ("Vue 2", "Vue 3"),
+    ],
+)
+def test_distinct_names_are_not_merged(add_link, a, b):
+    # Same category and the same other sub-tags: only the names tell them apart
+    for _ in range(3):
+        add_link("技术", [a, "编程", "教程"])
+        add_link("技术", [b, "编程", "教程"])
+
+    proposals = tag_consolidator.propose()
+
+    assert frozenset((a, b)) not in merged_pairs(proposals)
+
+
+def test_bad_merges_seen_in_production_are_not_proposed(add_link):
+    names = ["Java", "JavaScript", "GPT-3", "GPT-4", "React", "Preact", "macOS",
+             "Python 3.11", "Python 3.12", "Vue 2", "Vue 3"]
+    for name in names:
+        for _ in range(2):
+            add_link("技术", [name, "编程"])
+
+    assert tag_consolidator.propose() == []
+
+
+def test_near_duplicates_are_merged(add_link):
+    for _ in range(3):
+        add_link("技术", ["Kubernetes", "容器"])
+        add_link("技术", ["前端", "CSS", "浏览器"])
+    for _ in range(2):
+        add_link("技术", ["Kubernets", "容器"])
+        add_link("技术", ["前端开发", "CSS", "浏览器"])
+
+    pairs = merged_pairs(tag_consolidator.propose())
+
+    assert frozenset(("Kubernetes", "Kubernets")) in pairs
+    assert frozenset(("前端", "前端开发")) in pairs
+
+
+def test_clusters_are_not_chained(add_link):
+    # 前端 ~ 前端开发 and 前端开发 ~ 开发, but 开发 is not linked to 前端
+    for _ in range(4):
+        add_link("技术", ["前端", "CSS", "工具"])
+    for _ in range(3):
+        add_link("技术", ["前端开发", "CSS", "工具"])
+    for _ in range(2):
+        add_link("技术", ["开发", "CSS", "工具"])
+
+    proposals = tag_consolidator.propose()
+
+    assert [(p.canonical, [m["name"] for m in p.members]) for p in proposals] == [
+        ("前端", ["前端开发"])
+    ]
+
+
+def tags_by_category(session):
+    categories = {tag.id: tag.name for tag in session.exec(select(Tag).where(Tag.is_category)).all()}
+    return {
+        tag.name: categories[tag.parent_id]
+        for tag in session.exec(select(Tag).where(Tag.is_category == False)).all()  # noqa: E712
+    }
+
+
+def test_two_category_merges_keep_each_sub_tag_in_its_own_category(session, add_link):
+    for _ in range(3):
+        add_link("前端", ["CSS", "浏览器"])
+        add_link("Kubernetes", ["容器", "集群"])
+    for _ in range(2):
+        add_link("前端开发", ["CSS", "排版"])
+        add_link("Kubernets", ["容器", "调度"])
+
+    report = tag_consolidator.consolidate(dry_run=False)
+
+    assert sorted((p.level, p.canonical) for p in report.proposals) == [
+        ("category", "Kubernetes"),
+        ("category", "前端"),
+    ]
+    session.expire_all()
+    assert tags_by_category(session) == {
+        "CSS": "前端",
+        "浏览器": "前端",
+        "排版": "前端",
+        "容器": "Kubernetes",
+        "集群": "Kubernetes",
+        "调度": "Kubernetes",
+    }
+    # Sub-tags with the same name under the merged categories were folded into one row
+    links = session.exec(select(Link)).all()
+    assert len(links) == 10
+    assert all(len(link.tags) == 3 for link in links)
@@ -0,0 +1,101 @@
+"""Tag co-occurrence: incremental maintenance and ranking"""
+
+import random
+from fractions import Fraction
+
+import pytest
+from sqlalchemy import delete, insert
+
+from app.models import Link, Tag, TagLinkAssociation
+from app.services.tag_cooccurrence import TagCooccurrence
+
+TAGS = 20
+LINKS = 60
+
+
+def seed(session, rng):
+    """Tags 1..TAGS and links 1..LINKS with random tag sets; returns {link_id: tag_ids}"""
+    session.execute(insert(Tag), [{"name": f"t{i}", "is_category": False} for i in range(1, TAGS + 1)])
+    session.execute(
+        insert(Link), [{"url": f"https://example.com/{i}", "title": "", "domain": "example.com"} for i in range(LINKS)]
+    )
+    tags = {link_id: random_tags(rng) for link_id in range(1, LINKS + 1)}
+    write(session, tags)
+    return tags
+
+
+def random_tags(rng):
+    return set(rng.sample(range(1, TAGS + 1), rng.randint(0, 5)))
+
+
+def write(session, tags):
+    session.exec(delete(TagLinkAssociation).where(TagLinkAssociation.link_id.in_(list(tags))))
+    rows = [{"tag_id": tag_id, "link_id": link_id} for link_id, ids in tags.items() for tag_id in ids]
+    if rows:
+        session.execute(insert(TagLinkAssociation), rows)
+    session.commit()
+
+
+def snapshot(matrix):
+    return (
+        {(a, b): matrix.count(a, b) for a in range(1, TAGS + 1) for b in range(1, TAGS + 1)},
+        {tag_id: matrix.related(tag_id, limit=TAGS) for tag_id in range(1, TAGS + 1)},
+        {key: value for key, value in matrix.stats().items() if key in ("links", "tags", "pairs")},
+    )
+
+
+def test_incremental_updates_match_a_fresh_load(session):
+    rng = random.Random(7)
+    seed(session, rng)
+    matrix = TagCooccurrence(ttl=3600)
+    matrix.count(1, 2)  # load
+
+    for _ in range(200):
+        link_id = rng.randint(1, LINKS)
+        if rng.random() < 0.1:
+            new = set()  # cleared or deleted
+            matrix.remove_link(link_id)
+        else:
+            new = random_tags(rng)
+            matrix.set_link_tags(link_id, new)
+        write(session, {link_id: new})
+
+    assert matrix.reloads == 1
+    assert snapshot(matrix) == snapshot(TagCooccurrence(ttl=3600))
+
+
+def assert_top(result, expected, limit):
+    """result is a top-`limit` of expected {tag_id: (exact score, count)}; ties may come in any order"""
+    best = sorted(score for score, _ in expected.values())[::-1][:limit]
+    assert [score for _, _, score in result] == pytest.approx([float(score) for score in best])
+    for tag_id, count, score in result:
+        assert expected[tag_id] == (pytest.approx(score), count)
+
+
+def test_related_and_suggest_match_brute_force(session):
+    rng = random.Random(11)
+    tags = seed(session, rng)
+    matrix = TagCooccurrence(ttl=3600)
+
+    def links_with(tag_id):
+        return {link_id for link_id, ids in tags.items() if tag_id in ids}
+
+    for tag_id in range(1, TAGS + 1):
+        own = links_with(tag_id)
+        expected = {
+            other: (Fraction(len(own & links_with(other)), len(own | links_with(other))), len(own & links_with(other)))
+            for other in range(1, TAGS + 1)
+            if other != tag_id and own & links_with(other)
+        }
+        assert_top(matrix.related(tag_id, 5), expected, 5)
+
+    for _ in range(50):
+        selected = set(rng.sample(range(1, TAGS + 1), rng.randint(1, 3)))
+        used = [tag_id for tag_id in selected if links_with(tag_id)]
+        expected = {}
+        for other in set(range(1, TAGS + 1)) - selected:
+            shared = [len(links_with(tag_id) & links_with(other)) for tag_id in used]
+            if any(shared):
+                mean = sum(Fraction(c, len(links_with(t))) for c, t in zip(shared, used)) / len(selected)
+                expected[other] = (mean, sum(shared))
+        assert_top(matrix.suggest(selected, 5), expected, 5)
@@ -0,0 +1,46 @@
+"""Tag vocabulary: the context shown to the LLM does not depend on usage"""
+
+from app.services.ai_processor import CandidateResult, ai_processor
+from app.services.tag_vocabulary import tag_vocabulary
+
+CANDIDATES = CandidateResult(
+    title="React 状态管理",
+    description="",
+    candidate_categories=["前端开发"],
+    candidate_tags=["React", "状态管理", "Redux"],
+)
+
+
+def stage2_prompt():
+    tag_vocabulary.invalidate()
+    return ai_processor._classify_messages(
+        CANDIDATES, tag_vocabulary.tags(), tag_vocabulary.categories()
+    )
+
+
+def add_links(add_link, counts):
+    for category, name, count in counts:
+        for _ in range(count):
+            add_link(category, [name])
+
+
+def test_prompt_does_not_depend_on_link_counts_or_creation_order(add_link, monkeypatch):
+    monkeypatch.setattr("app.services.ai_processor.settings.STAGE2_TAG_CONTEXT", 3)
+    tags = [
+        ("前端", "React"),
+        ("前端", "Redux"),
+        ("前端", "状态管理"),
+        ("后端", "Go"),
+        ("运维", "Kubernetes"),
+        ("运维", "Docker"),
+    ]
+    add_links(add_link, [(category, name, 1 + i) for i, (category, name) in enumerate(tags)])
+    first = stage2_prompt()
+
+    # Same vocabulary, the most used tags now the least used
+    add_links(add_link, [(category, name, 10 * i) for i, (category, name) in enumerate(reversed(tags))])
+    second = stage2_prompt()
+
+    assert first == second
+    assert "现有分类库: 前端, 后端, 运维" in first[1]["content"]
+    assert "现有标签库: React, Redux, 状态管理" in first[1]["content"]
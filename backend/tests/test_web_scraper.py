@@ -0,0 +1,41 @@
+"""Downloads of URLs taken from page metadata, and how those URLs are extracted"""
+
+import asyncio
+
+import pytest
+
+from app.services.html_extractor import extract_page
+from app.services.web_scraper import check_public_host
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "http://127.0.0.1/admin",
+        "http://localhost:8000/api/links",
+        "http://10.0.0.5/image.png",
+        "http://192.168.1.1/",
+        "http://169.254.169.254/latest/meta-data/",
+        "http://[::1]/",
+        "http://[::ffff:127.0.0.1]/",
+        "http://0.0.0.0/",
+        "file:///etc/passwd",
+    ],
+)
+def test_non_public_hosts_are_rejected(url):
+    with pytest.raises(ValueError):
+        asyncio.run(check_public_host(url))
+
+
+def test_public_addresses_are_allowed():
+    asyncio.run(check_public_host("https://93.184.216.34/og.png"))
+
+
+def test_relative_og_image_is_resolved_against_the_final_url():
+    html = """<html><head><title>Post</title>
+        <meta property="og:image" content="/images/cover.png">
+        </head><body><p>Hello</p></body></html>"""
+
+    page = extract_page(html, "https://blog.example.com/posts/1")
+
+    assert page.og_image_url == "https://blog.example.com/images/cover.png"
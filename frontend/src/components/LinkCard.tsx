@@ -7,12 +7,13 @@ import type { Link } from '../types';
 
 interface LinkCardProps {
   link: Link;
+  favicon?: string | null;  // 来自 /api/favicons/batch 的 data URI
   onTagClick?: (tagName: string) => void;
   onDelete?: (linkId: number) => void;
 }
 
 export const LinkCard = forwardRef<HTMLDivElement, LinkCardProps>(
-  function LinkCard({ link, onTagClick, onDelete }, ref) {
+  function LinkCard({ link, favicon, onTagClick, onDelete }, ref) {
   const [showDeleteConfirm, setShowDeleteConfirm] = useState(false);
   // Format date
   const formatDate = (dateStr: string) => {
@@ -59,9 +60,9 @@ export const LinkCard = forwardRef<HTMLDivElement, LinkCardProps>(
           {/* Favicon */}
           <div className="flex-shrink-0">
             <div className="w-10 h-10 md:w-12 md:h-12 rounded-xl bg-white/80 shadow-sm flex items-center justify-center overflow-hidden">
-              {link.favicon_url ? (
+              {favicon ? (
                 <img
-                  src={link.favicon_url}
+                  src={favicon}
                   alt=""
                   className="w-6 h-6 md:w-7 md:h-7 object-contain"
                   onError={(e) => {
@@ -72,7 +73,7 @@ export const LinkCard = forwardRef<HTMLDivElement, LinkCardProps>(
               ) : null}
               <Globe
                 size={24}
-                className={`text-gray-400 ${link.favicon_url ? 'hidden' : ''}`}
+                className={`text-gray-400 ${favicon ? 'hidden' : ''}`}
               />
             </div>
           </div>
@@ -1,6 +1,7 @@
 import { motion, AnimatePresence } from 'framer-motion';
 import { LinkCard } from './LinkCard';
 import { Inbox } from 'lucide-react';
+import { useFavicons } from '../hooks/useFavicons';
 import type { Link } from '../types';
 
 interface LinkListProps {
@@ -11,6 +12,8 @@ interface LinkListProps {
 }
 
 export function LinkList({ links, isLoading, onTagClick, onDeleteLink }: LinkListProps) {
+  const favicons = useFavicons(links.map((link) => link.domain));
+
   // Loading skeleton
   if (isLoading) {
     return (
@@ -74,6 +77,7 @@ export function LinkList({ links, isLoading, onTagClick, onDeleteLink }: LinkLis
           <LinkCard
             key={link.id}
             link={link}
+            favicon={favicons[link.domain]}
             onTagClick={onTagClick}
             onDelete={onDeleteLink}
           />
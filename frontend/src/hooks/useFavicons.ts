@@ -0,0 +1,68 @@
+import { useState, useEffect } from 'react';
+import { faviconsAPI } from '../services/api';
+
+// 已取回的图标，翻页或筛选时不再重复请求
+const cache: Record<string, string> = {};
+
+// 没有取到图标的域名（服务端可能仍在后台下载）及其时间，过一段时间再请求
+const missingSince: Record<string, number> = {};
+const RETRY_AFTER_MS = 60_000;
+
+// 首次请求中超时的图标，稍后在同一页面上再取一次
+const RETRY_DELAY_MS = 5_000;
+
+export function useFavicons(domains: string[]): Record<string, string | null> {
+  const [favicons, setFavicons] = useState<Record<string, string | null>>(cache);
+  const key = Array.from(new Set(domains)).sort().join(',');
+
+  useEffect(() => {
+    const now = Date.now();
+    const missing = key
+      ? key
+          .split(',')
+          .filter(
+            (domain) =>
+              !(domain in cache) &&
+              !(domain in missingSince && now - missingSince[domain] < RETRY_AFTER_MS)
+          )
+      : [];
+    if (missing.length === 0) return;
+
+    let cancelled = false;
+    let timer: ReturnType<typeof setTimeout> | undefined;
+
+    const load = (requested: string[], retry: boolean) => {
+      faviconsAPI
+        .batch(requested)
+        .then((result) => {
+          const stillMissing: string[] = [];
+          for (const domain of requested) {
+            const favicon = result[domain];
+            if (favicon) {
+              cache[domain] = favicon;
+              delete missingSince[domain];
+            } else {
+              missingSince[domain] = Date.now();
+              stillMissing.push(domain);
+            }
+          }
+          if (cancelled) return;
+          setFavicons({ ...cache });
+          if (retry && stillMissing.length > 0) {
+            timer = setTimeout(() => load(stillMissing, false), RETRY_DELAY_MS);
+          }
+        })
+        .catch(() => {
+          // 图标不影响列表显示，失败时保持默认图标
+        });
+    };
+
+    load(missing, true);
+    return () => {
+      cancelled = true;
+      if (timer) clearTimeout(timer);
+    };
+  }, [key]);
+
+  return favicons;
+}
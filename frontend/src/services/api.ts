@@ -1,6 +1,6 @@
 // LimeStar API Service
 
-import type { Link, LinkListResponse, TagWithCount, CategoryWithTags, LoginResponse, VerifyResponse } from '../types';
+import type { Link, LinkListResponse, RelatedLink, RelatedTag, TagWithCount, CategoryWithTags, LoginResponse, VerifyResponse } from '../types';
 
 const API_BASE = '/api';
 const AUTH_TOKEN_KEY = 'limestar_auth_token';
@@ -60,6 +60,10 @@ export const linksAPI = {
     return fetchAPI<Link>(`/links/${id}`);
   },
 
+  getRelated: (id: number, limit?: number): Promise<RelatedLink[]> => {
+    return fetchAPI<RelatedLink[]>(`/links/${id}/related${limit ? `?limit=${limit}` : ''}`);
+  },
+
   create: (data: { url: string; user_note?: string }): Promise<Link> => {
     return fetchAPI<Link>('/links', {
       method: 'POST',
@@ -94,6 +98,18 @@ export const tagsAPI = {
     return fetchAPI<CategoryWithTags[]>('/tags/categories');
   },
 
+  getRelated: (id: number, limit?: number): Promise<RelatedTag[]> => {
+    return fetchAPI<RelatedTag[]>(`/tags/${id}/related${limit ? `?limit=${limit}` : ''}`);
+  },
+
+  // 编辑链接标签时，根据已选标签的共现情况推荐
+  suggest: (tagIds: number[], limit?: number): Promise<RelatedTag[]> => {
+    const searchParams = new URLSearchParams();
+    tagIds.forEach((id) => searchParams.append('tag_ids', String(id)));
+    if (limit) searchParams.set('limit', String(limit));
+    return fetchAPI<RelatedTag[]>(`/tags/suggestions?${searchParams.toString()}`);
+  },
+
   create: (data: { name: string; color?: string }): Promise<TagWithCount> => {
     return fetchAPI<TagWithCount>('/tags', {
       method: 'POST',
@@ -123,6 +139,15 @@ export const searchAPI = {
   },
 };
 
+// Favicons API
+export const faviconsAPI = {
+  // 一次请求取回整页链接的图标（data URI），无图标的域名为 null
+  batch: (domains: string[]): Promise<Record<string, string | null>> => {
+    const searchParams = new URLSearchParams({ domains: domains.join(',') });
+    return fetchAPI<Record<string, string | null>>(`/favicons/batch?${searchParams.toString()}`);
+  },
+};
+
 // Auth API
 export const authAPI = {
   login: (password: string): Promise<LoginResponse> => {
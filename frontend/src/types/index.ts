@@ -28,11 +28,23 @@ export interface Link {
   user_note: string | null;
   favicon_url: string | null;
   og_image_url: string | null;
+  thumbnail_url: string | null;
   domain: string;
   created_at: string;
   updated_at: string;
   is_processed: boolean;
   tags: Tag[];
+  http_status: number | null;
+  final_url: string | null;
+  checked_at: string | null;
+}
+
+export interface RelatedTag extends TagWithCount {
+  score: number;
+}
+
+export interface RelatedLink extends Link {
+  score: number;
 }
 
 export interface PaginatedResponse<T> {